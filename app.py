@@ -3,199 +3,210 @@ BhagavadGPT - Flask Development Server
 Local development application for semantic search chatbot
 """
 
-import json
-import re
+import hmac
 import os
-from pathlib import Path
-from typing import List, Dict, Any
+import threading
+from functools import partial
 
-import numpy as np
-from sentence_transformers import SentenceTransformer, util
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 
+from bhagavadgpt.search import (
+    MODEL_NAME,
+    load_model,
+    preprocess_and_embed_dataset,
+    warm_up_model,
+    search_verses_hybrid,
+    search_verses_hybrid_batch,
+    build_chat_response,
+    parse_search_options,
+    MAX_BATCH_MESSAGES,
+)
+from bhagavadgpt.bundle import find_bundle, load_bundle, load_bundle_verses
+from bhagavadgpt.cache import cache_stats, clear_caches
+from bhagavadgpt.incremental import apply_delta, reindex_conflict, save_dataset
+from bhagavadgpt.neighbors import parse_similar_top_k, similar_verses
+from bhagavadgpt.metrics import (
+    SERVER_TIMING,
+    app_counters,
+    finish_request,
+    render_prometheus,
+    stage,
+    start_request,
+)
+from bhagavadgpt.rerank import get_reranker
+from bhagavadgpt.responses import (
+    STREAM_CONTENT_TYPES,
+    choose_encoding,
+    compress,
+    parse_response_options,
+    should_compress,
+    stream_chat,
+)
+from bhagavadgpt.search_index import SearchIndex
+from bhagavadgpt.sessions import parse_session_id, search_in_session
+from bhagavadgpt.verse_store import load_verse_store
+from bhagavadgpt.warmup import (
+    Initializer,
+    WARMUP_ON_START,
+    WARMUP_WAIT_SECONDS,
+    WARMUP_RETRY_AFTER,
+)
+
 # ==================== Flask App Configuration ====================
 
 app = Flask(__name__, static_folder='public', static_url_path='')
 CORS(app)
-
-# ==================== Configuration ====================
-
-STOPWORDS = {
-    "i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours",
-    "yourself", "yourselves", "he", "him", "his", "himself", "she", "her", "hers",
-    "herself", "it", "its", "itself", "they", "them", "their", "theirs", "themselves",
-    "what", "which", "who", "whom", "this", "that", "these", "those", "am", "is", "are",
-    "was", "were", "be", "been", "being", "have", "has", "had", "having", "do", "does",
-    "did", "doing", "a", "an", "the", "and", "but", "if", "or", "because", "as", "until",
-    "while", "of", "at", "by", "for", "with", "about", "against", "between", "into",
-    "through", "during", "before", "after", "above", "below", "to", "from", "up", "down",
-    "in", "out", "on", "off", "over", "under", "again", "further", "then", "once", "here",
-    "there", "when", "where", "why", "how", "all", "any", "both", "each", "few", "more",
-    "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so",
-    "than", "too", "very", "s", "t", "can", "will", "just", "don", "should", "now"
-}
-
-MODEL_NAME = 'all-MiniLM-L6-v2'
+# Compact UTF-8 JSON: no indentation, emoji not expanded to \u escapes
+app.json.compact = True
+app.json.ensure_ascii = False
 
 # ==================== Global Variables ====================
 
 model = None
-corpus_embeddings = None
+search_index = None  # SearchIndex snapshot, replaced as a whole on re-index
 dataset = None
 
-# ==================== Helper Functions ====================
+# Endpoints that must stay cheap: they never load the model or embeddings
+LIGHTWEIGHT_ENDPOINTS = {'health', 'ready', 'verse_count', 'cache_statistics', 'index', 'static', 'metrics'}
 
-def load_gita_dataset(file_path: str = 'bhagavad_gita_dataset_expanded.json') -> List[Dict[str, Any]]:
-    """Load the Bhagavad Gita dataset from JSON file."""
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            print(f"✓ Loaded dataset with {len(data)} verses")
-            return data
-    except FileNotFoundError:
-        print(f"Error: Dataset file '{file_path}' not found")
-        print("Please generate it by running: jupyter notebook code.ipynb")
-        return []
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON format in '{file_path}'")
-        return []
-
-def preprocess_and_embed_dataset(dataset: List[Dict[str, Any]]):
-    """Generate embeddings for all verses in the dataset."""
-    global model, corpus_embeddings
-    
-    print(f"Loading model: {MODEL_NAME}...")
-    model = SentenceTransformer(MODEL_NAME)
-    
-    # Create combined search text for each verse
-    for item in dataset:
-        themes_str = ", ".join(item.get("themes", []))
-        keywords_str = ", ".join(item.get("keywords", []))
-        item['combined_search_text'] = (
-            f"Theme: {themes_str}. Keywords: {keywords_str}. "
-            f"Context: {item.get('context', '')}. "
-            f"Translation: {item.get('translation', '')}"
-        )
-    
-    # Generate embeddings for all verses
-    print("Generating embeddings...")
-    corpus_embeddings = model.encode(
-        [item['combined_search_text'] for item in dataset],
-        convert_to_tensor=True,
-        show_progress_bar=True
-    )
-    
-    print("✓ Embeddings generated successfully")
-    return model, corpus_embeddings
-
-def extract_keywords(text: str) -> set:
-    """Extract meaningful keywords from text."""
-    words = re.findall(r"\b\w+\b", text.lower())
-    return {word for word in words if word not in STOPWORDS}
-
-def search_verses_hybrid(
-    dataset: List[Dict[str, Any]],
-    user_query: str,
-    model: SentenceTransformer,
-    corpus_embeddings
-) -> List[Dict[str, Any]]:
+# Shared secret for /api/admin/* (admin endpoints are disabled when unset)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+DATASET_FILE = 'bhagavad_gita_dataset_expanded.json'
+
+dataset_lock = threading.Lock()
+# Serializes re-indexing; queries never take it
+reindex_lock = threading.Lock()
+# Processes serving this app (set by serve.py); a live re-index would only
+# reach one of them, so it is refused when there are several
+worker_count = 1
+
+# ==================== Application Initialization ====================
+
+def load_dataset():
     """
-    Hybrid search combining semantic similarity and keyword matching.
-    Returns top 3 matching verses with scores.
+    Load (memory-map) the verse store only, from the index bundle when there
+    is one; never imports the model libraries.
     """
-    user_keywords = extract_keywords(user_query)
+    global dataset
     
-    # Calculate keyword scores
-    keyword_scores = []
-    for item in dataset:
-        score = 0
-        verse_content = " ".join(
-            item.get("keywords", []) + 
-            item.get("themes", []) + 
-            [item.get("translation", "")]
-        ).lower()
-        for keyword in user_keywords:
-            if keyword in verse_content:
-                score += 1
-        keyword_scores.append(score)
+    with dataset_lock:
+        if not dataset:
+            with stage('dataset_load'):
+                dataset = load_bundle_verses(dataset_path=DATASET_FILE) or load_verse_store(DATASET_FILE)
+    return dataset
+
+def load_search_index(phase=lambda name: None, allow_encode=True):
+    """
+    Load dataset, embeddings and indexes without loading the model, so it
+    can run in a pre-fork master process (see serve.py). A prebuilt index
+    bundle is memory-mapped as is. With allow_encode=False a cold embedding
+    cache raises RuntimeError instead of encoding the corpus. No-op once loaded.
+    """
+    global model, search_index, dataset
     
-    # Normalize keyword scores (0-1)
-    max_keyword_score = max(keyword_scores) if max(keyword_scores) > 0 else 1
-    keyword_scores = [score / max_keyword_score for score in keyword_scores]
+    if search_index is not None:
+        return
     
-    # Calculate semantic scores using embeddings
-    query_embedding = model.encode(user_query, convert_to_tensor=True)
-    semantic_scores = util.pytorch_cos_sim(query_embedding, corpus_embeddings)[0]
-    semantic_scores = semantic_scores.cpu().numpy()
+    phase('loading_dataset')
+    load_dataset()
     
-    # Combine scores (70% semantic, 30% keyword)
-    combined_scores = 0.7 * semantic_scores + 0.3 * np.array(keyword_scores)
+    if not dataset:
+        print("\n❌ Failed to load dataset")
+        print("="*60 + "\n")
+        raise RuntimeError('Dataset failed to load')
     
-    # Get top 3 results
-    top_indices = np.argsort(combined_scores)[-3:][::-1]
+    phase('loading_embeddings')
+    with stage('index_load'):
+        bundled = load_bundle(dataset_path=DATASET_FILE)
+    if bundled is not None:
+        model, search_index, dataset = load_model(MODEL_NAME), bundled, bundled.dataset
+        return
     
-    results = []
-    for idx in top_indices:
-        if combined_scores[idx] > 0.1:  # Minimum threshold
-            results.append({
-                'verse_data': dataset[idx],
-                'score': float(combined_scores[idx])
-            })
+    model, corpus_embeddings = preprocess_and_embed_dataset(
+        dataset, show_progress_bar=True, allow_encode=allow_encode
+    )
     
-    return results
+    phase('building_indexes')
+    search_index = SearchIndex.build(dataset, corpus_embeddings)
 
-def format_response(results: List[Dict[str, Any]]) -> str:
-    """Format search results into a readable response."""
-    if not results:
-        return "I couldn't find a matching verse. Please try rephrasing your question."
+def initialize(phase=lambda name: None):
+    """Load the search index and warm up the model (runs in the warm-up thread)."""
+    print("\n" + "="*60)
+    print("🚀 Initializing BhagavadGPT...")
+    print("="*60)
     
-    response_parts = []
+    load_search_index(phase)
     
-    for i, result in enumerate(results, 1):
-        verse = result['verse_data']
-        score = result['score']
-        
-        chapter = verse.get('chapter', 'N/A')
-        verse_num = verse.get('verse', 'N/A')
-        translation = verse.get('translation', '')
-        themes = ", ".join(verse.get('themes', []))
-        context = verse.get('context', '')
-        
-        part = (
-            f"\n{'='*60}\n"
-            f"📖 Chapter {chapter}, Verse {verse_num}\n"
-            f"{'='*60}\n"
-            f"\n{translation}\n"
-            f"\n📌 Themes: {themes}"
-            f"\n\n💭 Context: {context}"
-            f"\n(Confidence: {score*100:.1f}%)"
-        )
-        response_parts.append(part)
+    phase('loading_model')
+    warm_up_model(model)
     
-    return "\n".join(response_parts)
+    print("\n✅ BhagavadGPT ready!")
+    print("="*60 + "\n")
 
-# ==================== Application Initialization ====================
+initializer = Initializer(initialize)
+
+@app.before_request
+def ensure_warmup():
+    """Start warm-up on the first real request if it is not already running."""
+    if request.endpoint not in LIGHTWEIGHT_ENDPOINTS:
+        initializer.start()
 
 @app.before_request
-def initialize():
-    """Initialize model and embeddings on first request."""
-    global model, corpus_embeddings, dataset
+def start_timing():
+    """Collect per-stage timings for this request (see /api/metrics)."""
+    g.timings = start_request()
+
+@app.after_request
+def add_server_timing(response):
+    """Record the status and, with SERVER_TIMING=1, send the stage breakdown."""
+    g.status = response.status_code
+    timings = g.get('timings')
+    if SERVER_TIMING and timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Gzip/brotli-encode larger JSON and text bodies when the client accepts it."""
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    if not should_compress(response.mimetype, response.content_length or 0):
+        return response
     
-    if model is None:
-        print("\n" + "="*60)
-        print("🚀 Initializing BhagavadGPT...")
-        print("="*60)
-        
-        dataset = load_gita_dataset()
-        
-        if dataset:
-            preprocess_and_embed_dataset(dataset)
-            print("\n✅ BhagavadGPT ready!")
-            print("="*60 + "\n")
-        else:
-            print("\n❌ Failed to load dataset")
-            print("="*60 + "\n")
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.teardown_request
+def finish_timing(exc):
+    """Count the request (also when a handler raised) and stop any profiler."""
+    finish_request(g.pop('timings', None), request.endpoint or 'unmatched', g.get('status', 500))
+
+def service_unavailable():
+    """Fast 503 with Retry-After while warm-up is running (or has failed)."""
+    status = initializer.status()
+    if status['phase'] == 'failed':
+        error = f"Service not ready. {status['error']}."
+    else:
+        error = 'Service warming up. Please retry shortly.'
+    
+    return jsonify({
+        'error': error,
+        'phase': status['phase']
+    }), 503, {'Retry-After': str(WARMUP_RETRY_AFTER)}
+
+def stream_response(results, response_options):
+    """Send ranked verses one NDJSON line / SSE event at a time."""
+    stream = response_options['stream']
+    return Response(
+        stream_chat(results, response_options['response_format'], stream),
+        mimetype=STREAM_CONTENT_TYPES[stream],
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 # ==================== API Endpoints ====================
 
@@ -208,6 +219,14 @@ def health():
         'version': '1.0.0'
     })
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness endpoint: warm-up phase and timings (503 until ready)."""
+    status = initializer.status()
+    if status['ready']:
+        return jsonify(status)
+    return jsonify(status), 503, {'Retry-After': str(WARMUP_RETRY_AFTER)}
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint for verse retrieval."""
@@ -219,55 +238,200 @@ def chat():
         if not user_message:
             return jsonify({'error': 'Empty message'}), 400
         
-        if not dataset or model is None:
-            return jsonify({
-                'error': 'Service not ready. Dataset failed to load.'
-            }), 503
+        try:
+            options = parse_search_options(data)
+            response_options = parse_response_options(data)
+            session_id = parse_session_id(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not initializer.wait(WARMUP_WAIT_SECONDS):
+            return service_unavailable()
         
-        # Search for relevant verses
-        results = search_verses_hybrid(
-            dataset,
+        # Search against one snapshot even if a re-index swaps it mid-request
+        index = search_index
+        # Turns of a conversation are searched in its context
+        search = partial(search_in_session, session_id) if session_id else search_verses_hybrid
+        results = search(
+            index.dataset,
             user_message,
             model,
-            corpus_embeddings
+            index.corpus_embeddings,
+            index.keyword_index,
+            index.vector_index,
+            index.filter_index,
+            **options
         )
         
-        # Format response
-        reply = format_response(results)
+        if response_options['stream']:
+            return stream_response(results, response_options)
+        return jsonify(build_chat_response(results, response_options['response_format']))
+    
+    except Exception as e:
+        print(f"Error in chat endpoint: {e}")
+        return jsonify({
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Batch chat endpoint: scores many messages in a single pass."""
+    try:
+        # Get user messages
+        data = request.json
+        messages = data.get('messages')
+        
+        if not isinstance(messages, list) or not messages:
+            return jsonify({'error': "'messages' must be a non-empty list"}), 400
+        
+        if len(messages) > MAX_BATCH_MESSAGES:
+            return jsonify({
+                'error': f'Too many messages (max {MAX_BATCH_MESSAGES})'
+            }), 400
+        
+        try:
+            options = parse_search_options(data)
+            response_format = parse_response_options(data, allow_stream=False)['response_format']
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not initializer.wait(WARMUP_WAIT_SECONDS):
+            return service_unavailable()
+        
+        user_messages = [m.strip() if isinstance(m, str) else '' for m in messages]
+        valid_positions = [i for i, m in enumerate(user_messages) if m]
+        
+        # Search for relevant verses for all non-empty messages at once
+        index = search_index
+        batch_results = search_verses_hybrid_batch(
+            index.dataset,
+            [user_messages[i] for i in valid_positions],
+            model,
+            index.corpus_embeddings,
+            index.keyword_index,
+            index.vector_index,
+            index.filter_index,
+            **options
+        )
         
-        # Prepare structured response
-        verses_data = [
-            {
-                'chapter': r['verse_data'].get('chapter'),
-                'verse': r['verse_data'].get('verse'),
-                'translation': r['verse_data'].get('translation'),
-                'themes': r['verse_data'].get('themes', []),
-                'context': r['verse_data'].get('context'),
-                'score': r['score']
-            }
-            for r in results
-        ]
+        # One chat()-shaped payload per message, in request order
+        responses = [{'error': 'Empty message'} for _ in user_messages]
+        for position, results in zip(valid_positions, batch_results):
+            responses[position] = build_chat_response(results, response_format)
         
+        return jsonify({'results': responses})
+    
+    except Exception as e:
+        print(f"Error in chat batch endpoint: {e}")
         return jsonify({
-            'reply': reply,
-            'verses': verses_data,
-            'confidence_score': max([r['score'] for r in results]) if results else 0
-        })
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/admin/reindex', methods=['POST'])
+def admin_reindex():
+    """Apply a verse delta incrementally and atomically swap the search index."""
+    global search_index, dataset
+    
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        data = request.json
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        delta = data.get('delta', data)
+        
+        if worker_count > 1:
+            return jsonify({
+                'error': f'Live re-indexing is disabled with {worker_count} workers. '
+                         'Apply the delta offline (python -m bhagavadgpt.incremental) and restart the server.'
+            }), 409
+        
+        if not initializer.wait(WARMUP_WAIT_SECONDS):
+            return service_unavailable()
+        
+        with reindex_lock:
+            conflict = reindex_conflict(search_index)
+            if conflict:
+                return jsonify({'error': conflict}), 409
+            
+            try:
+                new_index, stats = apply_delta(search_index, delta, model)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            # Single reference assignment: requests see the old or the new index, never a mix
+            search_index = new_index
+            dataset = new_index.dataset
+            clear_caches()
+            
+            if data.get('persist'):
+                save_dataset(new_index.dataset, DATASET_FILE)
+                stats['persisted'] = True
+                if find_bundle():
+                    print("Warning: The index bundle no longer matches the dataset and will be "
+                          "ignored from the next start; rebuild it with python -m bhagavadgpt.bundle build")
+        
+        return jsonify(stats)
     
     except Exception as e:
-        print(f"Error in chat endpoint: {e}")
+        print(f"Error in admin reindex endpoint: {e}")
         return jsonify({
             'error': 'Internal server error',
             'details': str(e)
         }), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_statistics():
+    """Hit/miss counters and sizes of the query caches."""
+    return jsonify(cache_stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Stage latency histograms and request/cache counters in Prometheus text format."""
+    body = render_prometheus(app_counters(cache_stats(), model, get_reranker()))
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/api/verses/count', methods=['GET'])
 def verse_count():
     """Get total number of verses in dataset."""
+    load_dataset()
+    
     return jsonify({
         'total_verses': len(dataset) if dataset else 0
     })
 
+@app.route('/api/verses/<int:chapter>/<int:verse>/similar', methods=['GET'])
+def similar(chapter, verse):
+    """Verses most like one verse, from the precomputed neighbour graph (no model inference)."""
+    try:
+        try:
+            top_k = parse_similar_top_k(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Lookups only need the index, so they don't wait for model warm-up
+        index = search_index
+        if index is None:
+            if not initializer.wait(WARMUP_WAIT_SECONDS) or search_index is None:
+                return service_unavailable()
+            index = search_index
+        
+        payload = similar_verses(index, chapter, verse, top_k)
+        if payload is None:
+            return jsonify({'error': f'Verse {chapter}.{verse} not found'}), 404
+        return jsonify(payload)
+    
+    except Exception as e:
+        print(f"Error in similar verses endpoint: {e}")
+        return jsonify({
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
 # ==================== Frontend Routes ====================
 
 @app.route('/')
@@ -275,6 +439,12 @@ def index():
     """Serve the main index page."""
     return send_from_directory('public', 'index.html')
 
+# ==================== Warm-up ====================
+
+# Start warm-up at process start (skipped in the reloader's watcher process)
+if WARMUP_ON_START and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    initializer.start()
+
 # ==================== Main ====================
 
 if __name__ == '__main__':
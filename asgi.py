@@ -0,0 +1,389 @@
+"""
+BhagavadGPT - ASGI Server
+Async variant of the chat API with the same /api/health, /api/ready,
+/api/chat, /api/verses/count and /api/verses/<chapter>/<verse>/similar
+contract as app.py, built on the raw ASGI
+interface (no framework). Request parsing and JSON serialization happen on
+the event loop; encoding and scoring run in a bounded thread pool. When
+ASGI_MAX_PENDING requests are already offloaded new ones get a 429, and
+requests taking longer than REQUEST_TIMEOUT seconds get a 504.
+
+The dataset, embeddings, indexes and warm-up are shared with app.py.
+
+    pip install uvicorn
+    uvicorn asgi:app --port 8000
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qsl
+
+import app as webapp
+from bhagavadgpt.cache import cache_stats
+from bhagavadgpt.metrics import SERVER_TIMING, app_counters, finish_request, render_prometheus, start_request
+from bhagavadgpt.neighbors import parse_similar_top_k, similar_verses
+from bhagavadgpt.rerank import get_reranker
+from bhagavadgpt.responses import (
+    STREAM_CONTENT_TYPES,
+    choose_encoding,
+    compress,
+    parse_response_options,
+    should_compress,
+    stream_chat,
+)
+from bhagavadgpt.search import build_chat_response, parse_search_options, search_verses_hybrid
+from bhagavadgpt.sessions import parse_session_id, search_in_session
+from bhagavadgpt.warmup import WARMUP_RETRY_AFTER, WARMUP_WAIT_SECONDS
+
+# ==================== Configuration ====================
+
+# Threads running encode + score (0 = one per CPU core)
+ASGI_EXECUTOR_WORKERS = int(os.environ.get('ASGI_EXECUTOR_WORKERS', 0))
+# Requests allowed in (or queued for) the executor before answering 429
+ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 64))
+# Seconds before an offloaded request is answered with 504
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT', 30))
+# Largest accepted request body
+MAX_BODY_BYTES = 1024 * 1024
+
+# Endpoints that must stay cheap: they never start warm-up
+LIGHTWEIGHT_PATHS = {'/api/health', '/api/ready', '/api/verses/count', '/api/metrics'}
+
+SIMILAR_PATH = re.compile(r'^/api/verses/(?P<chapter>\d+)/(?P<verse>\d+)/similar$')
+
+# (status, JSON payload or plain-text body, extra headers)
+Response = Tuple[int, Any, Dict[str, str]]
+
+class Stream:
+    """Streamed response payload: encoded chunks sent as they are produced."""
+
+    __slots__ = ('chunks', 'content_type')
+
+    def __init__(self, chunks: Iterator[bytes], content_type: str):
+        self.chunks = chunks
+        self.content_type = content_type
+
+class Overloaded(Exception):
+    """Raised when the executor already holds ASGI_MAX_PENDING requests."""
+
+class BhagavadASGI:
+    """
+    ASGI application. Handlers are coroutines returning
+    (status, payload, headers); blocking work goes through `offload`.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = ASGI_EXECUTOR_WORKERS,
+        max_pending: int = ASGI_MAX_PENDING,
+        timeout: float = REQUEST_TIMEOUT
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='asgi-search')
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._pending_lock = threading.Lock()
+        self.routes: Dict[Tuple[str, str], Callable] = {
+            ('GET', '/api/health'): self.health,
+            ('GET', '/api/ready'): self.ready,
+            ('POST', '/api/chat'): self.chat,
+            ('GET', '/api/verses/count'): self.verse_count,
+            ('GET', '/api/metrics'): self.metrics,
+        }
+        # Routes with path parameters, passed to the handler as keyword arguments
+        self.pattern_routes: List[Tuple[str, Pattern, Callable]] = [
+            ('GET', SIMILAR_PATH, self.similar),
+        ]
+
+    # ==================== Executor ====================
+
+    def _release(self, future) -> None:
+        with self._pending_lock:
+            self.pending -= 1
+
+    async def offload(self, function: Callable, *args) -> Any:
+        """
+        Run `function(*args)` in the bounded executor. Raises Overloaded
+        instead of queueing past max_pending, and asyncio.TimeoutError after
+        `timeout` seconds (the slot is only freed once the work finishes).
+        """
+        with self._pending_lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded()
+            self.pending += 1
+
+        # Copy the context so stage timings land on this request
+        future = self.executor.submit(contextvars.copy_context().run, function, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+    # ==================== ASGI Interface ====================
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        method = scope['method']
+        handler, params, known_path = self.route(method, scope['path'])
+        # cProfile only sees the event loop thread here, so never sample
+        timings = start_request(profile=False)
+        if method == 'OPTIONS':
+            response = (204, None, {
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type',
+            })
+        elif handler is None:
+            response = (405, {'error': 'Method not allowed'}, {}) if known_path else (404, {'error': 'Not found'}, {})
+        else:
+            if scope['path'] not in LIGHTWEIGHT_PATHS:
+                webapp.initializer.start()
+            response = await self.respond(handler, scope, receive, params)
+
+        status, payload, headers = response
+        if SERVER_TIMING:
+            headers = {**headers, 'Server-Timing': timings.server_timing()}
+        finish_request(timings, handler.__name__ if handler else 'unmatched', status)
+        await self.send_response(send, status, payload, headers, header(scope, b'accept-encoding'))
+
+    def route(self, method: str, path: str) -> Tuple[Optional[Callable], Dict[str, str], bool]:
+        """(handler or None, path parameters, whether any method serves `path`)."""
+        handler = self.routes.get((method, path))
+        if handler is not None:
+            return handler, {}, True
+
+        known_path = any(route_path == path for _, route_path in self.routes)
+        for route_method, pattern, route_handler in self.pattern_routes:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return route_handler, match.groupdict(), True
+                known_path = True
+        return None, {}, known_path
+
+    async def respond(self, handler: Callable, scope, receive, params: Optional[Dict[str, str]] = None) -> Response:
+        """Run a handler, mapping overload, timeouts and errors to responses."""
+        try:
+            if scope['method'] == 'POST':
+                body = await read_body(receive)
+                if body is None:
+                    return 413, {'error': f'Request body too large (max {MAX_BODY_BYTES} bytes)'}, {}
+                try:
+                    data = json.loads(body or b'null')
+                except ValueError:
+                    return 400, {'error': 'Invalid JSON'}, {}
+                if not isinstance(data, dict):
+                    return 400, {'error': 'Expected a JSON object'}, {}
+                return await handler(data)
+            if params:
+                return await handler(**params, query=dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'))))
+            return await handler()
+
+        except Overloaded:
+            return 429, {'error': 'Server busy. Please retry shortly.'}, {'Retry-After': '1'}
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return 504, {'error': f'Request timed out after {self.timeout:g}s'}, {}
+        except Exception as e:
+            print(f"Error in ASGI endpoint {scope['path']}: {e}")
+            return 500, {'error': 'Internal server error', 'details': str(e)}, {}
+
+    async def lifespan(self, receive, send) -> None:
+        """Start warm-up with the server and stop the executor on shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                webapp.initializer.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def send_response(
+        send,
+        status: int,
+        payload: Any,
+        headers: Dict[str, str],
+        accept_encoding: Optional[str] = None
+    ) -> None:
+        """
+        Send a JSON payload (or a str body as plain text, or a Stream chunk by
+        chunk) with CORS headers, compressing larger bodies the client accepts.
+        """
+        raw_headers = [(b'access-control-allow-origin', b'*')]
+        raw_headers += [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+
+        if isinstance(payload, Stream):
+            raw_headers += [(b'content-type', payload.content_type.encode('latin-1')),
+                            (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]
+            await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+            for chunk in payload.chunks:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = b'' if payload is None else json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            content_type = 'application/json'
+
+        if should_compress(content_type, len(body)):
+            raw_headers.append((b'vary', b'Accept-Encoding'))
+            encoding = choose_encoding(accept_encoding)
+            if encoding:
+                body = compress(body, encoding)
+                raw_headers.append((b'content-encoding', encoding.encode('ascii')))
+
+        raw_headers += [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ]
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # ==================== API Endpoints ====================
+
+    async def health(self) -> Response:
+        """Health check endpoint."""
+        return 200, {'status': 'healthy', 'service': 'BhagavadGPT', 'version': '1.0.0'}, {}
+
+    async def ready(self) -> Response:
+        """Readiness endpoint: warm-up phase and timings (503 until ready)."""
+        status = webapp.initializer.status()
+        if status['ready']:
+            return 200, status, {}
+        return 503, status, {'Retry-After': str(WARMUP_RETRY_AFTER)}
+
+    async def chat(self, data: Dict[str, Any]) -> Response:
+        """Main chat endpoint for verse retrieval."""
+        message = data.get('message', '')
+        user_message = message.strip() if isinstance(message, str) else ''
+        if not user_message:
+            return 400, {'error': 'Empty message'}, {}
+
+        try:
+            options = parse_search_options(data)
+            response_options = parse_response_options(data)
+            session_id = parse_session_id(data)
+        except ValueError as e:
+            return 400, {'error': str(e)}, {}
+
+        if not await self.warmed_up():
+            return service_unavailable()
+
+        stream = response_options['stream']
+        if stream:
+            results = await self.offload(run_search, user_message, options, session_id)
+            chunks = stream_chat(results, response_options['response_format'], stream)
+            return 200, Stream(chunks, STREAM_CONTENT_TYPES[stream]), {}
+        return 200, await self.offload(run_chat, user_message, options, response_options['response_format'], session_id), {}
+
+    async def verse_count(self) -> Response:
+        """Get total number of verses in dataset."""
+        dataset = await asyncio.get_running_loop().run_in_executor(None, webapp.load_dataset)
+        return 200, {'total_verses': len(dataset) if dataset else 0}, {}
+
+    async def similar(self, chapter: str, verse: str, query: Dict[str, str]) -> Response:
+        """Verses most like one verse, from the precomputed neighbour graph (no model inference)."""
+        try:
+            top_k = parse_similar_top_k(query)
+        except ValueError as e:
+            return 400, {'error': str(e)}, {}
+
+        # Lookups only need the index, so they don't wait for model warm-up
+        if webapp.search_index is None and (not await self.warmed_up() or webapp.search_index is None):
+            return service_unavailable()
+
+        # O(top_k) array reads, cheap enough to run on the event loop
+        chapter, verse = int(chapter), int(verse)
+        payload = similar_verses(webapp.search_index, chapter, verse, top_k)
+        if payload is None:
+            return 404, {'error': f'Verse {chapter}.{verse} not found'}, {}
+        return 200, payload, {}
+
+    async def metrics(self) -> Response:
+        """Stage latency histograms and request/cache counters in Prometheus text format."""
+        return 200, render_prometheus(app_counters(cache_stats(), webapp.model, get_reranker())), {}
+
+    async def warmed_up(self) -> bool:
+        """Wait up to WARMUP_WAIT_SECONDS for warm-up without blocking the event loop."""
+        if webapp.initializer.ready or WARMUP_WAIT_SECONDS <= 0:
+            return webapp.initializer.ready
+        return await asyncio.get_running_loop().run_in_executor(
+            None, webapp.initializer.wait, WARMUP_WAIT_SECONDS
+        )
+
+# ==================== Helper Functions ====================
+
+async def read_body(receive) -> Optional[bytes]:
+    """Read the full request body, or None if it exceeds MAX_BODY_BYTES."""
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+def header(scope, name: bytes) -> Optional[str]:
+    """First value of a request header (lower-case name), if present."""
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+def run_search(user_message: str, options: Dict[str, Any], session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Encode and score one message, in its session's context if any (runs in the executor)."""
+    # Search against one snapshot even if a re-index swaps it mid-request
+    index = webapp.search_index
+    search = partial(search_in_session, session_id) if session_id else search_verses_hybrid
+    return search(
+        index.dataset,
+        user_message,
+        webapp.model,
+        index.corpus_embeddings,
+        index.keyword_index,
+        index.vector_index,
+        index.filter_index,
+        **options
+    )
+
+def run_chat(
+    user_message: str,
+    options: Dict[str, Any],
+    response_format: str = 'both',
+    session_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Search and build the chat payload (runs in the executor)."""
+    return build_chat_response(run_search(user_message, options, session_id), response_format)
+
+def service_unavailable() -> Response:
+    """Fast 503 with Retry-After while warm-up is running (or has failed)."""
+    status = webapp.initializer.status()
+    if status['phase'] == 'failed':
+        error = f"Service not ready. {status['error']}."
+    else:
+        error = 'Service warming up. Please retry shortly.'
+    return 503, {'error': error, 'phase': status['phase']}, {'Retry-After': str(WARMUP_RETRY_AFTER)}
+
+app = BhagavadASGI()
@@ -0,0 +1,4 @@
+"""
+BhagavadGPT - Benchmarks
+Offline performance and quality benchmarks, run with `python -m benchmarks.<name>`.
+"""
@@ -0,0 +1,74 @@
+"""
+ANN recall benchmark: IVF vs exact search on synthetic or cached embeddings.
+
+    python -m benchmarks.ann_recall --sizes 10000 100000 --nprobe 4 8 16
+    python -m benchmarks.ann_recall --embeddings embeddings/embeddings.npy
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from bhagavadgpt.vector_index import ExactIndex, IVFIndex
+
+def synthetic_embeddings(num_vectors: int, dim: int, num_topics: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors, roughly shaped like sentence embeddings of a topical corpus."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((num_topics, dim)).astype(np.float32)
+    vectors = topics[rng.integers(0, num_topics, num_vectors)] + 0.6 * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """Fraction of the exact top-k found by the approximate search."""
+    hits = sum(len(set(a[a >= 0]) & set(e)) for a, e in zip(approx_ids, exact_ids))
+    return hits / exact_ids.size
+
+def run(embeddings: np.ndarray, queries: np.ndarray, k: int, nprobes: List[int]) -> None:
+    exact = ExactIndex(embeddings)
+    start = time.perf_counter()
+    exact_ids, _ = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(embeddings)
+    build_s = time.perf_counter() - start
+
+    print(f"\nN={embeddings.shape[0]:,} dim={embeddings.shape[1]} nlist={ivf.nlist} build={build_s:.1f}s")
+    print(f"{'backend':<14}{'recall@' + str(k):>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        start = time.perf_counter()
+        ivf_ids, _ = ivf.search(queries, k)
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{'ivf/' + str(nprobe):<14}{recall_at_k(ivf_ids, exact_ids):>10.3f}{ivf_ms:>12.3f}{exact_ms / ivf_ms:>10.1f}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure IVF recall and latency against exact search")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--embeddings', help="Use a cached embeddings .npy instead of synthetic data")
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed + 1)
+    if args.embeddings:
+        embeddings = np.load(args.embeddings, mmap_mode='r')
+        queries = np.asarray(embeddings[rng.choice(embeddings.shape[0], args.queries)])
+        queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+        run(embeddings, queries / np.linalg.norm(queries, axis=1, keepdims=True), args.k, args.nprobe)
+        return 0
+
+    for size in args.sizes:
+        data = synthetic_embeddings(size + args.queries, args.dim, max(8, size // 500), args.seed)
+        run(data[:size], data[size:], args.k, args.nprobe)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Shared benchmark fixtures: synthetic verse corpora, offline stand-in
+encoders and the golden query set.
+"""
+
+import json
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from bhagavadgpt.keyword_index import tokenize
+
+WORDS = ("duty action peace mind devotion knowledge detachment fear anger desire "
+         "self soul yoga wisdom surrender faith truth war sorrow joy").split()
+NUM_CHAPTERS = 50
+
+GOLDEN_QUERIES_FILE = Path(__file__).parent / 'golden_queries.json'
+
+class FixedEncoder:
+    """Stand-in encoder returning precomputed query vectors (no model needed)."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.calls = 0
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        start = self.calls
+        self.calls += len(texts)
+        return self.vectors[np.arange(start, start + len(texts)) % len(self.vectors)]
+
+class HashingEncoder:
+    """
+    Deterministic offline encoder: signed feature hashing of word tokens and
+    their 5-character prefixes (so 'anxious' and 'anxiety' share a feature).
+    A lexical stand-in for the sentence model with the same interface.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model_name = f'hashing-stub-{dim}'
+        self.loaded = True
+
+    def load(self):
+        return self
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            for feature in {token, token[:5]}:
+                digest = zlib.crc32(feature.encode('utf-8'))
+                vector[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        return vector
+
+    def encode(
+        self,
+        sentences,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        batch_size: int = 32
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            embeddings[row] = self._vector(text)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+def synthetic_dataset(size: int, seed: int) -> List[dict]:
+    """Verses spread evenly over NUM_CHAPTERS chapters with random word fields."""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'chapter': i % NUM_CHAPTERS + 1,
+            'verse': i // NUM_CHAPTERS + 1,
+            'themes': list(rng.choice(WORDS, 2, replace=False)),
+            'keywords': list(rng.choice(WORDS, 3, replace=False)),
+            'translation': " ".join(rng.choice(WORDS, 12)),
+        }
+        for i in range(size)
+    ]
+
+def synthetic_queries(count: int, seed: int) -> List[str]:
+    """Distinct short questions over the synthetic vocabulary."""
+    rng = np.random.default_rng(seed + 1)
+    return [f"how does {' and '.join(rng.choice(WORDS, 3, replace=False))} relate ({i})" for i in range(count)]
+
+def load_golden(path: Path = GOLDEN_QUERIES_FILE) -> List[Dict[str, Any]]:
+    """Golden queries: [{'query': str, 'expected': [[chapter, verse], ...]}, ...]."""
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)['queries']
@@ -0,0 +1,118 @@
+"""
+Encoder micro-batching benchmark: closed-loop threads encoding one query at
+a time, with and without the BatchingEncoder coalescer, reporting
+throughput and p50/p99 latency per concurrency level.
+
+By default a simulated encoder stands in for the model: a fixed per-call
+overhead plus a per-sentence cost, with calls serialized the way forward
+passes that each use every core are; --model measures the real encoder.
+
+    python -m benchmarks.encode_batching --concurrency 1 4 16 64
+    python -m benchmarks.encode_batching --model --max-wait-ms 0 2 5
+"""
+
+import argparse
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bhagavadgpt.batching import BatchingEncoder, ENCODE_MAX_BATCH
+from bhagavadgpt.encoder import create_encoder
+from bhagavadgpt.search import MODEL_NAME
+
+class SimulatedEncoder:
+    """
+    Encoder whose cost is `overhead_ms + per_sentence_ms * len(texts)`.
+    Calls hold one lock (the cores) and sleep without the GIL.
+    """
+
+    def __init__(self, overhead_ms: float, per_sentence_ms: float, dim: int = 384):
+        self.overhead = overhead_ms / 1000
+        self.per_sentence = per_sentence_ms / 1000
+        self.dim = dim
+        self.model_name = 'simulated'
+        self.loaded = True
+        self._device = threading.Lock()
+
+    def load(self):
+        return self
+
+    def encode(self, sentences, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        with self._device:
+            time.sleep(self.overhead + self.per_sentence * len(texts))
+        embeddings = np.ones((len(texts), self.dim), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.sqrt(self.dim)
+        return embeddings[0] if single else embeddings
+
+def run_load(encoder, concurrency: int, duration: float) -> Dict[str, float]:
+    """Closed loop: each thread encodes its next unique query as soon as the last returns."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(client_id: int) -> None:
+        local = []
+        count = 0
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            encoder.encode([f"how do I find peace {client_id}-{count}"], normalize_embeddings=True)
+            local.append(time.perf_counter() - start)
+            count += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare direct and micro-batched query encoding")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--max-wait-ms', type=float, nargs='+', default=[0.0, 2.0])
+    parser.add_argument('--max-batch', type=int, default=ENCODE_MAX_BATCH)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--model', action='store_true', help="Use the configured encoder instead of a simulated one")
+    parser.add_argument('--overhead-ms', type=float, default=4.0, help="Simulated per-call cost")
+    parser.add_argument('--per-sentence-ms', type=float, default=0.3, help="Simulated per-sentence cost")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        encoder = create_encoder(MODEL_NAME)
+        encoder.encode(["warm up"])
+    else:
+        encoder = SimulatedEncoder(args.overhead_ms, args.per_sentence_ms)
+
+    print(f"encoder={encoder.model_name} max_batch={args.max_batch} duration={args.duration}s")
+    print(f"{'clients':<9}{'mode':<16}{'req/s':>10}{'speedup':>9}{'p50 ms':>10}{'p99 ms':>10}{'batch':>8}")
+    for concurrency in args.concurrency:
+        direct = run_load(encoder, concurrency, args.duration)
+        print(f"{concurrency:<9}{'direct':<16}{direct['rps']:>10.1f}{'1.00x':>9}"
+              f"{direct['p50_ms']:>10.2f}{direct['p99_ms']:>10.2f}{1.0:>8.1f}")
+        for max_wait_ms in args.max_wait_ms:
+            batcher = BatchingEncoder(encoder, max_batch=args.max_batch, max_wait_ms=max_wait_ms)
+            stats = run_load(batcher, concurrency, args.duration)
+            mode = f"batched {max_wait_ms:g}ms"
+            print(f"{'':<9}{mode:<16}{stats['rps']:>10.1f}{stats['rps'] / direct['rps']:>8.2f}x"
+                  f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                  f"{batcher.stats()['mean_batch_size']:>8.1f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Filter selectivity benchmark: ranking latency with metadata pre-filters of
+decreasing selectivity vs an unfiltered search, on a synthetic corpus.
+
+    python -m benchmarks.filter_selectivity --sizes 10000 100000
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+from benchmarks.ann_recall import synthetic_embeddings
+from benchmarks.corpus import NUM_CHAPTERS, WORDS, FixedEncoder, synthetic_dataset
+from bhagavadgpt.filters import FilterIndex, parse_filters
+from bhagavadgpt.keyword_index import KeywordIndex
+from bhagavadgpt.search import rank_queries
+
+def run(size: int, dim: int, num_queries: int, repeats: int, seed: int) -> None:
+    data = synthetic_embeddings(size + num_queries, dim, max(8, size // 500), seed)
+    embeddings, queries = data[:size], data[size:]
+    dataset = synthetic_dataset(size, seed)
+    keyword_index = KeywordIndex.build(dataset)
+    filter_index = FilterIndex.build(dataset)
+    model = FixedEncoder(queries)
+    texts = [f"{WORDS[i % len(WORDS)]} and {WORDS[(i * 7) % len(WORDS)]} question {i}" for i in range(num_queries)]
+
+    # Chapter filters keeping 100%, 50%, 10% and 2% of the corpus
+    cases = [('unfiltered', None)] + [
+        (f"{n}/{NUM_CHAPTERS} chapters", parse_filters({'filters': {'chapter': list(range(1, n + 1))}}))
+        for n in (50, 25, 5, 1)
+    ]
+
+    print(f"\nN={size:,} dim={dim} queries={num_queries}")
+    print(f"{'filter':<18}{'rows':>10}{'ms/query':>12}{'vs unfiltered':>15}")
+    baseline = None
+    for name, filters in cases:
+        rows = size if filters is None else filter_index.rows(filters).size
+        rank_queries(dataset, texts, model, embeddings, keyword_index, None, filter_index, filters=filters)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                rank_queries(dataset, [text], model, embeddings, keyword_index, None, filter_index, filters=filters)
+        ms = (time.perf_counter() - start) * 1000 / (repeats * num_queries)
+        baseline = baseline or ms
+        print(f"{name:<18}{rows:>10,}{ms:>12.3f}{baseline / ms:>14.1f}x")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure ranking latency under metadata filters")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        run(size, args.dim, args.queries, args.repeats, args.seed)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Load test for the pre-fork server: closed-loop HTTP clients posting
+/api/chat, reporting throughput and latency percentiles. With --workers it
+starts serve.py once per worker count so throughput can be compared as
+workers (and cores) are added.
+
+    python -m benchmarks.load_test --workers 1 2 4 --concurrency 16 --duration 20
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 16
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+QUERIES = [
+    "I feel anxious about the future",
+    "how do I find inner peace",
+    "what is my duty in life",
+    "how to control anger",
+    "I am afraid of failure",
+    "what happens after death",
+    "how can I stop overthinking",
+    "what is true devotion",
+]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_ready(url: str, timeout: float) -> bool:
+    """Poll /api/ready until several consecutive 200s (every worker warmed up)."""
+    parsed = urlparse(url)
+    deadline = time.time() + timeout
+    streak = 0
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=5)
+            conn.request('GET', '/api/ready')
+            status = conn.getresponse().status
+            conn.close()
+        except OSError:
+            status = None
+        streak = streak + 1 if status == 200 else 0
+        if streak >= 20:
+            return True
+        time.sleep(0.05 if status == 200 else 0.5)
+    return False
+
+def run_load(url: str, concurrency: int, duration: float, unique: bool) -> Dict[str, float]:
+    """Closed-loop load: each client sends its next request when the last returns."""
+    parsed = urlparse(url)
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(client_id: int) -> None:
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+        count = 0
+        local: List[float] = []
+        local_errors = 0
+        while time.perf_counter() < stop_at:
+            message = QUERIES[(client_id + count) % len(QUERIES)]
+            if unique:
+                # Defeat the per-worker result/query caches
+                message = f"{message} ({client_id}-{count})"
+            body = json.dumps({'message': message})
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/api/chat', body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+            local.append(time.perf_counter() - start)
+            count += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+def print_row(label: str, stats: Dict[str, float], baseline: Optional[float]) -> None:
+    scale = f"{stats['rps'] / baseline:.2f}x" if baseline else '1.00x'
+    print(f"{label:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>10.1f}{scale:>9}"
+          f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Throughput / latency load test for /api/chat")
+    parser.add_argument('--url', help="Test an already running server instead of starting serve.py")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help="Worker counts to start serve.py with (ignored with --url)")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--unique', action='store_true', help="Make every query unique (no cache hits)")
+    parser.add_argument('--ready-timeout', type=float, default=300.0)
+    args = parser.parse_args(argv)
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s cores={os.cpu_count()} unique={args.unique}")
+    print(f"{'workers':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'scale':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+    if args.url:
+        print_row('-', run_load(args.url, args.concurrency, args.duration, args.unique), None)
+        return 0
+
+    root = Path(__file__).parent.parent
+    baseline = None
+    for workers in args.workers:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, str(root / 'serve.py'), '--host', '127.0.0.1', '--port', str(port),
+             '--workers', str(workers)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_ready(url, args.ready_timeout):
+                print(f"{workers:<10}server did not become ready")
+                continue
+            stats = run_load(url, args.concurrency, args.duration, args.unique)
+            baseline = baseline or stats['rps']
+            print_row(str(workers), stats, baseline)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Quantization benchmark: memory, latency and ranking agreement of float16 /
+int8 corpus embeddings (with and without full-precision rescoring) against
+float32 cosine similarity, on synthetic or cached embeddings.
+
+    python -m benchmarks.quantization --sizes 10000 100000
+    python -m benchmarks.quantization --embeddings embeddings/embeddings.npy
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from benchmarks.ann_recall import recall_at_k, synthetic_embeddings
+from benchmarks.corpus import FixedEncoder, synthetic_dataset
+from bhagavadgpt.keyword_index import KeywordIndex
+from bhagavadgpt.quantization import QuantizedEmbeddings
+from bhagavadgpt.search import rank_queries, top_k_indices
+
+def ranked_ids(results: List[List[dict]], dataset: List[dict]) -> np.ndarray:
+    """Corpus row ids of ranked results (padded with -1)."""
+    row_of = {id(item): row for row, item in enumerate(dataset)}
+    width = max(len(r) for r in results)
+    ids = np.full((len(results), width), -1, dtype=np.int64)
+    for i, r in enumerate(results):
+        ids[i, :len(r)] = [row_of[id(hit['verse_data'])] for hit in r]
+    return ids
+
+def run(embeddings: np.ndarray, queries: np.ndarray, k: int, repeats: int, seed: int) -> None:
+    size = embeddings.shape[0]
+    dataset = synthetic_dataset(size, seed)
+    keyword_index = KeywordIndex.build(dataset)
+    texts = [f"query {i}" for i in range(len(queries))]
+    float32_bytes = size * embeddings.shape[1] * 4
+
+    def timed(corpus):
+        model = FixedEncoder(queries)
+        results = rank_queries(dataset, texts, model, corpus, keyword_index, top_k=k, min_score=-1.0)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for i, text in enumerate(texts):
+                model.calls = i
+                rank_queries(dataset, [text], model, corpus, keyword_index, top_k=k, min_score=-1.0)
+        return results, (time.perf_counter() - start) * 1000 / (repeats * len(texts))
+
+    # Reference: float32 cosine similarity (what pytorch_cos_sim returned)
+    exact_results, exact_ms = timed(np.asarray(embeddings, dtype=np.float32))
+    exact_ids = ranked_ids(exact_results, dataset)
+    exact_cosine_top = top_k_indices(queries @ np.asarray(embeddings).T, k)
+
+    print(f"\nN={size:,} dim={embeddings.shape[1]} queries={len(queries)} k={k}")
+    print(f"{'storage':<10}{'MB':>9}{'saved':>8}{'ms/query':>10}{'recall@k':>10}{'same order':>12}{'recall@k (no rescore)':>24}")
+    print(f"{'float32':<10}{float32_bytes / 1e6:>9.1f}{'-':>8}{exact_ms:>10.3f}{1.0:>10.3f}{1.0:>12.3f}{1.0:>24.3f}")
+
+    for dtype in ('float16', 'int8'):
+        quantized = QuantizedEmbeddings.quantize(embeddings, dtype, full=embeddings)
+        results, ms = timed(quantized)
+        ids = ranked_ids(results, dataset)
+        same_order = float(np.mean([np.array_equal(a, b) for a, b in zip(ids, exact_ids)]))
+        approx_top = top_k_indices(quantized.dot(queries), k)
+        print(f"{dtype:<10}{quantized.nbytes / 1e6:>9.1f}{1 - quantized.nbytes / float32_bytes:>7.0%}"
+              f"{ms:>10.3f}{recall_at_k(ids, exact_ids):>10.3f}{same_order:>12.3f}"
+              f"{recall_at_k(approx_top, exact_cosine_top):>24.3f}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare quantized and float32 embedding search")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--embeddings', help="Use a cached embeddings .npy instead of synthetic data")
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed + 1)
+    if args.embeddings:
+        embeddings = np.load(args.embeddings, mmap_mode='r')
+        queries = np.asarray(embeddings[rng.choice(embeddings.shape[0], args.queries)])
+        queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+        run(embeddings, queries / np.linalg.norm(queries, axis=1, keepdims=True), args.k, args.repeats, args.seed)
+        return 0
+
+    for size in args.sizes:
+        data = synthetic_embeddings(size + args.queries, args.dim, max(8, size // 500), args.seed)
+        run(data[:size], data[size:], args.k, args.repeats, args.seed)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+Search benchmark suite for the hybrid search pipeline.
+
+On synthetic corpora of increasing size it measures:
+- cold start (empty caches) and warm start (verse store and embedding cache reused)
+- per-stage query latency: tokenize, keyword score, encode, similarity, top-k, format
+- single-query and batched throughput
+- resident and peak memory
+
+Each size runs in a fresh process so start-up and memory figures are not
+skewed by earlier runs. It also scores the golden query set
+(golden_queries.json) against the real dataset and reports recall@k and MRR.
+
+Everything uses the deterministic HashingEncoder stub unless --model is
+given, so the suite runs offline. Stub numbers track changes to scoring,
+keyword extraction and the search text; use --model for real relevance.
+With --reranker the golden set is scored a second time with the local
+cross-encoder reranking each shortlist, to compare against hybrid only.
+
+    python -m benchmarks.search_suite --sizes 1000 10000 100000
+    python -m benchmarks.search_suite --golden-only --model --fail-under 0.5
+    python -m benchmarks.search_suite --golden-only --model --reranker reranker_model
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.corpus import HashingEncoder, load_golden, synthetic_dataset, synthetic_queries
+
+STAGES = ('tokenize', 'keyword', 'encode', 'similarity', 'top_k', 'format', 'total')
+RECALL_KS = (1, 3, 5, 10)
+
+def make_encoder(use_model: bool):
+    """The configured sentence model, or the offline hashing stub."""
+    if use_model:
+        from bhagavadgpt.search import MODEL_NAME, load_model
+        return load_model(MODEL_NAME)
+    return HashingEncoder()
+
+def load_everything(dataset_file: str, cache_dir: str, encoder):
+    """What app.py does at start-up: verse store, embeddings, indexes, warm model."""
+    from bhagavadgpt.search import preprocess_and_embed_dataset, warm_up_model
+    from bhagavadgpt.search_index import SearchIndex
+    from bhagavadgpt.verse_store import load_verse_store
+
+    dataset = load_verse_store(dataset_file, cache_dir)
+    model, corpus_embeddings = preprocess_and_embed_dataset(dataset, cache_dir=cache_dir, model=encoder)
+    index = SearchIndex.build(dataset, corpus_embeddings)
+    warm_up_model(model)
+    return model, index
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), else the peak."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+def stage_latencies(index, model, queries: List[str], top_k: int) -> Dict[str, List[float]]:
+    """Time each stage of one hybrid search, query by query, in milliseconds."""
+    from bhagavadgpt.cache import clear_caches
+    from bhagavadgpt.quantization import QuantizedEmbeddings
+    from bhagavadgpt.search import (
+        DEFAULT_SEMANTIC_WEIGHT, build_chat_response, encode_texts, extract_keywords,
+        search_verses_hybrid, top_k_indices,
+    )
+
+    weight = DEFAULT_SEMANTIC_WEIGHT
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    def lap(stage: str, started: float) -> float:
+        now = time.perf_counter()
+        timings[stage].append((now - started) * 1000)
+        return now
+
+    for query in queries:
+        start = time.perf_counter()
+        keywords = extract_keywords(query)
+        start = lap('tokenize', start)
+        keyword_scores = index.keyword_index.score(keywords)
+        start = lap('keyword', start)
+        query_embedding = encode_texts(model, [query])[0]
+        start = lap('encode', start)
+        if isinstance(index.corpus_embeddings, QuantizedEmbeddings):
+            cosine_scores = index.corpus_embeddings.dot(query_embedding)[0]
+        else:
+            cosine_scores = index.corpus_embeddings @ query_embedding
+        combined = weight * cosine_scores + (1.0 - weight) * keyword_scores
+        start = lap('similarity', start)
+        best = top_k_indices(combined, top_k)[0]
+        start = lap('top_k', start)
+        build_chat_response([{'verse_data': index.dataset[i], 'score': float(combined[i])} for i in best])
+        lap('format', start)
+
+        clear_caches()
+        start = time.perf_counter()
+        search_verses_hybrid(
+            index.dataset, query, model, index.corpus_embeddings, index.keyword_index,
+            index.vector_index, index.filter_index, top_k=top_k
+        )
+        lap('total', start)
+
+    return timings
+
+def run_size(size: int, num_queries: int, top_k: int, use_model: bool, seed: int) -> Dict[str, Any]:
+    """Benchmark one corpus size (runs in its own process)."""
+    started = time.perf_counter()
+    from bhagavadgpt.cache import clear_caches
+    from bhagavadgpt.search import search_verses_hybrid_batch
+    import_ms = (time.perf_counter() - started) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_file = str(Path(tmp) / 'dataset.json')
+        with open(dataset_file, 'w', encoding='utf-8') as file:
+            json.dump(synthetic_dataset(size, seed), file)
+        encoder = make_encoder(use_model)
+
+        start = time.perf_counter()
+        load_everything(dataset_file, tmp, encoder)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        model, index = load_everything(dataset_file, tmp, encoder)
+        warm_ms = (time.perf_counter() - start) * 1000
+
+        queries = synthetic_queries(num_queries, seed)
+        timings = stage_latencies(index, model, queries, top_k)
+
+        clear_caches()
+        start = time.perf_counter()
+        search_verses_hybrid_batch(
+            index.dataset, queries, model, index.corpus_embeddings, index.keyword_index,
+            index.vector_index, index.filter_index, top_k=top_k
+        )
+        batch_s = time.perf_counter() - start
+
+        return {
+            'size': size,
+            'import_ms': import_ms,
+            'cold_start_ms': cold_ms,
+            'warm_start_ms': warm_ms,
+            'stages': {
+                stage: {
+                    'p50': float(np.percentile(values, 50)),
+                    'p95': float(np.percentile(values, 95)),
+                    'mean': float(np.mean(values)),
+                }
+                for stage, values in timings.items()
+            },
+            'qps': 1000 * len(queries) / sum(timings['total']),
+            'batch_qps': len(queries) / batch_s,
+            'rss_mb': rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+def golden_metrics(dataset_file: str, use_model: bool, top_k: int, rerank: bool = False) -> Dict[str, Any]:
+    """
+    recall@k (share of expected verses found) and MRR over the golden
+    queries, plus the mean search time per query.
+    """
+    from bhagavadgpt.search import search_verses_hybrid_batch
+    from bhagavadgpt.search_index import verse_key
+
+    golden = load_golden()
+    with tempfile.TemporaryDirectory() as tmp:
+        model, index = load_everything(dataset_file, tmp, make_encoder(use_model))
+        start = time.perf_counter()
+        results = search_verses_hybrid_batch(
+            index.dataset, [g['query'] for g in golden], model, index.corpus_embeddings,
+            index.keyword_index, index.vector_index, index.filter_index,
+            top_k=top_k, min_score=-1.0, rerank=rerank
+        )
+        elapsed = time.perf_counter() - start
+        fallbacks = 0
+        if rerank:
+            from bhagavadgpt.rerank import get_reranker
+            fallbacks = get_reranker().stats()['fallbacks']
+
+    recall = {k: [] for k in RECALL_KS if k <= top_k}
+    reciprocal_ranks = []
+    misses = []
+    for item, hits in zip(golden, results):
+        expected = {tuple(pair) for pair in item['expected']}
+        ranked = [verse_key(hit['verse_data']) for hit in hits]
+        for k in recall:
+            recall[k].append(len(expected & set(ranked[:k])) / len(expected))
+        first = next((rank for rank, key in enumerate(ranked, 1) if key in expected), None)
+        reciprocal_ranks.append(1.0 / first if first else 0.0)
+        if first is None:
+            misses.append(item['query'])
+
+    return {
+        'queries': len(golden),
+        'recall': {k: float(np.mean(values)) for k, values in recall.items()},
+        'mrr': float(np.mean(reciprocal_ranks)),
+        'ms_per_query': 1000 * elapsed / len(golden),
+        'rerank_fallbacks': fallbacks,
+        'misses': misses,
+    }
+
+def print_sizes(reports: List[Dict[str, Any]]) -> None:
+    print(f"{'N':>9}{'import ms':>11}{'cold ms':>10}{'warm ms':>10}{'q/s':>9}{'batch q/s':>11}{'RSS MB':>9}{'peak MB':>9}")
+    for r in reports:
+        print(f"{r['size']:>9,}{r['import_ms']:>11.0f}{r['cold_start_ms']:>10.0f}{r['warm_start_ms']:>10.0f}"
+              f"{r['qps']:>9.1f}{r['batch_qps']:>11.1f}{r['rss_mb']:>9.0f}{r['peak_rss_mb']:>9.0f}")
+
+    for stat in ('p50', 'p95'):
+        print(f"\n{stat} ms per stage")
+        print(f"{'N':>9}" + "".join(f"{stage:>12}" for stage in STAGES))
+        for r in reports:
+            print(f"{r['size']:>9,}" + "".join(f"{r['stages'][stage][stat]:>12.3f}" for stage in STAGES))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Latency, throughput, memory and relevance of hybrid search")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200, help="Queries timed per corpus size")
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--model', action='store_true', help="Use the sentence model instead of the hashing stub")
+    parser.add_argument('--dataset', default='bhagavad_gita_dataset_expanded.json', help="Dataset for the golden set")
+    parser.add_argument('--golden-only', action='store_true')
+    parser.add_argument('--skip-golden', action='store_true')
+    parser.add_argument('--reranker', help="Local cross-encoder directory; also score the golden set reranked")
+    parser.add_argument('--fail-under', type=float, default=None, help="Exit 1 if golden MRR is below this")
+    parser.add_argument('--json', help="Also write all results to this file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--child-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.reranker:
+        # Read by bhagavadgpt.rerank, which is only imported below
+        os.environ['RERANKER_MODEL_PATH'] = args.reranker
+
+    if args.child_size:
+        print(json.dumps(run_size(args.child_size, args.queries, args.top_k, args.model, args.seed)))
+        return 0
+
+    report: Dict[str, Any] = {'encoder': 'model' if args.model else HashingEncoder().model_name}
+    print(f"encoder={report['encoder']} queries={args.queries} top_k={args.top_k}\n")
+
+    if not args.golden_only:
+        report['sizes'] = []
+        for size in args.sizes:
+            command = [sys.executable, '-m', 'benchmarks.search_suite', '--child-size', str(size),
+                       '--queries', str(args.queries), '--top-k', str(args.top_k), '--seed', str(args.seed)]
+            if args.model:
+                command.append('--model')
+            output = subprocess.run(command, capture_output=True, text=True, cwd=Path(__file__).parent.parent)
+            if output.returncode != 0:
+                print(f"❌ N={size:,} failed:\n{output.stderr}")
+                return 1
+            report['sizes'].append(json.loads(output.stdout.strip().splitlines()[-1]))
+        print_sizes(report['sizes'])
+
+    status = 0
+    if not args.skip_golden:
+        if not Path(args.dataset).exists():
+            print(f"\nGolden set skipped: dataset '{args.dataset}' not found")
+        else:
+            top_k = max(args.top_k, max(RECALL_KS))
+            runs = {'hybrid': golden_metrics(args.dataset, args.model, top_k)}
+            report['golden'] = runs['hybrid']
+            if args.reranker:
+                runs['reranked'] = report['golden_reranked'] = golden_metrics(args.dataset, args.model, top_k, rerank=True)
+                print(f"Reranking fell back to first-stage order for {runs['reranked']['rerank_fallbacks']} queries")
+
+            golden = runs['hybrid']
+            print(f"\nGolden set ({golden['queries']} queries)")
+            print(f"{'':>10}" + "".join(f"{'recall@' + str(k):>11}" for k in golden['recall']) + f"{'MRR':>8}{'ms/q':>9}")
+            for name, run in runs.items():
+                print(f"{name:>10}" + "".join(f"{value:>11.3f}" for value in run['recall'].values())
+                      + f"{run['mrr']:>8.3f}{run['ms_per_query']:>9.2f}")
+            # The gate applies to the configuration being served
+            golden = runs.get('reranked', golden)
+            for query in golden['misses']:
+                print(f"  no expected verse in top {max(RECALL_KS)}: {query}")
+            if args.fail_under is not None and golden['mrr'] < args.fail_under:
+                print(f"❌ MRR {golden['mrr']:.3f} is below {args.fail_under}")
+                status = 1
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+BhagavadGPT - Shared search core
+Used by both the Flask development server (app.py) and the Vercel function (api/index.py)
+"""
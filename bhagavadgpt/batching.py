@@ -0,0 +1,173 @@
+"""
+BhagavadGPT - Encoder Micro-batching
+Coalesces concurrent query encodes into one batched forward pass. Request
+threads enqueue their sentences and block; a single dispatcher thread
+collects whatever arrives within ENCODE_MAX_WAIT_MS (up to
+ENCODE_MAX_BATCH sentences), encodes it in one call and hands every
+request its own rows back.
+
+Large encodes (corpus ingestion, progress bars) bypass the queue and call
+the wrapped encoder directly.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Union
+
+import numpy as np
+
+# ==================== Configuration ====================
+
+ENCODE_BATCHING = os.environ.get('ENCODE_BATCHING', '1').lower() not in ('0', 'false', 'no')
+# Most sentences encoded in one coalesced forward pass
+ENCODE_MAX_BATCH = int(os.environ.get('ENCODE_MAX_BATCH', 32))
+# How long the first queued request waits for others to join its batch
+# (0 = only batch requests that queued up while the encoder was busy)
+ENCODE_MAX_WAIT_MS = float(os.environ.get('ENCODE_MAX_WAIT_MS', 2))
+
+class _PendingEncode:
+    """One caller's sentences, waiting for the dispatcher to fill in `embeddings`."""
+
+    __slots__ = ('texts', 'normalize', 'embeddings', 'error', 'done')
+
+    def __init__(self, texts: List[str], normalize: bool):
+        self.texts = texts
+        self.normalize = normalize
+        self.embeddings: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+class BatchingEncoder:
+    """
+    Encoder wrapper with the same `encode` / `load` interface as the
+    encoders in bhagavadgpt.encoder, batching small concurrent calls.
+    """
+
+    def __init__(self, encoder, max_batch: int = ENCODE_MAX_BATCH, max_wait_ms: float = ENCODE_MAX_WAIT_MS):
+        self.encoder = encoder
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.batches = 0
+        self.sentences = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        # Threads and locks do not survive fork(): recreate them per process
+        self._pid = os.getpid()
+        self._queue: Deque[_PendingEncode] = deque()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def model_name(self) -> str:
+        return self.encoder.model_name
+
+    @property
+    def loaded(self) -> bool:
+        return self.encoder.loaded
+
+    def load(self):
+        return self.encoder.load()
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        batch_size: int = 32
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts or len(texts) >= self.max_batch or show_progress_bar or not convert_to_numpy:
+            return self.encoder.encode(
+                sentences,
+                convert_to_numpy=convert_to_numpy,
+                normalize_embeddings=normalize_embeddings,
+                show_progress_bar=show_progress_bar,
+                batch_size=batch_size
+            )
+
+        pending = _PendingEncode(texts, normalize_embeddings)
+        self._submit(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.embeddings[0] if single else pending.embeddings
+
+    def _submit(self, pending: _PendingEncode) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, name='encode-batcher', daemon=True)
+                self._thread.start()
+            self._queue.append(pending)
+            self._condition.notify()
+
+    def _next_batch(self) -> List[_PendingEncode]:
+        """Block for the first request, then wait up to max_wait for the batch to fill."""
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+
+            deadline = time.monotonic() + self.max_wait
+            while sum(len(p.texts) for p in self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = [self._queue.popleft()]
+            size = len(batch[0].texts)
+            while self._queue and size + len(self._queue[0].texts) <= self.max_batch:
+                size += len(self._queue[0].texts)
+                batch.append(self._queue.popleft())
+            return batch
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            for normalize in (False, True):
+                group = [p for p in batch if p.normalize == normalize]
+                if group:
+                    self._run(group, normalize)
+
+    def _run(self, group: List[_PendingEncode], normalize: bool) -> None:
+        """Encode a group in one call and split the rows back out per request."""
+        texts = [text for pending in group for text in pending.texts]
+        try:
+            embeddings = np.asarray(self.encoder.encode(
+                texts,
+                convert_to_numpy=True,
+                normalize_embeddings=normalize,
+                batch_size=len(texts)
+            ))
+            self.batches += 1
+            self.sentences += len(texts)
+            start = 0
+            for pending in group:
+                pending.embeddings = embeddings[start:start + len(pending.texts)]
+                start += len(pending.texts)
+        except Exception as e:
+            for pending in group:
+                pending.error = e
+        for pending in group:
+            pending.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalesced batches, sentences encoded through them and the mean batch size."""
+        return {
+            'batches': self.batches,
+            'sentences': self.sentences,
+            'mean_batch_size': round(self.sentences / self.batches, 2) if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+def batching_encoder(encoder, enabled: Optional[bool] = None):
+    """Wrap `encoder` in a BatchingEncoder unless batching is disabled."""
+    enabled = ENCODE_BATCHING if enabled is None else enabled
+    return BatchingEncoder(encoder) if enabled else encoder
@@ -0,0 +1,157 @@
+"""
+BhagavadGPT - BM25F Keyword Scorer
+Field-weighted BM25 precomputed into a sparse (verses x vocabulary) matrix
+so queries (themselves sparse) are scored with one sparse matrix product.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Any, Optional, Set
+
+import numpy as np
+from scipy import sparse
+
+from bhagavadgpt.keyword_index import tokenize, verse_field_text
+
+# ==================== Configuration ====================
+
+# Relative importance of each verse field
+DEFAULT_FIELD_WEIGHTS = {
+    'keywords': 3.0,
+    'themes': 2.0,
+    'translation': 1.0,
+    'context': 1.0,
+}
+
+K1 = 1.2
+B = 0.75
+
+# Saved layout: the CSR matrix's three arrays plus the column vocabulary
+BM25_VOCABULARY_FILE = 'bm25_vocabulary.json'
+BM25_DATA_FILE = 'bm25_data.npy'
+BM25_INDICES_FILE = 'bm25_indices.npy'
+BM25_INDPTR_FILE = 'bm25_indptr.npy'
+
+class BM25Index:
+    """
+    BM25F scorer with the same `score(query_keywords)` interface as
+    KeywordIndex, returning scores normalized to 0-1 by the best match.
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix, vocabulary: Dict[str, int]):
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.num_docs = matrix.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        dataset: List[Dict[str, Any]],
+        field_weights: Optional[Dict[str, float]] = None,
+        k1: float = K1,
+        b: float = B
+    ) -> 'BM25Index':
+        """Precompute per-(verse, term) BM25F contributions."""
+        field_weights = field_weights or DEFAULT_FIELD_WEIGHTS
+        fields = list(field_weights)
+        num_docs = len(dataset)
+
+        # Tokenize every field once and record field lengths
+        field_tokens = [[tokenize(verse_field_text(item, field)) for field in fields] for item in dataset]
+        lengths = np.array(
+            [[len(tokens) for tokens in doc] for doc in field_tokens],
+            dtype=np.float32
+        ).reshape(num_docs, len(fields))
+        avg_lengths = np.maximum(lengths.mean(axis=0) if num_docs else np.ones(len(fields)), 1.0)
+
+        # Length-normalized, field-weighted term frequency per (verse, term)
+        vocabulary: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        weighted_tf: List[float] = []
+        for doc_id, doc in enumerate(field_tokens):
+            doc_tf: Dict[int, float] = {}
+            for f, tokens in enumerate(doc):
+                norm = 1.0 - b + b * lengths[doc_id, f] / avg_lengths[f]
+                weight = field_weights[fields[f]] / norm
+                for token in tokens:
+                    col = vocabulary.setdefault(token, len(vocabulary))
+                    doc_tf[col] = doc_tf.get(col, 0.0) + weight
+            for col, tf in doc_tf.items():
+                rows.append(doc_id)
+                cols.append(col)
+                weighted_tf.append(tf)
+
+        rows_arr = np.array(rows, dtype=np.int32)
+        cols_arr = np.array(cols, dtype=np.int32)
+        tf_arr = np.array(weighted_tf, dtype=np.float32)
+
+        document_frequency = np.bincount(cols_arr, minlength=len(vocabulary)).astype(np.float32)
+        idf = np.log1p((num_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+        contributions = idf[cols_arr] * tf_arr / (k1 + tf_arr)
+
+        matrix = sparse.csr_matrix(
+            (contributions.astype(np.float32), (rows_arr, cols_arr)),
+            shape=(num_docs, len(vocabulary))
+        )
+        return cls(matrix, vocabulary)
+
+    def save(self, directory: Path) -> None:
+        """Write the CSR arrays and the vocabulary in column order."""
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / BM25_DATA_FILE, self.matrix.data)
+        np.save(directory / BM25_INDICES_FILE, self.matrix.indices)
+        np.save(directory / BM25_INDPTR_FILE, self.matrix.indptr)
+        with open(directory / BM25_VOCABULARY_FILE, "w", encoding="utf-8") as file:
+            json.dump({'shape': list(self.matrix.shape), 'terms': list(self.vocabulary)}, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: Path) -> 'BM25Index':
+        """Rebuild the scorer from saved CSR arrays (no re-tokenizing)."""
+        with open(directory / BM25_VOCABULARY_FILE, "r", encoding="utf-8") as file:
+            header = json.load(file)
+        matrix = sparse.csr_matrix(
+            (
+                np.load(directory / BM25_DATA_FILE),
+                np.load(directory / BM25_INDICES_FILE),
+                np.load(directory / BM25_INDPTR_FILE)
+            ),
+            shape=tuple(header['shape'])
+        )
+        return cls(matrix, {term: col for col, term in enumerate(header['terms'])})
+
+    def query_matrix(self, queries: List[Iterable[str]]) -> sparse.csr_matrix:
+        """Sparse 0/1 (vocabulary x queries) matrix marking each query's terms."""
+        term_ids: List[int] = []
+        query_ids: List[int] = []
+        for query_id, query_keywords in enumerate(queries):
+            for keyword in set(query_keywords):
+                col = self.vocabulary.get(keyword)
+                if col is not None:
+                    term_ids.append(col)
+                    query_ids.append(query_id)
+        return sparse.csr_matrix(
+            (np.ones(len(term_ids), dtype=np.float32), (term_ids, query_ids)),
+            shape=(len(self.vocabulary), len(queries))
+        )
+
+    def score(self, query_keywords: Iterable[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        BM25F score of every verse (or only of the verse ids in `rows`),
+        normalized to 0-1 by the best match.
+        """
+        return self.score_many([query_keywords], rows)[0]
+
+    def score_many(self, queries: List[Iterable[str]], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        BM25F scores for several queries as a (queries x verses) matrix from
+        one sparse x sparse product (only the query terms' columns are
+        touched), each row normalized to 0-1. With `rows`, only those
+        verses' rows of the matrix are multiplied.
+        """
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        scores = np.asarray((matrix @ self.query_matrix(queries)).toarray(), dtype=np.float32).T
+        if scores.size:
+            max_scores = scores.max(axis=1, keepdims=True)
+            np.divide(scores, max_scores, out=scores, where=max_scores > 0)
+        return np.ascontiguousarray(scores)
@@ -0,0 +1,630 @@
+"""
+BhagavadGPT - Index Bundle
+Offline build of everything the search core needs at startup (verse store,
+embeddings, keyword, BM25 and filter indexes, neighbour graph, verse hashes)
+into one versioned directory whose manifest records a sha256 checksum per file.
+
+The apps memory-map a bundle at INDEX_BUNDLE_DIR when one is present, so a
+cold start neither parses the dataset JSON nor encodes or indexes anything.
+A bundle built for another model or search text template, or from another
+version of the dataset file than the one deployed next to it, is ignored and
+the apps fall back to building from the dataset file as before.
+
+Regenerate the dataset from the notebook and build the bundle with:
+    python -m bhagavadgpt.bundle build --from-notebook code.ipynb
+or build from an existing dataset, encoding on every core:
+    python -m bhagavadgpt.bundle build --dataset bhagavad_gita_dataset_expanded.json --workers 0
+Check a dataset, or re-hash a built bundle, with:
+    python -m bhagavadgpt.bundle validate --dataset bhagavad_gita_dataset_expanded.json
+    python -m bhagavadgpt.bundle verify
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from bhagavadgpt import embedding_cache
+from bhagavadgpt.cache import clear_caches
+from bhagavadgpt.encoder import ENCODER_THREADS, create_encoder, set_encoder_threads
+from bhagavadgpt.filters import FilterIndex
+from bhagavadgpt.ingest import INGEST_BATCH_SIZE, PROGRESS_INTERVAL, iter_batches, iter_records
+from bhagavadgpt.keyword_index import KeywordIndex
+from bhagavadgpt.neighbors import NeighborGraph
+from bhagavadgpt.quantization import EMBEDDING_DTYPE, EMBEDDING_DTYPES, QuantizedEmbeddings
+from bhagavadgpt.search_index import SearchIndex, verse_hash, verse_key
+from bhagavadgpt.vector_index import VECTOR_INDEX, VECTOR_INDEX_BACKENDS, ExactIndex, IVFIndex
+from bhagavadgpt.verse_store import VerseStore, file_fingerprint
+
+# ==================== Configuration ====================
+
+DEFAULT_BUNDLE_DIR = Path(__file__).parent.parent / 'index_bundle'
+# Bundle loaded by the apps at startup ('' = always build from the dataset file)
+INDEX_BUNDLE_DIR = os.environ.get('INDEX_BUNDLE_DIR', str(DEFAULT_BUNDLE_DIR))
+# Re-hash every bundle file on load (file sizes are always checked)
+BUNDLE_VERIFY = os.environ.get('BUNDLE_VERIFY', '0') == '1'
+
+BUNDLE_FORMAT_VERSION = 1
+# Same file name as the embedding cache manifest, whose fields it includes, so
+# the bundle directory also reads as an embedding cache (quantized codes, IVF)
+BUNDLE_MANIFEST = embedding_cache.MANIFEST_FILE
+VERSES_DIR = 'verses'
+KEYWORD_DIR = 'keyword'
+BM25_DIR = 'bm25'
+FILTERS_DIR = 'filters'
+VERSE_HASHES_FILE = 'verse_hashes.npy'
+
+# Notebook cell that generates the dataset
+NOTEBOOK_FUNCTION = 'create_expanded_gita_dataset'
+DATASET_FILE = 'bhagavad_gita_dataset_expanded.json'
+
+# Schema limits
+MAX_CHAPTER = 18
+TEXT_FIELDS = ('sanskrit', 'translation', 'context')
+LABEL_FIELDS = ('themes', 'keywords')
+MAX_REPORTED_ERRORS = 20
+READ_CHUNK_SIZE = 1 << 20
+
+# ==================== Dataset Generation & Validation ====================
+
+def generate_dataset(notebook_path: str) -> List[Dict[str, Any]]:
+    """
+    Run the notebook cell defining create_expanded_gita_dataset() (its
+    `__main__` block is skipped) and return the verses it creates. With
+    SOURCE_DATE_EPOCH set, the per-verse metadata timestamp is pinned to it
+    so rebuilding from the same notebook gives a byte-identical dataset.
+    """
+    with open(notebook_path, "r", encoding="utf-8") as file:
+        notebook = json.load(file)
+
+    for cell in notebook.get('cells', []):
+        source = ''.join(cell.get('source', []))
+        if cell.get('cell_type') == 'code' and f"def {NOTEBOOK_FUNCTION}(" in source:
+            break
+    else:
+        raise ValueError(f"No cell in {notebook_path} defines {NOTEBOOK_FUNCTION}()")
+
+    # IPython magics and shell escapes are not Python
+    lines = [line for line in source.splitlines() if not line.lstrip().startswith(('!', '%'))]
+    namespace = {'__name__': 'bhagavadgpt_notebook'}
+    exec(compile("\n".join(lines), f"{notebook_path}:{NOTEBOOK_FUNCTION}", 'exec'), namespace)
+    dataset = namespace[NOTEBOOK_FUNCTION]()
+
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        timestamp = datetime.fromtimestamp(int(epoch), tz=timezone.utc).replace(tzinfo=None).isoformat()
+        for item in dataset:
+            if isinstance(item.get('metadata'), dict):
+                item['metadata']['timestamp'] = timestamp
+    return dataset
+
+def _is_positive_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def validate_key(record: Dict[str, Any]) -> List[str]:
+    """Problems with a record's (chapter, verse) identity (empty when valid)."""
+    errors = []
+    chapter, verse = record.get('chapter'), record.get('verse')
+    if not _is_positive_int(chapter) or chapter > MAX_CHAPTER:
+        errors.append(f"'chapter' must be an integer from 1 to {MAX_CHAPTER}, got {chapter!r}")
+    if not _is_positive_int(verse):
+        errors.append(f"'verse' must be a positive integer, got {verse!r}")
+    return errors
+
+def validate_record(record: Any) -> List[str]:
+    """Schema problems of one verse record (empty when valid)."""
+    if not isinstance(record, dict):
+        return ["not a JSON object"]
+
+    errors = validate_key(record)
+
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(f"'{field}' must be a non-empty string")
+
+    for field in LABEL_FIELDS:
+        value = record.get(field)
+        if not isinstance(value, list) or not value:
+            errors.append(f"'{field}' must be a non-empty list of strings")
+        elif not all(isinstance(label, str) and label.strip() for label in value):
+            errors.append(f"'{field}' must only contain non-empty strings")
+
+    attributes = record.get('attributes')
+    if not isinstance(attributes, dict):
+        errors.append("'attributes' must be an object")
+    elif not all(isinstance(value, str) for value in attributes.values()):
+        errors.append("'attributes' values must be strings")
+
+    if 'speaker' in record and not isinstance(record['speaker'], str):
+        errors.append("'speaker' must be a string")
+    return errors
+
+def validate_dataset(records: Iterable[Any]) -> Tuple[int, List[str], List[str]]:
+    """
+    Validate records in one streaming pass. Returns (record count, schema
+    errors, warnings). Repeated (chapter, verse) pairs are warnings: the
+    search core tolerates them, but lookups by verse only see the first.
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+    seen: Dict[Tuple[Any, Any], int] = {}
+    count = 0
+    for position, record in enumerate(records):
+        count += 1
+        label = f"record {position}"
+        if isinstance(record, dict):
+            label += f" ({record.get('chapter')}.{record.get('verse')})"
+            key = verse_key(record)
+            if key in seen:
+                warnings.append(f"{label}: same chapter and verse as record {seen[key]}")
+            else:
+                seen[key] = position
+        errors.extend(f"{label}: {message}" for message in validate_record(record))
+    return count, errors, warnings
+
+def _print_messages(messages: List[str]) -> None:
+    for message in messages[:MAX_REPORTED_ERRORS]:
+        print(f"  - {message}")
+    if len(messages) > MAX_REPORTED_ERRORS:
+        print(f"  ... and {len(messages) - MAX_REPORTED_ERRORS} more")
+
+def report_validation(count: int, errors: List[str], warnings: List[str], strict: bool = False) -> bool:
+    """Print the outcome of validate_dataset; True when the dataset may be built."""
+    if warnings:
+        print(f"Warning: {len(warnings)} duplicate verse(s):")
+        _print_messages(warnings)
+    if count == 0:
+        print("❌ Dataset is empty")
+        return False
+    if errors:
+        print(f"❌ {len(errors)} schema error(s) in {count} records:")
+        _print_messages(errors)
+        return False
+    if strict and warnings:
+        print("❌ Duplicate verses are not allowed with --strict")
+        return False
+    print(f"✓ Dataset valid ({count} verses)")
+    return True
+
+# ==================== Parallel Embedding ====================
+
+_worker_encoder = None
+
+def _init_worker(model_name: str, num_threads: int) -> None:
+    """Pool initializer: bound intra-op threads, then create this process's encoder."""
+    global _worker_encoder
+    if num_threads > 0:
+        set_encoder_threads(num_threads)
+    _worker_encoder = create_encoder(model_name)
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    from bhagavadgpt.search import encode_texts
+
+    return encode_texts(_worker_encoder, texts)
+
+def encode_parallel(
+    texts: Iterable[str],
+    model_name: str,
+    workers: int,
+    batch_size: int = INGEST_BATCH_SIZE
+) -> Iterator[np.ndarray]:
+    """
+    Encode texts in batches across `workers` processes (one encoder and
+    cores / workers intra-op threads each), yielding batch embeddings in
+    input order. At most two batches per worker are in flight, so memory
+    stays bounded however large the corpus is.
+    """
+    batches = iter_batches(texts, batch_size)
+    if workers <= 1:
+        _init_worker(model_name, ENCODER_THREADS)
+        yield from map(_encode_batch, batches)
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # Fresh interpreters: forking after torch/OpenMP initialized can deadlock
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model_name, threads)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(_encode_batch, batch))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def embed_store(
+    store: VerseStore,
+    out_path: Path,
+    model_name: str,
+    template: str,
+    workers: int,
+    batch_size: int = INGEST_BATCH_SIZE
+) -> Tuple[np.ndarray, str]:
+    """
+    Encode every verse's search text into a float32 .npy at `out_path`.
+    Returns the memory-mapped matrix and its embedding cache fingerprint.
+    """
+    from bhagavadgpt.search import build_search_text
+
+    fingerprinter = embedding_cache.Fingerprinter(model_name, template)
+
+    def texts() -> Iterator[str]:
+        for item in store:
+            text = build_search_text(item)
+            fingerprinter.update(text)
+            yield text
+
+    total = len(store)
+    matrix = None
+    row = 0
+    start = last_report = time.perf_counter()
+    for batch_embeddings in encode_parallel(texts(), model_name, workers, batch_size):
+        if matrix is None:
+            shape = (total, batch_embeddings.shape[1])
+            matrix = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float32, shape=shape)
+        matrix[row:row + len(batch_embeddings)] = batch_embeddings
+        row += len(batch_embeddings)
+
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL or row == total:
+            elapsed = now - start
+            print(f"  {row}/{total} embedded ({row / max(elapsed, 1e-9):.0f} texts/s, {elapsed:.1f}s)")
+            last_report = now
+
+    matrix.flush()
+    del matrix
+    return np.load(out_path, mmap_mode='r'), fingerprinter.hexdigest()
+
+# ==================== Building ====================
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def checksum_files(directory: Path) -> Dict[str, Dict[str, Any]]:
+    """{relative path: {'bytes', 'sha256'}} for every file except the manifest."""
+    files = {}
+    for path in sorted(directory.rglob('*')):
+        name = path.relative_to(directory).as_posix()
+        if path.is_file() and name != BUNDLE_MANIFEST:
+            files[name] = {'bytes': path.stat().st_size, 'sha256': file_sha256(path)}
+    return files
+
+def build_bundle(
+    dataset_path: str,
+    out_dir: str,
+    workers: int = 1,
+    batch_size: int = INGEST_BATCH_SIZE,
+    version: Optional[str] = None,
+    dtype: Optional[str] = None,
+    vector_backend: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build a bundle from a validated dataset file. Everything is written to a
+    staging directory first and swapped in at the end, so a running server
+    never sees a partial bundle. Returns the manifest.
+    """
+    from bhagavadgpt.bm25 import BM25Index
+    from bhagavadgpt.search import MODEL_NAME, SEARCH_TEXT_TEMPLATE
+
+    dtype = (dtype or EMBEDDING_DTYPE).lower()
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype '{dtype}', expected one of {EMBEDDING_DTYPES}")
+    vector_backend = (vector_backend or VECTOR_INDEX).lower()
+    if vector_backend not in VECTOR_INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index '{vector_backend}', expected one of {VECTOR_INDEX_BACKENDS}")
+
+    out = Path(out_dir)
+    staging = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    dataset_sha256 = file_fingerprint(dataset_path)
+    VerseStore.from_records(iter_records(dataset_path)).save(staging / VERSES_DIR, dataset_sha256)
+    store = VerseStore.load(staging / VERSES_DIR, dataset_sha256)
+    print(f"✓ Verse store written ({len(store)} verses)")
+
+    print(f"Encoding {len(store)} verses with {workers} worker(s), batch size {batch_size}...")
+    embeddings, fingerprint = embed_store(
+        store, staging / embedding_cache.EMBEDDINGS_FILE, MODEL_NAME, SEARCH_TEXT_TEMPLATE, workers, batch_size
+    )
+
+    KeywordIndex.build(store).save(staging / KEYWORD_DIR)
+    BM25Index.build(store).save(staging / BM25_DIR)
+    FilterIndex.build(store).save(staging / FILTERS_DIR)
+    np.save(staging / VERSE_HASHES_FILE, np.array([verse_hash(item) for item in store], dtype='<U40'))
+    print("✓ Keyword, BM25 and filter indexes written")
+
+    # Optional artifacts for the configured storage dtype / vector index
+    if dtype != 'float32':
+        QuantizedEmbeddings.quantize(embeddings, dtype, embeddings).save(staging, fingerprint)
+    if vector_backend == 'ivf':
+        IVFIndex.build(embeddings).save(staging, fingerprint)
+    # Exact candidates: the build runs offline, so it can afford the full scan
+    NeighborGraph.build(store, embeddings).save(staging, fingerprint)
+    print("✓ Neighbour graph written")
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'bundle_version': version or dataset_sha256[:12],
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'fingerprint': fingerprint,
+        'model_name': MODEL_NAME,
+        'search_text_template': SEARCH_TEXT_TEMPLATE,
+        'shape': list(embeddings.shape),
+        'dtype': 'float32',
+        'quantized_dtype': dtype,
+        'vector_index': vector_backend,
+        'dataset_sha256': dataset_sha256,
+        'num_verses': len(store),
+        'files': checksum_files(staging),
+    }
+    with open(staging / BUNDLE_MANIFEST, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+
+    previous = out.with_name(f"{out.name}.{os.getpid()}.old")
+    if out.exists():
+        os.replace(out, previous)
+    os.replace(staging, out)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+# ==================== Loading ====================
+
+def find_bundle(directory: Optional[str] = None) -> Optional[Path]:
+    """The bundle directory (argument, then INDEX_BUNDLE_DIR) if it has a manifest."""
+    path = directory or INDEX_BUNDLE_DIR
+    if not path:
+        return None
+    path = Path(path)
+    return path if (path / BUNDLE_MANIFEST).is_file() else None
+
+def read_bundle_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    """The bundle manifest, or None if unreadable or of another format version."""
+    manifest = embedding_cache.read_manifest(directory)
+    if not manifest or manifest.get('format_version') != BUNDLE_FORMAT_VERSION or 'files' not in manifest:
+        return None
+    return manifest
+
+def check_files(directory: Path, manifest: Dict[str, Any], checksums: bool = False) -> List[str]:
+    """Missing, resized or (with `checksums`) modified bundle files."""
+    problems = []
+    for name, expected in manifest['files'].items():
+        path = directory / name
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            problems.append(f"{name} is missing")
+            continue
+        if size != expected['bytes']:
+            problems.append(f"{name} has {size} bytes, expected {expected['bytes']}")
+        elif checksums and file_sha256(path) != expected['sha256']:
+            problems.append(f"{name} does not match its checksum")
+    return problems
+
+_dataset_fingerprints: Dict[Tuple[str, int, int], str] = {}
+
+def dataset_changed(manifest: Dict[str, Any], dataset_path: Optional[str]) -> bool:
+    """
+    Whether the dataset file at `dataset_path` differs from the one the
+    bundle was built from (False when there is no such file). Hashes are
+    remembered per path, size and mtime, so startup reads the file once.
+    """
+    try:
+        stat = os.stat(dataset_path) if dataset_path else None
+    except OSError:
+        stat = None
+    if stat is None:
+        return False
+
+    key = (str(dataset_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _dataset_fingerprints:
+        _dataset_fingerprints[key] = file_fingerprint(dataset_path)
+    return _dataset_fingerprints[key] != manifest.get('dataset_sha256')
+
+def load_bundle_verses(directory: Optional[str] = None, dataset_path: Optional[str] = None) -> Optional[VerseStore]:
+    """
+    Memory-map only the bundle's verse store (no model libraries, no
+    embeddings), unless the dataset file at `dataset_path` has changed
+    since the bundle was built.
+    """
+    path = find_bundle(directory)
+    manifest = read_bundle_manifest(path) if path else None
+    if manifest is None or dataset_changed(manifest, dataset_path):
+        return None
+
+    store = VerseStore.load(path / VERSES_DIR, manifest['dataset_sha256'])
+    if store is not None:
+        print(f"✓ Loaded {len(store)} verses from index bundle {path}")
+    return store
+
+def _bundle_problem(
+    directory: Path,
+    manifest: Optional[Dict[str, Any]],
+    dataset_path: Optional[str] = None
+) -> Optional[str]:
+    from bhagavadgpt.search import MODEL_NAME, SEARCH_TEXT_TEMPLATE
+
+    if manifest is None:
+        return f"unreadable manifest or not format version {BUNDLE_FORMAT_VERSION}"
+    if dataset_changed(manifest, dataset_path):
+        return f"{dataset_path} has changed since the bundle was built (rebuild it to use it again)"
+    if manifest.get('model_name') != MODEL_NAME:
+        return f"built for model '{manifest.get('model_name')}', not '{MODEL_NAME}'"
+    if manifest.get('search_text_template') != SEARCH_TEXT_TEMPLATE:
+        return "built with a different search text template"
+    problems = check_files(directory, manifest, BUNDLE_VERIFY)
+    if problems:
+        return problems[0] + (f" (and {len(problems) - 1} more)" if len(problems) > 1 else "")
+    return None
+
+def load_bundle(
+    directory: Optional[str] = None,
+    keyword_scorer: Optional[str] = None,
+    dtype: Optional[str] = None,
+    vector_backend: Optional[str] = None,
+    dataset_path: Optional[str] = None
+) -> Optional[SearchIndex]:
+    """
+    The SearchIndex stored in the bundle with every array memory-mapped, or
+    None when there is no usable bundle (or the dataset file at
+    `dataset_path` no longer matches it) so the caller builds from the
+    dataset instead. Quantized codes, an IVF index or a neighbour graph
+    (other SIMILAR_* settings) the bundle was built without are created in
+    memory; the bundle itself is never written to.
+    """
+    from bhagavadgpt.search import KEYWORD_SCORER
+
+    path = find_bundle(directory)
+    if path is None:
+        return None
+
+    start = time.perf_counter()
+    manifest = read_bundle_manifest(path)
+    problem = _bundle_problem(path, manifest, dataset_path)
+    if problem:
+        print(f"Warning: Ignoring index bundle {path}: {problem}")
+        return None
+
+    dtype = (dtype or EMBEDDING_DTYPE).lower()
+    vector_backend = (vector_backend or VECTOR_INDEX).lower()
+    fingerprint = manifest['fingerprint']
+    try:
+        dataset = VerseStore.load(path / VERSES_DIR, manifest['dataset_sha256'])
+        if dataset is None:
+            raise ValueError("verse store does not match the manifest")
+        embeddings = np.load(path / embedding_cache.EMBEDDINGS_FILE, mmap_mode='r')
+
+        if (keyword_scorer or KEYWORD_SCORER).lower() == 'bm25':
+            from bhagavadgpt.bm25 import BM25Index
+
+            keyword_index = BM25Index.load(path / BM25_DIR)
+        else:
+            keyword_index = KeywordIndex.load(path / KEYWORD_DIR)
+
+        corpus_embeddings = embeddings
+        if dtype != 'float32':
+            corpus_embeddings = (QuantizedEmbeddings.load(path, fingerprint, dtype, embeddings)
+                                 or QuantizedEmbeddings.quantize(embeddings, dtype, embeddings))
+        if vector_backend == 'ivf':
+            vector_index = IVFIndex.load(path, corpus_embeddings, fingerprint) or IVFIndex.build(corpus_embeddings)
+        else:
+            vector_index = ExactIndex(corpus_embeddings)
+
+        index = SearchIndex(
+            dataset,
+            corpus_embeddings,
+            keyword_index,
+            vector_index,
+            np.load(path / VERSE_HASHES_FILE).tolist(),
+            FilterIndex.load(path / FILTERS_DIR),
+            NeighborGraph.load(path, fingerprint) or NeighborGraph.build(dataset, corpus_embeddings, vector_index)
+        )
+    except (OSError, ValueError, KeyError, json.JSONDecodeError) as e:
+        print(f"Warning: Ignoring index bundle {path}: {e}")
+        return None
+
+    # Cached query embeddings and results refer to the previous corpus
+    clear_caches()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"✓ Loaded index bundle {manifest['bundle_version']} ({len(index)} verses) from {path} in {elapsed:.1f} ms")
+    return index
+
+# ==================== CLI ====================
+
+def _dataset_path(args) -> Optional[str]:
+    """Dataset path to build from, regenerating it from the notebook if asked."""
+    if args.from_notebook:
+        from bhagavadgpt.incremental import save_dataset
+
+        dataset = generate_dataset(args.from_notebook)
+        save_dataset(dataset, args.dataset)
+        print(f"✓ Generated {len(dataset)} verses from {args.from_notebook} into {args.dataset}")
+    if not Path(args.dataset).exists():
+        print(f"Error: Dataset file '{args.dataset}' not found")
+        return None
+    return args.dataset
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build, validate or verify the BhagavadGPT index bundle")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('build', "Validate the dataset and build the bundle"),
+                            ('validate', "Only check the dataset schema")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--dataset', default=DATASET_FILE,
+                             help="Dataset path (JSON array or JSON Lines); written to with --from-notebook")
+        command.add_argument('--from-notebook', metavar='NOTEBOOK', default=None,
+                             help=f"Regenerate the dataset by running {NOTEBOOK_FUNCTION}() from this notebook")
+        command.add_argument('--strict', action='store_true', help="Treat duplicate verses as errors")
+
+    build = commands.choices['build']
+    build.add_argument('--out', default=str(DEFAULT_BUNDLE_DIR), help="Bundle directory to (re)place")
+    build.add_argument('--workers', type=int, default=1,
+                       help="Encoder processes (0 = one per CPU core)")
+    build.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE, help="Texts encoded per batch")
+    build.add_argument('--version', default=None, help="Bundle version label (default: dataset checksum prefix)")
+    build.add_argument('--dtype', default=None, choices=EMBEDDING_DTYPES,
+                       help="Also store quantized codes (default: $EMBEDDING_DTYPE)")
+    build.add_argument('--vector-index', default=None, choices=VECTOR_INDEX_BACKENDS,
+                       help="Also store an IVF index when 'ivf' (default: $VECTOR_INDEX)")
+
+    verify = commands.add_parser('verify', help="Re-hash every file of a built bundle")
+    verify.add_argument('--bundle', default=str(DEFAULT_BUNDLE_DIR))
+    args = parser.parse_args(argv)
+
+    if args.command == 'verify':
+        path = Path(args.bundle)
+        manifest = read_bundle_manifest(path)
+        if manifest is None:
+            print(f"❌ No readable bundle manifest in {path}")
+            return 1
+        problems = check_files(path, manifest, checksums=True)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            return 1
+        print(f"✓ Bundle {manifest['bundle_version']} intact ({len(manifest['files'])} files, {manifest['num_verses']} verses)")
+        return 0
+
+    dataset_path = _dataset_path(args)
+    if dataset_path is None:
+        return 1
+    count, errors, warnings = validate_dataset(iter_records(dataset_path))
+    if not report_validation(count, errors, warnings, args.strict):
+        return 1
+    if args.command == 'validate':
+        return 0
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    # No point spawning workers that would never get a batch
+    workers = max(1, min(workers, -(-count // max(1, args.batch_size))))
+
+    start = time.perf_counter()
+    manifest = build_bundle(
+        dataset_path, args.out, workers, args.batch_size, args.version, args.dtype, args.vector_index
+    )
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(entry['bytes'] for entry in manifest['files'].values())
+    print(f"✓ Bundle {manifest['bundle_version']} written to {args.out} "
+          f"({manifest['num_verses']} verses, {total_bytes / 1e6:.1f} MB, {elapsed:.1f}s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+BhagavadGPT - Query Caches
+Bounded, thread-safe LRU caches with TTL for query embeddings, ranked
+results, reranker scores and conversation sessions, plus the hit/miss
+counters exposed at /api/cache/stats.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# ==================== Configuration ====================
+
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 2048))
+QUERY_CACHE_TTL = float(os.environ.get('QUERY_CACHE_TTL', 3600))
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 1024))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 600))
+RERANK_CACHE_SIZE = int(os.environ.get('RERANK_CACHE_SIZE', 20000))
+RERANK_CACHE_TTL = float(os.environ.get('RERANK_CACHE_TTL', 3600))
+SESSION_MAX_COUNT = int(os.environ.get('SESSION_MAX_COUNT', 5000))
+SESSION_TTL = float(os.environ.get('SESSION_TTL', 1800))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: lowercased with whitespace collapsed."""
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+class TTLCache:
+    """LRU cache bounded by entry count, where entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value (refreshing its LRU position) or None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert or replace a value, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept so hit rates stay comparable)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, limits and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+# ==================== Shared Caches ====================
+
+query_embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+result_cache = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+# Cross-encoder score per (normalized query, verse key) pair
+rerank_score_cache = TTLCache(RERANK_CACHE_SIZE, RERANK_CACHE_TTL)
+# Conversation state per session_id (see sessions.py); survives clear_caches()
+session_store = TTLCache(SESSION_MAX_COUNT, SESSION_TTL)
+
+def clear_caches() -> None:
+    """Invalidate all query caches, e.g. after the dataset or embeddings reload."""
+    query_embedding_cache.clear()
+    result_cache.clear()
+    rerank_score_cache.clear()
+
+def cache_stats() -> Dict[str, Any]:
+    """Stats for every shared cache."""
+    return {
+        'query_embeddings': query_embedding_cache.stats(),
+        'results': result_cache.stats(),
+        'rerank_scores': rerank_score_cache.stats(),
+        'sessions': session_store.stats()
+    }
@@ -0,0 +1,180 @@
+"""
+BhagavadGPT - Embedding Cache
+Persists corpus embeddings as a memory-mappable float32 .npy file so cold
+starts can skip re-encoding the whole dataset.
+
+Build the artifact ahead of deploy (streams JSON arrays or JSON Lines) with:
+    python -m bhagavadgpt.embedding_cache --dataset bhagavad_gita_dataset_expanded.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# ==================== Configuration ====================
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'embeddings'
+EMBEDDINGS_FILE = 'embeddings.npy'
+MANIFEST_FILE = 'manifest.json'
+CACHE_FORMAT_VERSION = 1
+
+# ==================== Helper Functions ====================
+
+def get_cache_dir(cache_dir: Optional[str] = None) -> Path:
+    """Resolve the cache directory (argument, then EMBEDDING_CACHE_DIR, then default)."""
+    return Path(cache_dir or os.environ.get('EMBEDDING_CACHE_DIR') or DEFAULT_CACHE_DIR)
+
+class Fingerprinter:
+    """
+    Incremental fingerprint of everything that influences the corpus
+    embeddings: the model name, the search text template and the rendered
+    text of every verse (fed one at a time so texts can be streamed).
+    """
+
+    def __init__(self, model_name: str, template: str):
+        self._digest = hashlib.sha256()
+        self._digest.update(f"v{CACHE_FORMAT_VERSION}\0{model_name}\0{template}\0".encode('utf-8'))
+        self.count = 0
+
+    def update(self, text: str) -> None:
+        self._digest.update(text.encode('utf-8'))
+        self._digest.update(b'\0')
+        self.count += 1
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+def compute_fingerprint(texts: Iterable[str], model_name: str, template: str) -> str:
+    """Fingerprint of the model name, template and rendered verse texts."""
+    fingerprinter = Fingerprinter(model_name, template)
+    for text in texts:
+        fingerprinter.update(text)
+    return fingerprinter.hexdigest()
+
+def read_manifest(cache_dir: Path) -> Optional[Dict[str, Any]]:
+    """Return the cache manifest, or None if missing or unreadable."""
+    try:
+        with open(cache_dir / MANIFEST_FILE, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def load_embeddings(cache_dir: Path, fingerprint: str) -> Optional[np.ndarray]:
+    """Memory-map cached embeddings if the stored fingerprint matches, else None."""
+    embeddings_path = cache_dir / EMBEDDINGS_FILE
+
+    manifest = read_manifest(cache_dir)
+    if manifest is None or manifest.get('fingerprint') != fingerprint:
+        return None
+
+    try:
+        embeddings = np.load(embeddings_path, mmap_mode='r')
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if embeddings.dtype != np.float32 or list(embeddings.shape) != manifest.get('shape'):
+        return None
+
+    return embeddings
+
+def save_embeddings(cache_dir: Path, fingerprint: str, embeddings: np.ndarray, model_name: str) -> None:
+    """Atomically write embeddings and their manifest to the cache directory."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    tmp_embeddings = cache_dir / f"{EMBEDDINGS_FILE}.{os.getpid()}.tmp"
+    with open(tmp_embeddings, "wb") as file:
+        np.save(file, embeddings)
+    replace_embeddings(cache_dir, tmp_embeddings)
+    write_manifest(cache_dir, fingerprint, list(embeddings.shape), model_name)
+
+def replace_embeddings(cache_dir: Path, tmp_embeddings: Path) -> None:
+    """
+    Move freshly written embeddings into place. The old manifest is removed
+    first and the caller writes the new one afterwards, so a crash in
+    between leaves no manifest (a cache miss) rather than the old
+    fingerprint next to the new vectors.
+    """
+    try:
+        os.remove(cache_dir / MANIFEST_FILE)
+    except FileNotFoundError:
+        pass
+    os.replace(tmp_embeddings, cache_dir / EMBEDDINGS_FILE)
+
+def write_manifest(cache_dir: Path, fingerprint: str, shape: List[int], model_name: str) -> None:
+    """Atomically write the manifest describing the cached embeddings."""
+    manifest = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'fingerprint': fingerprint,
+        'model_name': model_name,
+        'shape': shape,
+        'dtype': 'float32',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    tmp_manifest = cache_dir / f"{MANIFEST_FILE}.{os.getpid()}.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_manifest, cache_dir / MANIFEST_FILE)
+
+def load_or_build(
+    texts: Iterable[str],
+    encode: Callable[[List[str]], np.ndarray],
+    model_name: Optional[str] = None,
+    template: Optional[str] = None,
+    cache_dir: Optional[str] = None
+) -> np.ndarray:
+    """
+    Return corpus embeddings for `texts`, loading them zero-copy from the
+    cache when the fingerprint matches and encoding (then caching) otherwise.
+    `texts` may be a list or a zero-argument callable returning a fresh
+    iterator, which lets the texts be rendered lazily.
+    """
+    from bhagavadgpt.ingest import embed_corpus
+    from bhagavadgpt.search import MODEL_NAME, SEARCH_TEXT_TEMPLATE
+
+    text_source = texts if callable(texts) else (lambda: iter(texts))
+    return embed_corpus(
+        text_source,
+        encode,
+        model_name or MODEL_NAME,
+        template or SEARCH_TEXT_TEMPLATE,
+        cache_dir=cache_dir
+    )
+
+# ==================== CLI ====================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Build (or verify) the embedding cache artifact ahead of deploy."""
+    from bhagavadgpt.ingest import INGEST_BATCH_SIZE, embed_dataset_file
+    from bhagavadgpt.search import MODEL_NAME, load_model
+
+    parser = argparse.ArgumentParser(description="Build the BhagavadGPT embedding cache")
+    parser.add_argument('--dataset', default='bhagavad_gita_dataset_expanded.json',
+                        help="Path to the dataset (JSON array or JSON Lines)")
+    parser.add_argument('--cache-dir', default=None,
+                        help=f"Output directory (default: $EMBEDDING_CACHE_DIR or {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE,
+                        help="Texts encoded per batch (bounds peak memory)")
+    args = parser.parse_args(argv)
+
+    if not Path(args.dataset).exists():
+        print(f"Error: Dataset file '{args.dataset}' not found")
+        return 1
+
+    # Records are streamed from disk; the dataset is never fully loaded
+    start = time.perf_counter()
+    embeddings = embed_dataset_file(args.dataset, load_model(MODEL_NAME), args.cache_dir, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ {embeddings.shape[0]} x {embeddings.shape[1]} embeddings in {get_cache_dir(args.cache_dir)} ({elapsed:.1f}s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+BhagavadGPT - Query Encoders
+Encoders that defer heavy imports until an embedding is actually needed.
+
+ENCODER_BACKEND selects the runtime:
+- 'sentence-transformers' (default): imports torch/sentence_transformers
+  lazily on the first encode call
+- 'onnx': runs an exported (optionally quantized) MiniLM with onnxruntime
+  and tokenizers only, never importing torch
+
+Export the ONNX model once with:
+    python -m bhagavadgpt.encoder --out onnx_model [--quantize]
+"""
+
+import argparse
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+from bhagavadgpt.metrics import stage
+
+# ==================== Configuration ====================
+
+ENCODER_BACKENDS = ('sentence-transformers', 'onnx')
+ENCODER_BACKEND = os.environ.get('ENCODER_BACKEND', 'sentence-transformers').lower()
+ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', str(Path(__file__).parent.parent / 'onnx_model'))
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_QUANTIZED_MODEL_FILE = 'model.quant.onnx'
+ONNX_TOKENIZER_FILE = 'tokenizer.json'
+ONNX_MAX_LENGTH = 256
+# Intra-op threads per encoder (0 = runtime default). Bound it per worker
+# when several processes share the cores.
+ENCODER_THREADS = int(os.environ.get('ENCODER_THREADS', 0))
+
+def set_encoder_threads(num_threads: int) -> None:
+    """
+    Bound intra-op threads for encoders loaded from now on. Also exports the
+    OpenMP/MKL variables, which torch only reads when it is first imported.
+    """
+    global ENCODER_THREADS
+    ENCODER_THREADS = num_threads
+    if num_threads > 0:
+        for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+            os.environ[variable] = str(num_threads)
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize rows."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+class LazySentenceTransformer:
+    """
+    Wraps SentenceTransformer so that torch and sentence_transformers are
+    only imported (and the model only loaded) on the first encode call.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Import sentence_transformers and load the model (once)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    if ENCODER_THREADS > 0:
+                        import torch
+                        torch.set_num_threads(ENCODER_THREADS)
+
+                    print(f"Loading model: {self.model_name}...")
+                    with stage('model_load'):
+                        self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        batch_size: int = 32
+    ) -> np.ndarray:
+        return self.load().encode(
+            sentences,
+            convert_to_numpy=convert_to_numpy,
+            normalize_embeddings=normalize_embeddings,
+            show_progress_bar=show_progress_bar,
+            batch_size=batch_size
+        )
+
+class OnnxEncoder:
+    """
+    Mean-pooled MiniLM sentence encoder on onnxruntime + tokenizers.
+    Prefers the quantized model file when present.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, max_length: int = ONNX_MAX_LENGTH):
+        self.model_dir = Path(model_dir)
+        self.max_length = max_length
+        self.model_name = str(self.model_dir)
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._session is not None
+
+    def load(self):
+        """Create the inference session and tokenizer (once)."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import onnxruntime
+                    from tokenizers import Tokenizer
+
+                    model_path = self.model_dir / ONNX_QUANTIZED_MODEL_FILE
+                    if not model_path.exists():
+                        model_path = self.model_dir / ONNX_MODEL_FILE
+                    print(f"Loading ONNX model: {model_path}...")
+
+                    with stage('model_load'):
+                        tokenizer = Tokenizer.from_file(str(self.model_dir / ONNX_TOKENIZER_FILE))
+                        tokenizer.enable_truncation(max_length=self.max_length)
+                        tokenizer.enable_padding()
+                        self._tokenizer = tokenizer
+                        options = onnxruntime.SessionOptions()
+                        if ENCODER_THREADS > 0:
+                            options.intra_op_num_threads = ENCODER_THREADS
+                        self._session = onnxruntime.InferenceSession(
+                            str(model_path), sess_options=options, providers=['CPUExecutionProvider']
+                        )
+        return self._session
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        batch_size: int = 32
+    ) -> np.ndarray:
+        session = self.load()
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        input_names = {i.name for i in session.get_inputs()}
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in input_names:
+                feeds['token_type_ids'] = np.zeros_like(input_ids)
+
+            token_embeddings = session.run(None, feeds)[0]
+
+            # Mean pooling over non-padding tokens, as in sentence-transformers
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings = _normalize(embeddings)
+        return embeddings[0] if single else embeddings
+
+def create_encoder(model_name: str, backend: Optional[str] = None):
+    """Create the configured encoder without importing any heavy library."""
+    backend = (backend or ENCODER_BACKEND).lower()
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}")
+
+    if backend == 'onnx':
+        return OnnxEncoder(ONNX_MODEL_DIR)
+    return LazySentenceTransformer(model_name)
+
+# ==================== CLI ====================
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = False) -> Path:
+    """Export the transformer behind `model_name` to ONNX (build-time only, needs torch)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    hub_name = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name).eval()
+    tokenizer.backend_tokenizer.save(str(out / ONNX_TOKENIZER_FILE))
+
+    sample = tokenizer(["export sample"], return_tensors='pt')
+    torch.onnx.export(
+        model,
+        (sample['input_ids'], sample['attention_mask'], sample['token_type_ids']),
+        str(out / ONNX_MODEL_FILE),
+        input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+        output_names=['last_hidden_state'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'token_type_ids': {0: 'batch', 1: 'sequence'},
+            'last_hidden_state': {0: 'batch', 1: 'sequence'},
+        },
+        opset_version=14
+    )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantize_dynamic(
+            str(out / ONNX_MODEL_FILE),
+            str(out / ONNX_QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+    return out
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from bhagavadgpt.search import MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Export the query encoder to ONNX")
+    parser.add_argument('--model', default=MODEL_NAME, help="Sentence-transformers model name")
+    parser.add_argument('--out', default=ONNX_MODEL_DIR, help="Output directory")
+    parser.add_argument('--quantize', action='store_true', help="Also write an int8 dynamically quantized model")
+    args = parser.parse_args(argv)
+
+    out = export_onnx(args.model, args.out, args.quantize)
+    print(f"✓ Exported {args.model} to {out}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+BhagavadGPT - Metadata Filters
+Precomputed bitmap indexes over verse metadata (chapter, themes and
+attributes) so a query can be restricted to a subset of verses before any
+semantic or keyword scoring happens.
+
+Filters arrive as a JSON object on /api/chat:
+    {"chapter": [2, 3], "theme": "duty", "attributes": {"mood": "instructive"}}
+Values within one field are OR-ed, different fields are AND-ed. Matching
+is case-insensitive.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Normalized filters: sorted ((field, (value, ...)), ...), hashable for cache keys
+Filters = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+# Upper bound on values accepted across all filter fields of one request
+MAX_FILTER_VALUES = 64
+
+# Saved layout: one row of packed bits per (field, value) key
+FILTER_KEYS_FILE = 'filter_keys.json'
+FILTER_BITMAPS_FILE = 'filter_bitmaps.npy'
+
+def normalize_value(value: Any) -> str:
+    return str(value).strip().lower()
+
+def _values(name: str, value: Any, numeric: bool = False) -> List[str]:
+    """A scalar or list filter value as a list of normalized strings."""
+    values = value if isinstance(value, list) else [value]
+    if not values:
+        raise ValueError(f"'{name}' filter must not be empty")
+    for v in values:
+        if numeric and (isinstance(v, bool) or not isinstance(v, int)):
+            raise ValueError(f"'{name}' filter must be an integer or a list of integers")
+        if not numeric and not isinstance(v, str):
+            raise ValueError(f"'{name}' filter must be a string or a list of strings")
+    return [normalize_value(v) for v in values]
+
+def parse_filters(data: Dict[str, Any]) -> Optional[Filters]:
+    """
+    Read the optional `filters` object from a request body.
+    Raises ValueError with a client-facing message on invalid input.
+    """
+    filters = data.get('filters')
+    if filters is None:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' must be an object")
+
+    unknown = set(filters) - {'chapter', 'theme', 'attributes'}
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}")
+
+    fields: Dict[str, List[str]] = {}
+    if 'chapter' in filters:
+        fields['chapter'] = _values('chapter', filters['chapter'], numeric=True)
+    if 'theme' in filters:
+        fields['themes'] = _values('theme', filters['theme'])
+    if 'attributes' in filters:
+        attributes = filters['attributes']
+        if not isinstance(attributes, dict) or not attributes:
+            raise ValueError("'attributes' filter must be a non-empty object")
+        for key, value in attributes.items():
+            fields[f'attributes.{normalize_value(key)}'] = _values(f'attributes.{key}', value)
+
+    if sum(len(values) for values in fields.values()) > MAX_FILTER_VALUES:
+        raise ValueError(f"Too many filter values (max {MAX_FILTER_VALUES})")
+
+    return tuple(sorted((field, tuple(sorted(set(values)))) for field, values in fields.items())) or None
+
+def verse_filter_keys(item: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(field, value) pairs a verse can be filtered on."""
+    keys = [('chapter', normalize_value(item.get('chapter')))]
+    keys += [('themes', normalize_value(theme)) for theme in item.get('themes') or []]
+    keys += [
+        (f'attributes.{normalize_value(key)}', normalize_value(value))
+        for key, value in (item.get('attributes') or {}).items()
+    ]
+    return keys
+
+class FilterIndex:
+    """(field, value) -> packed bitmap of the verses having that value."""
+
+    def __init__(self, bitmaps: Dict[Tuple[str, str], np.ndarray], num_docs: int):
+        self.bitmaps = bitmaps
+        self.num_docs = num_docs
+
+    @classmethod
+    def build(cls, dataset: List[Dict[str, Any]]) -> 'FilterIndex':
+        """Build one bitmap per distinct (field, value) in the dataset."""
+        rows: Dict[Tuple[str, str], List[int]] = {}
+        num_docs = 0
+        for doc_id, item in enumerate(dataset):
+            for key in set(verse_filter_keys(item)):
+                rows.setdefault(key, []).append(doc_id)
+            num_docs = doc_id + 1
+
+        bitmaps = {}
+        for key, ids in rows.items():
+            mask = np.zeros(num_docs, dtype=bool)
+            mask[ids] = True
+            bitmaps[key] = np.packbits(mask)
+        return cls(bitmaps, num_docs)
+
+    def save(self, directory: Path) -> None:
+        """Write the bitmaps as one (keys x bytes) matrix plus the key list."""
+        directory.mkdir(parents=True, exist_ok=True)
+        keys = list(self.bitmaps)
+        matrix = np.zeros((len(keys), (self.num_docs + 7) // 8), dtype=np.uint8)
+        for row, key in enumerate(keys):
+            matrix[row] = self.bitmaps[key]
+        np.save(directory / FILTER_BITMAPS_FILE, matrix)
+        with open(directory / FILTER_KEYS_FILE, "w", encoding="utf-8") as file:
+            json.dump({'num_docs': self.num_docs, 'keys': keys}, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: Path) -> 'FilterIndex':
+        """Memory-map saved bitmaps."""
+        with open(directory / FILTER_KEYS_FILE, "r", encoding="utf-8") as file:
+            header = json.load(file)
+        matrix = np.load(directory / FILTER_BITMAPS_FILE, mmap_mode='r')
+        bitmaps = {(field, value): matrix[row] for row, (field, value) in enumerate(header['keys'])}
+        return cls(bitmaps, header['num_docs'])
+
+    def mask(self, filters: Filters) -> np.ndarray:
+        """Boolean mask of the verses matching every filter field."""
+        empty = np.zeros((self.num_docs + 7) // 8, dtype=np.uint8)
+        combined = None
+        for field, values in filters:
+            field_bits = empty.copy()
+            for value in values:
+                bitmap = self.bitmaps.get((field, value))
+                if bitmap is not None:
+                    field_bits |= bitmap
+            combined = field_bits if combined is None else combined & field_bits
+        if combined is None:
+            return np.ones(self.num_docs, dtype=bool)
+        return np.unpackbits(combined, count=self.num_docs).astype(bool)
+
+    def rows(self, filters: Filters) -> np.ndarray:
+        """Sorted ids of the verses matching the filters."""
+        return np.flatnonzero(self.mask(filters))
@@ -0,0 +1,288 @@
+"""
+BhagavadGPT - Incremental Re-indexing
+Applies a delta (added, edited and deleted verses) to a SearchIndex,
+re-encoding only verses whose search text changed, and returns a new
+snapshot for an atomic swap.
+
+Delta format (JSON object):
+    {"upsert": [<verse record>, ...], "delete": [{"chapter": 2, "verse": 47}, ...]}
+or a JSON array / JSON Lines file of verse records, where a record with
+"op": "delete" deletes that verse and any other record is upserted.
+Verses are identified by (chapter, verse); numeric strings are accepted and
+stored as integers. Upserted records must pass the bundle schema check.
+
+Apply a delta file to the dataset and embedding cache offline:
+    python -m bhagavadgpt.incremental --dataset bhagavad_gita_dataset_expanded.json --delta delta.json
+or to a running app.py (needs ADMIN_TOKEN):
+    python -m bhagavadgpt.incremental --delta delta.json --server http://localhost:5000 --token $ADMIN_TOKEN
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from bhagavadgpt import embedding_cache
+from bhagavadgpt.bundle import validate_key, validate_record
+from bhagavadgpt.ingest import INGEST_BATCH_SIZE, iter_batches, iter_records
+from bhagavadgpt.neighbors import NeighborGraph
+from bhagavadgpt.quantization import QuantizedEmbeddings, exact_rows, load_or_quantize
+from bhagavadgpt.search_index import SearchIndex, verse_hash, verse_key
+from bhagavadgpt.vector_index import IVFIndex, rebuild_vector_index
+from bhagavadgpt.verse_store import VerseStore
+
+def _as_int(value: Any) -> Any:
+    """A numeric string as an int; anything else unchanged (and left to validation)."""
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return value
+
+def normalize_record(record: Any, position: int, upsert: bool) -> Dict[str, Any]:
+    """
+    Copy of a delta record with integer chapter/verse and without 'op'.
+    Upserts are checked like dataset records, deletes only need their key.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Delta record {position}: not a JSON object")
+
+    record = {k: v for k, v in record.items() if k != 'op'}
+    for field in ('chapter', 'verse'):
+        if field in record:
+            record[field] = _as_int(record[field])
+
+    errors = validate_record(record) if upsert else validate_key(record)
+    if errors:
+        raise ValueError(f"Delta record {position}: {'; '.join(errors)}")
+    return record
+
+def parse_delta(delta: Any) -> Tuple[List[Dict[str, Any]], Set[Tuple[int, int]]]:
+    """
+    Normalize a delta into (records to upsert, keys to delete).
+    Raises ValueError on malformed input.
+    """
+    if isinstance(delta, dict):
+        upserts = delta.get('upsert', [])
+        deletes = delta.get('delete', [])
+        if not isinstance(upserts, list) or not isinstance(deletes, list):
+            raise ValueError("'upsert' and 'delete' must be lists")
+    elif isinstance(delta, list):
+        upserts = [r for r in delta if not (isinstance(r, dict) and r.get('op') == 'delete')]
+        deletes = [r for r in delta if isinstance(r, dict) and r.get('op') == 'delete']
+    else:
+        raise ValueError("Delta must be a JSON object or a list of records")
+
+    upserts = [normalize_record(record, position, True) for position, record in enumerate(upserts)]
+    deletes = [normalize_record(record, position, False) for position, record in enumerate(deletes)]
+    return upserts, {verse_key(record) for record in deletes}
+
+def load_delta(file_path: str) -> Any:
+    """Read a delta file (JSON object, JSON array or JSON Lines)."""
+    with open(file_path, "r", encoding="utf-8") as file:
+        head = file.read(1024).lstrip()
+    if head.startswith('{') and not str(file_path).lower().endswith(('.jsonl', '.ndjson')):
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    return list(iter_records(file_path))
+
+def reindex_conflict(index: SearchIndex) -> Optional[str]:
+    """Why `index` cannot be updated incrementally, or None when it can."""
+    embeddings = index.corpus_embeddings
+    if isinstance(embeddings, QuantizedEmbeddings) and embeddings.full is None:
+        # Reusing rows would mean re-quantizing dequantized vectors, which
+        # drift further from the model's output on every re-index
+        return (f"Live re-indexing needs the float32 embeddings, but only {embeddings.dtype} codes are loaded. "
+                "Apply the delta offline (python -m bhagavadgpt.incremental) and restart the server.")
+    return None
+
+def apply_delta(
+    index: SearchIndex,
+    delta: Any,
+    model,
+    cache_dir: Optional[str] = None
+) -> Tuple[SearchIndex, Dict[str, Any]]:
+    """
+    Build a new SearchIndex with the delta applied. Unchanged verses keep
+    their embedding rows; only new or edited search text is encoded. The
+    keyword index is rebuilt (cheap, and BM25 statistics are corpus-wide),
+    the vector index is re-bucketed and only the neighbour graph rows the
+    delta can affect are recomputed.
+    `index` itself is never modified, so in-flight queries can keep using
+    it until the caller swaps. Raises RuntimeError when the index cannot
+    be updated incrementally (see reindex_conflict).
+    """
+    from bhagavadgpt.search import (
+        MODEL_NAME, SEARCH_TEXT_TEMPLATE, build_keyword_index, build_search_text, encode_texts
+    )
+
+    conflict = reindex_conflict(index)
+    if conflict:
+        raise RuntimeError(conflict)
+
+    start = time.perf_counter()
+    upserts, deletes = parse_delta(delta)
+    pending = {verse_key(record): record for record in upserts}
+    existing = {verse_key(item) for item in index.dataset}
+
+    # Keep dataset order: replace edited verses in place (every row with a
+    # duplicated key, so no stale copy survives), append new ones
+    dataset: List[Dict[str, Any]] = []
+    source_rows: List[int] = []
+    for row, item in enumerate(index.dataset):
+        key = verse_key(item)
+        if key in pending:
+            dataset.append(pending[key])
+            source_rows.append(row)
+        elif key not in deletes:
+            dataset.append(item)
+            source_rows.append(row)
+    for key, record in pending.items():
+        if key not in existing:
+            dataset.append(record)
+            source_rows.append(-1)
+
+    hashes = [verse_hash(item) for item in dataset]
+    reusable = np.array([
+        row >= 0 and index.verse_hashes[row] == new_hash
+        for row, new_hash in zip(source_rows, hashes)
+    ], dtype=bool)
+
+    # Copy unchanged rows, encode the rest in bounded batches
+    dim = index.corpus_embeddings.shape[1]
+    embeddings = np.empty((len(dataset), dim), dtype=np.float32)
+    rows = np.array(source_rows, dtype=np.int64)
+    embeddings[reusable] = exact_rows(index.corpus_embeddings, rows[reusable])
+
+    to_encode = np.flatnonzero(~reusable)
+    for batch in iter_batches(to_encode.tolist(), INGEST_BATCH_SIZE):
+        embeddings[batch] = encode_texts(model, [build_search_text(dataset[i]) for i in batch])
+
+    keyword_index = build_keyword_index(dataset)
+    if isinstance(index.dataset, VerseStore):
+        dataset = VerseStore.from_records(dataset)
+
+    # Persist so a restart with the updated dataset hits the cache, then
+    # serve from the memory-mapped copy like a normal start would
+    fingerprint = None
+    directory = embedding_cache.get_cache_dir(cache_dir)
+    try:
+        fingerprint = embedding_cache.compute_fingerprint(
+            (build_search_text(item) for item in dataset), MODEL_NAME, SEARCH_TEXT_TEMPLATE
+        )
+        embedding_cache.save_embeddings(directory, fingerprint, embeddings, MODEL_NAME)
+        cached = embedding_cache.load_embeddings(directory, fingerprint)
+        if cached is not None:
+            embeddings = cached
+    except OSError as e:
+        fingerprint = None
+        print(f"Warning: Could not write embedding cache: {e}")
+
+    corpus_embeddings = embeddings
+    if isinstance(index.corpus_embeddings, QuantizedEmbeddings):
+        corpus_embeddings = load_or_quantize(embeddings, index.corpus_embeddings.dtype, cache_dir)
+
+    vector_index = rebuild_vector_index(index.vector_index, corpus_embeddings)
+    new_index = SearchIndex(
+        dataset,
+        corpus_embeddings,
+        keyword_index,
+        vector_index,
+        hashes,
+        neighbor_graph=NeighborGraph.update(
+            index.neighbor_graph, dataset, corpus_embeddings, rows, reusable, vector_index
+        )
+    )
+
+    if fingerprint and isinstance(new_index.vector_index, IVFIndex):
+        try:
+            new_index.vector_index.save(directory, fingerprint)
+        except OSError as e:
+            print(f"Warning: Could not write IVF index: {e}")
+    if fingerprint:
+        try:
+            new_index.neighbor_graph.save(directory, fingerprint)
+        except OSError as e:
+            print(f"Warning: Could not write neighbour graph: {e}")
+
+    stats = {
+        'total_verses': len(dataset),
+        'added': sum(1 for row in source_rows if row < 0),
+        'updated': int(np.count_nonzero(~reusable & (rows >= 0))),
+        'deleted': len(deletes & existing),
+        'not_found': len(deletes - existing),
+        'encoded': int(to_encode.size),
+        'reused': int(np.count_nonzero(reusable)),
+        'seconds': round(time.perf_counter() - start, 4)
+    }
+    print(f"✓ Re-indexed: {stats}")
+    return new_index, stats
+
+def save_dataset(dataset: List[Dict[str, Any]], file_path: str) -> None:
+    """Atomically write the dataset back as a JSON array."""
+    path = Path(file_path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as file:
+        json.dump(list(dataset), file, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+# ==================== CLI ====================
+
+def post_delta(server: str, token: str, delta: Any, persist: bool) -> int:
+    """Send a delta to a running app's /api/admin/reindex endpoint."""
+    body = json.dumps({'delta': delta, 'persist': persist}).encode('utf-8')
+    req = urllib.request.Request(
+        server.rstrip('/') + '/api/admin/reindex',
+        data=body,
+        headers={'Content-Type': 'application/json', 'X-Admin-Token': token},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(req) as response:
+            print(response.read().decode('utf-8'))
+            return 0
+    except urllib.error.HTTPError as e:
+        print(f"Error: {e.code} {e.read().decode('utf-8')}")
+        return 1
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from bhagavadgpt.search import load_gita_dataset, preprocess_and_embed_dataset
+
+    parser = argparse.ArgumentParser(description="Apply a verse delta incrementally")
+    parser.add_argument('--delta', required=True, help="Delta file (JSON object, JSON array or JSON Lines)")
+    parser.add_argument('--dataset', default='bhagavad_gita_dataset_expanded.json',
+                        help="Dataset to update (offline mode)")
+    parser.add_argument('--output', default=None, help="Where to write the updated dataset (default: in place)")
+    parser.add_argument('--cache-dir', default=None, help="Embedding cache directory")
+    parser.add_argument('--server', default=None, help="Apply to a running app instead, e.g. http://localhost:5000")
+    parser.add_argument('--token', default=os.environ.get('ADMIN_TOKEN', ''), help="Admin token for --server")
+    parser.add_argument('--persist', action='store_true', help="With --server: also write the dataset file")
+    args = parser.parse_args(argv)
+
+    delta = load_delta(args.delta)
+
+    if args.server:
+        return post_delta(args.server, args.token, delta, args.persist)
+
+    dataset = load_gita_dataset(args.dataset)
+    if not dataset:
+        return 1
+
+    model, corpus_embeddings = preprocess_and_embed_dataset(dataset, cache_dir=args.cache_dir)
+    index = SearchIndex.build(dataset, corpus_embeddings)
+    try:
+        new_index, _ = apply_delta(index, delta, model, cache_dir=args.cache_dir)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return 1
+    save_dataset(new_index.dataset, args.output or args.dataset)
+    print(f"✓ Wrote {len(new_index)} verses to {args.output or args.dataset}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+BhagavadGPT - Streaming Ingestion
+Streams verse records from JSON arrays or JSON Lines, renders search text
+lazily and encodes it in fixed-size batches straight into a memory-mapped
+embedding matrix, so peak memory stays bounded by the batch size.
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from bhagavadgpt import embedding_cache
+
+# ==================== Configuration ====================
+
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 256))
+READ_CHUNK_SIZE = 1 << 16
+JSON_LINES_SUFFIXES = ('.jsonl', '.ndjson')
+# Print a progress line at most this often (seconds)
+PROGRESS_INTERVAL = 5.0
+
+# ==================== Record Streaming ====================
+
+def is_json_lines(file_path: str) -> bool:
+    """JSON Lines by extension, otherwise sniff the first non-blank character."""
+    if str(file_path).lower().endswith(JSON_LINES_SUFFIXES):
+        return True
+    with open(file_path, "r", encoding="utf-8") as file:
+        while True:
+            char = file.read(1)
+            if not char or not char.isspace():
+                return char != '['
+
+def iter_json_lines(file) -> Iterator[Dict[str, Any]]:
+    """Yield one record per non-blank line."""
+    for line_number, line in enumerate(file, 1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise json.JSONDecodeError(f"line {line_number}: {e.msg}", e.doc, e.pos) from e
+
+def iter_json_array(file, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and separators
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+            pos += 1
+
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise json.JSONDecodeError("Expected a JSON array", buffer, pos)
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                yield record
+                pos = end
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+
+        elif eof:
+            raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+
+        # Need more input: drop consumed text and read the next chunk
+        chunk = file.read(chunk_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        eof = not chunk
+
+def iter_records(file_path: str) -> Iterator[Dict[str, Any]]:
+    """Stream verse records from a JSON array or JSON Lines file."""
+    json_lines = is_json_lines(file_path)
+    with open(file_path, "r", encoding="utf-8") as file:
+        yield from (iter_json_lines(file) if json_lines else iter_json_array(file))
+
+# ==================== Batched Embedding ====================
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most batch_size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_corpus(
+    text_source: Callable[[], Iterable[str]],
+    encode: Callable[[List[str]], np.ndarray],
+    model_name: str,
+    template: str,
+    cache_dir: Optional[str] = None,
+    batch_size: int = INGEST_BATCH_SIZE
+) -> np.ndarray:
+    """
+    Embed a corpus from a re-iterable text source in two streaming passes:
+    the first counts texts and computes the cache fingerprint, the second
+    (skipped on a cache hit) encodes fixed-size batches into a memory-mapped
+    matrix in the cache directory. Falls back to a preallocated in-memory
+    matrix when the cache directory is not writable.
+    """
+    directory = embedding_cache.get_cache_dir(cache_dir)
+
+    # Pass 1: count and fingerprint without keeping the texts
+    fingerprinter = embedding_cache.Fingerprinter(model_name, template)
+    for text in text_source():
+        fingerprinter.update(text)
+    fingerprint = fingerprinter.hexdigest()
+    total = fingerprinter.count
+
+    embeddings = embedding_cache.load_embeddings(directory, fingerprint)
+    if embeddings is not None:
+        print(f"✓ Loaded cached embeddings from {directory} ({fingerprint[:12]})")
+        return embeddings
+
+    # Pass 2: encode in batches into a preallocated / memory-mapped matrix
+    print(f"Generating embeddings for {total} texts (batch size {batch_size})...")
+    matrix = None
+    tmp_path = directory / f"{embedding_cache.EMBEDDINGS_FILE}.{os.getpid()}.tmp"
+    row = 0
+    start = last_report = time.perf_counter()
+
+    for batch in iter_batches(text_source(), batch_size):
+        batch_embeddings = encode(batch)
+        if matrix is None:
+            shape = (total, batch_embeddings.shape[1])
+            try:
+                directory.mkdir(parents=True, exist_ok=True)
+                matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=shape)
+            except OSError as e:
+                print(f"Warning: Could not write embedding cache: {e}")
+                tmp_path = None
+                matrix = np.empty(shape, dtype=np.float32)
+
+        matrix[row:row + len(batch)] = batch_embeddings
+        row += len(batch)
+
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL or row == total:
+            elapsed = now - start
+            print(f"  {row}/{total} embedded ({row / max(elapsed, 1e-9):.0f} texts/s, {elapsed:.1f}s)")
+            last_report = now
+
+    if matrix is None:
+        matrix = np.empty((0, 0), dtype=np.float32)
+
+    if tmp_path is None or total == 0:
+        return matrix
+
+    matrix.flush()
+    del matrix
+    embedding_cache.replace_embeddings(directory, tmp_path)
+    embeddings = np.load(directory / embedding_cache.EMBEDDINGS_FILE, mmap_mode='r')
+    embedding_cache.write_manifest(directory, fingerprint, list(embeddings.shape), model_name)
+    print(f"✓ Cached embeddings to {directory} ({fingerprint[:12]})")
+    return embeddings
+
+def embed_dataset_file(
+    file_path: str,
+    model,
+    cache_dir: Optional[str] = None,
+    batch_size: int = INGEST_BATCH_SIZE
+) -> np.ndarray:
+    """Embed a dataset file without ever holding all of its records in memory."""
+    from bhagavadgpt.search import MODEL_NAME, SEARCH_TEXT_TEMPLATE, build_search_text, encode_texts
+
+    return embed_corpus(
+        lambda: (build_search_text(record) for record in iter_records(file_path)),
+        lambda texts: encode_texts(model, texts),
+        MODEL_NAME,
+        SEARCH_TEXT_TEMPLATE,
+        cache_dir=cache_dir,
+        batch_size=batch_size
+    )
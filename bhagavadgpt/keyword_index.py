@@ -0,0 +1,126 @@
+"""
+BhagavadGPT - Keyword Index
+Inverted index from token to verse ids, built once at load time so keyword
+scoring only touches the postings of the query terms.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Any, Optional, Set, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\b\w+\b")
+
+# Saved layout: all postings concatenated, addressed by per-token offsets
+KEYWORD_TOKENS_FILE = 'keyword_tokens.json'
+KEYWORD_IDS_FILE = 'keyword_ids.npy'
+KEYWORD_FREQS_FILE = 'keyword_freqs.npy'
+KEYWORD_OFFSETS_FILE = 'keyword_offsets.npy'
+
+# Verse fields searched by the keyword scorer
+KEYWORD_FIELDS = ('keywords', 'themes', 'translation')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def verse_field_text(item: Dict[str, Any], field: str) -> str:
+    """Return a verse field as plain text (list fields are space-joined)."""
+    value = item.get(field, '')
+    if isinstance(value, (list, tuple)):
+        return " ".join(value)
+    return value or ''
+
+class KeywordIndex:
+    """
+    Token -> (verse ids, term frequencies) postings over the keyword fields.
+
+    Tokens are matched whole, so "art" no longer matches inside "heart".
+    """
+
+    def __init__(self, postings: Dict[str, Tuple[np.ndarray, np.ndarray]], num_docs: int):
+        self.postings = postings
+        self.num_docs = num_docs
+
+    @classmethod
+    def build(cls, dataset: List[Dict[str, Any]], fields: Iterable[str] = KEYWORD_FIELDS) -> 'KeywordIndex':
+        """Build the index from the dataset."""
+        fields = tuple(fields)
+        doc_ids: Dict[str, List[int]] = {}
+        freqs: Dict[str, List[int]] = {}
+
+        for doc_id, item in enumerate(dataset):
+            counts: Dict[str, int] = {}
+            for field in fields:
+                for token in tokenize(verse_field_text(item, field)):
+                    counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                doc_ids.setdefault(token, []).append(doc_id)
+                freqs.setdefault(token, []).append(count)
+
+        postings = {
+            token: (np.array(ids, dtype=np.int32), np.array(freqs[token], dtype=np.int32))
+            for token, ids in doc_ids.items()
+        }
+        return cls(postings, len(dataset))
+
+    def save(self, directory: Path) -> None:
+        """Write the postings as concatenated id/frequency arrays plus token offsets."""
+        directory.mkdir(parents=True, exist_ok=True)
+        tokens = list(self.postings)
+        lengths = [len(self.postings[token][0]) for token in tokens]
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        empty = np.zeros(0, dtype=np.int32)
+        np.save(directory / KEYWORD_IDS_FILE, np.concatenate([self.postings[t][0] for t in tokens] or [empty]))
+        np.save(directory / KEYWORD_FREQS_FILE, np.concatenate([self.postings[t][1] for t in tokens] or [empty]))
+        np.save(directory / KEYWORD_OFFSETS_FILE, offsets)
+        with open(directory / KEYWORD_TOKENS_FILE, "w", encoding="utf-8") as file:
+            json.dump({'num_docs': self.num_docs, 'tokens': tokens}, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: Path) -> 'KeywordIndex':
+        """Memory-map saved postings; each token's arrays are views, not copies."""
+        with open(directory / KEYWORD_TOKENS_FILE, "r", encoding="utf-8") as file:
+            header = json.load(file)
+        ids = np.load(directory / KEYWORD_IDS_FILE, mmap_mode='r')
+        freqs = np.load(directory / KEYWORD_FREQS_FILE, mmap_mode='r')
+        offsets = np.load(directory / KEYWORD_OFFSETS_FILE).tolist()
+        postings = {
+            token: (ids[offsets[i]:offsets[i + 1]], freqs[offsets[i]:offsets[i + 1]])
+            for i, token in enumerate(header['tokens'])
+        }
+        return cls(postings, header['num_docs'])
+
+    def score(self, query_keywords: Iterable[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Count how many distinct query keywords occur in each verse and
+        normalize to 0-1 by the best match. With `rows` (sorted verse ids),
+        only those verses are scored, in that order.
+        """
+        scores = np.zeros(self.num_docs if rows is None else len(rows), dtype=np.float32)
+        for keyword in set(query_keywords):
+            posting = self.postings.get(keyword)
+            if posting is None:
+                continue
+            if rows is None:
+                scores[posting[0]] += 1.0
+            else:
+                positions = np.searchsorted(rows, posting[0])
+                in_rows = positions < len(rows)
+                in_rows[in_rows] = rows[positions[in_rows]] == posting[0][in_rows]
+                scores[positions[in_rows]] += 1.0
+
+        max_score = scores.max() if scores.size else 0.0
+        if max_score > 0:
+            scores /= max_score
+        return scores
+
+    def score_many(self, queries: List[Set[str]], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Keyword scores for several queries as a (queries x verses) matrix."""
+        scores = np.zeros((len(queries), self.num_docs if rows is None else len(rows)), dtype=np.float32)
+        for row, query_keywords in enumerate(queries):
+            scores[row] = self.score(query_keywords, rows)
+        return scores
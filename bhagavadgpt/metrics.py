@@ -0,0 +1,246 @@
+"""
+BhagavadGPT - Metrics
+Hot-path stage timings, request counters and their Prometheus text
+rendering for /api/metrics.
+
+Code wraps each stage (dataset load, index bundle load, model load, corpus / query encode,
+keyword scoring, similarity, top-k, formatting) in `stage(name)`. Every
+observation feeds a process-wide histogram and, inside a request started
+with `start_request()`, that request's own breakdown, which can be sent as a
+Server-Timing header (SERVER_TIMING=1). With DEBUG_PROFILE_RATE > 0 that
+fraction of requests is also run under cProfile and the hottest functions
+are printed.
+"""
+
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# ==================== Configuration ====================
+
+# Add a Server-Timing header with the per-stage breakdown to API responses
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+# Fraction of requests profiled with cProfile (debug only; 0 = off)
+DEBUG_PROFILE_RATE = float(os.environ.get('DEBUG_PROFILE_RATE', 0))
+# Functions printed per profiled request
+PROFILE_TOP_FUNCTIONS = 25
+# Recent observations per stage used for the p50/p95/p99 quantiles
+METRICS_WINDOW = 1024
+
+HISTOGRAM_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                     0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = 'bhagavadgpt'
+
+class Histogram:
+    """
+    Thread-safe latency histogram: cumulative Prometheus buckets plus a ring
+    buffer of the last METRICS_WINDOW observations for quantiles.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.bucket_counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._recent = np.zeros(window, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        bucket = bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)
+        with self._lock:
+            self._recent[self.count % self._recent.size] = seconds
+            self.bucket_counts[bucket] += 1
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Count, sum, cumulative bucket counts and recent-window quantiles."""
+        with self._lock:
+            recent = self._recent[:min(self.count, self._recent.size)].copy()
+            buckets = list(np.cumsum(self.bucket_counts))
+            count, total = self.count, self.total
+        quantiles = {q: float(np.quantile(recent, q)) if recent.size else 0.0 for q in QUANTILES}
+        return {'count': count, 'sum': total, 'buckets': buckets, 'quantiles': quantiles}
+
+class RequestTimings:
+    """Per-request stage totals (seconds) and the optional profiler."""
+
+    __slots__ = ('started', 'stages', 'profiler')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. 'query_encode;dur=4.12, total;dur=6.80'."""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+# ==================== Registry ====================
+
+_stage_histograms: Dict[str, Histogram] = {}
+_request_histograms: Dict[str, Histogram] = {}
+_request_counts: Dict[Tuple[str, str], int] = {}
+_registry_lock = threading.Lock()
+_profile_lock = threading.Lock()  # one cProfile session at a time per process
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('bhagavadgpt_request_timings', default=None)
+
+def _histogram(histograms: Dict[str, Histogram], name: str) -> Histogram:
+    histogram = histograms.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = histograms.setdefault(name, Histogram())
+    return histogram
+
+def observe(name: str, seconds: float) -> None:
+    """Record a stage duration globally and on the current request, if any."""
+    _histogram(_stage_histograms, name).observe(seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.stages[name] = timings.stages.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+def start_request(profile: bool = True) -> RequestTimings:
+    """
+    Begin collecting stage timings for the current request (thread or task).
+    Samples the request for profiling when DEBUG_PROFILE_RATE allows it.
+    """
+    timings = RequestTimings()
+    _current.set(timings)
+    if profile and DEBUG_PROFILE_RATE > 0 and random.random() < DEBUG_PROFILE_RATE:
+        if _profile_lock.acquire(blocking=False):
+            timings.profiler = cProfile.Profile()
+            timings.profiler.enable()
+    return timings
+
+def finish_request(timings: Optional[RequestTimings], endpoint: str, status: int) -> None:
+    """Count the request, record its latency and print its profile if sampled."""
+    _current.set(None)
+    if timings is None:
+        return
+
+    elapsed = time.perf_counter() - timings.started
+    _histogram(_request_histograms, endpoint).observe(elapsed)
+    key = (endpoint, str(status))
+    with _registry_lock:
+        _request_counts[key] = _request_counts.get(key, 0) + 1
+
+    if timings.profiler is not None:
+        timings.profiler.disable()
+        _profile_lock.release()
+        output = io.StringIO()
+        pstats.Stats(timings.profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        print(f"🔍 Profile of {endpoint} ({elapsed * 1000:.1f} ms, status {status})\n{output.getvalue()}")
+        timings.profiler = None
+
+def current_request() -> Optional[RequestTimings]:
+    return _current.get()
+
+# ==================== Prometheus Rendering ====================
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels: Any) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _render_histograms(lines: List[str], name: str, help_text: str, label: str, histograms: Dict[str, Histogram]) -> None:
+    metric = f"{METRIC_PREFIX}_{name}_seconds"
+    with _registry_lock:
+        items = sorted(histograms.items())
+    snapshots = {key: histogram.snapshot() for key, histogram in items}
+
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for key, snapshot in snapshots.items():
+        for bound, cumulative in zip(HISTOGRAM_BUCKETS + ('+Inf',), snapshot['buckets']):
+            lines.append(f"{metric}_bucket{_labels(**{label: key, 'le': str(bound)})} {cumulative}")
+        lines.append(f"{metric}_sum{_labels(**{label: key})} {snapshot['sum']:.9f}")
+        lines.append(f"{metric}_count{_labels(**{label: key})} {snapshot['count']}")
+
+    recent = f"{METRIC_PREFIX}_{name}_recent_seconds"
+    lines.append(f"# HELP {recent} {help_text} (last {METRICS_WINDOW} observations)")
+    lines.append(f"# TYPE {recent} summary")
+    for key, snapshot in snapshots.items():
+        for q, value in snapshot['quantiles'].items():
+            lines.append(f"{recent}{_labels(**{label: key, 'quantile': str(q)})} {value:.9f}")
+        lines.append(f"{recent}_sum{_labels(**{label: key})} {snapshot['sum']:.9f}")
+        lines.append(f"{recent}_count{_labels(**{label: key})} {snapshot['count']}")
+
+def render_prometheus(extra_counters: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    """
+    All metrics in Prometheus text exposition format. `extra_counters` maps
+    a metric name to {'help': ..., 'type': ..., 'values': [(labels, value), ...]}
+    for app-specific values such as cache hit counts.
+    """
+    lines: List[str] = []
+    _render_histograms(lines, 'stage', 'Time spent in each search pipeline stage', 'stage', _stage_histograms)
+    _render_histograms(lines, 'request', 'API request latency by endpoint', 'endpoint', _request_histograms)
+
+    metric = f"{METRIC_PREFIX}_requests_total"
+    lines.append(f"# HELP {metric} API requests by endpoint and status")
+    lines.append(f"# TYPE {metric} counter")
+    with _registry_lock:
+        counts = sorted(_request_counts.items())
+    for (endpoint, status), count in counts:
+        lines.append(f"{metric}{_labels(endpoint=endpoint, status=status)} {count}")
+
+    for name, spec in (extra_counters or {}).items():
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {spec['help']}")
+        lines.append(f"# TYPE {metric} {spec.get('type', 'counter')}")
+        for labels, value in spec['values']:
+            lines.append(f"{metric}{_labels(**labels) if labels else ''} {value}")
+
+    return "\n".join(lines) + "\n"
+
+def app_counters(cache_statistics: Dict[str, Dict[str, Any]], model=None, reranker=None) -> Dict[str, Dict[str, Any]]:
+    """Cache, encoder-batching and reranker counters in render_prometheus' `extra_counters` shape."""
+    counters = {
+        'cache_hits_total': {
+            'help': 'Query cache hits',
+            'values': [({'cache': name}, stats['hits']) for name, stats in cache_statistics.items()],
+        },
+        'cache_misses_total': {
+            'help': 'Query cache misses',
+            'values': [({'cache': name}, stats['misses']) for name, stats in cache_statistics.items()],
+        },
+        'cache_entries': {
+            'help': 'Entries currently cached',
+            'type': 'gauge',
+            'values': [({'cache': name}, stats['size']) for name, stats in cache_statistics.items()],
+        },
+    }
+    if model is not None and hasattr(model, 'stats'):
+        batching = model.stats()
+        counters['encode_batches_total'] = {'help': 'Coalesced query encode batches', 'values': [({}, batching['batches'])]}
+        counters['encode_batched_sentences_total'] = {
+            'help': 'Sentences encoded through coalesced batches', 'values': [({}, batching['sentences'])]
+        }
+    if reranker is not None:
+        reranking = reranker.stats()
+        counters['rerank_queries_total'] = {
+            'help': 'Queries reranked by the cross-encoder, or answered in first-stage order when over budget',
+            'values': [({'outcome': 'reranked'}, reranking['reranked']), ({'outcome': 'fallback'}, reranking['fallbacks'])]
+        }
+    return counters
@@ -0,0 +1,351 @@
+"""
+BhagavadGPT - Verse Neighbours
+Precomputed "more like this" graph behind /api/verses/<chapter>/<verse>/similar.
+
+At index time every verse's SIMILAR_CANDIDATES nearest verses by embedding
+are re-scored with theme overlap, and the best SIMILAR_K are kept as two
+(verses x k) arrays: int32 ids and float16 scores. A lookup reads one row of
+each, so it costs O(k) and never runs the model. The graph is saved next to
+the embedding cache (and in the index bundle) and rebuilt when the
+embeddings change. An incremental re-index only recomputes the rows that a
+delta can affect (see NeighborGraph.update).
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from bhagavadgpt.metrics import stage
+from bhagavadgpt.quantization import QuantizedEmbeddings, exact_rows
+from bhagavadgpt.verse_store import KEY_SHIFT, VerseStore, pack_key
+
+# ==================== Configuration ====================
+
+# Neighbours stored per verse (the most /similar can return)
+SIMILAR_K = int(os.environ.get('SIMILAR_K', 10))
+# Nearest verses by embedding re-scored with theme overlap, per verse
+SIMILAR_CANDIDATES = int(os.environ.get('SIMILAR_CANDIDATES', 50))
+# Share of a neighbour's score from theme overlap (Jaccard); the rest is cosine
+SIMILAR_THEME_WEIGHT = float(os.environ.get('SIMILAR_THEME_WEIGHT', 0.3))
+DEFAULT_SIMILAR_TOP_K = 5
+
+NEIGHBOR_IDS_FILE = 'neighbor_ids.npy'
+NEIGHBOR_SCORES_FILE = 'neighbor_scores.npy'
+NEIGHBOR_MANIFEST_FILE = 'neighbors.json'
+# Score matrix entries per block while building (bounds temporary memory)
+BUILD_BLOCK_ELEMENTS = 1 << 24
+
+def _row_keys(dataset) -> np.ndarray:
+    """Packed (chapter, verse) key of every row."""
+    if isinstance(dataset, VerseStore):
+        return (np.asarray(dataset.chapters, dtype=np.int64) << KEY_SHIFT) + dataset.verses
+    return np.array([pack_key(item.get('chapter'), item.get('verse')) for item in dataset], dtype=np.int64)
+
+def _row_themes(dataset) -> List[FrozenSet]:
+    """Theme set of every row (interned ids for a VerseStore, strings otherwise)."""
+    if isinstance(dataset, VerseStore):
+        return [frozenset(dataset.label_id_array(row, 'themes').tolist()) for row in range(len(dataset))]
+    return [frozenset(item.get('themes') or []) for item in dataset]
+
+def _jaccard(a: FrozenSet, b: FrozenSet) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+def _blended_candidates(
+    rows: np.ndarray,
+    keys: np.ndarray,
+    themes: List[FrozenSet],
+    corpus_embeddings,
+    vector_index,
+    count: int,
+    theme_weight: float
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    (row, candidate ids, blended scores) for each of `rows`: its `count`
+    nearest verses by embedding, minus rows with its own chapter and verse,
+    scored by exact cosine blended with theme overlap. Rows are scored in
+    blocks to bound the temporary score matrix.
+    """
+    from bhagavadgpt.search import top_k_indices
+
+    num_docs = keys.shape[0]
+    approximate = vector_index is not None and not vector_index.exact
+    block_size = max(1, BUILD_BLOCK_ELEMENTS // num_docs)
+
+    for start in range(0, rows.shape[0], block_size):
+        block = rows[start:start + block_size]
+        queries = exact_rows(corpus_embeddings, block)
+        if approximate:
+            candidate_ids, _ = vector_index.search(queries, count)
+        elif isinstance(corpus_embeddings, QuantizedEmbeddings):
+            candidate_ids = top_k_indices(corpus_embeddings.dot(queries), count)
+        else:
+            candidate_ids = top_k_indices(queries @ corpus_embeddings.T, count)
+
+        for query, row, row_candidates in zip(queries, block, candidate_ids):
+            row_candidates = row_candidates[row_candidates >= 0]
+            row_candidates = row_candidates[keys[row_candidates] != keys[row]]
+            if not row_candidates.size:
+                yield int(row), row_candidates, np.empty(0, dtype=np.float32)
+                continue
+            cosine = exact_rows(corpus_embeddings, row_candidates) @ query
+            overlap = np.array([_jaccard(themes[row], themes[c]) for c in row_candidates], dtype=np.float32)
+            yield int(row), row_candidates, (1.0 - theme_weight) * cosine + theme_weight * overlap
+
+def _keep_best(ids: np.ndarray, scores: np.ndarray, row: int, row_candidates: np.ndarray, blended: np.ndarray) -> None:
+    """Store a row's best `k` candidates, best first."""
+    from bhagavadgpt.search import top_k_indices
+
+    if not row_candidates.size:
+        return
+    best = top_k_indices(blended, ids.shape[1])[0]
+    ids[row, :best.size] = row_candidates[best]
+    scores[row, :best.size] = blended[best]
+
+def _offer(ids: np.ndarray, scores: np.ndarray, row: int, neighbor: int, score: float) -> None:
+    """Insert `neighbor` into a row's sorted neighbours if it beats the last one (or fills padding)."""
+    filled = int(np.count_nonzero(ids[row] >= 0))
+    if filled == ids.shape[1] and score <= scores[row, -1]:
+        return
+    position = int(np.count_nonzero(scores[row, :filled] >= score))
+    ids[row, position + 1:] = ids[row, position:-1].copy()
+    scores[row, position + 1:] = scores[row, position:-1].copy()
+    ids[row, position] = neighbor
+    scores[row, position] = score
+
+class NeighborGraph:
+    """Top-k similar verses per verse, best first; rows padded with id -1."""
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
+
+    @classmethod
+    def build(
+        cls,
+        dataset,
+        corpus_embeddings,
+        vector_index=None,
+        k: int = SIMILAR_K,
+        candidates: int = SIMILAR_CANDIDATES,
+        theme_weight: float = SIMILAR_THEME_WEIGHT
+    ) -> 'NeighborGraph':
+        """
+        Blend cosine similarity with theme overlap over each verse's nearest
+        candidates. Candidates come from an approximate vector index when
+        one is given, otherwise from exact scoring; the cosine part is
+        always exact. Other rows with the same chapter and verse are skipped.
+        """
+        num_docs = len(dataset)
+        ids = np.full((num_docs, k), -1, dtype=np.int32)
+        scores = np.zeros((num_docs, k), dtype=np.float16)
+        if num_docs == 0:
+            return cls(ids, scores)
+
+        # +1 leaves room for the verse itself, which is always its own best match
+        count = min(num_docs, max(candidates, k) + 1)
+        for row, row_candidates, blended in _blended_candidates(
+            np.arange(num_docs), _row_keys(dataset), _row_themes(dataset),
+            corpus_embeddings, vector_index, count, theme_weight
+        ):
+            _keep_best(ids, scores, row, row_candidates, blended)
+
+        return cls(ids, scores)
+
+    @classmethod
+    def update(
+        cls,
+        previous: 'NeighborGraph',
+        dataset,
+        corpus_embeddings,
+        source_rows: np.ndarray,
+        reused: np.ndarray,
+        vector_index=None,
+        k: int = SIMILAR_K,
+        candidates: int = SIMILAR_CANDIDATES,
+        theme_weight: float = SIMILAR_THEME_WEIGHT
+    ) -> 'NeighborGraph':
+        """
+        The graph of a re-indexed dataset, derived from the graph before the
+        delta. `source_rows[row]` is a new row's row in the previous dataset
+        (-1 if added) and `reused[row]` says its search text (so embedding and
+        themes) is unchanged. Only added and edited verses, and verses that
+        had an edited or deleted neighbour, are recomputed; every other row
+        keeps its neighbours (renumbered) unless an added or edited verse
+        now scores higher than its last one. Like approximate candidates,
+        this can differ from a full build for verses whose candidate window
+        merely shifted; the next full build (e.g. on restart) recomputes them.
+        """
+        num_docs = len(dataset)
+        if previous.k != k or num_docs == 0:
+            return cls.build(dataset, corpus_embeddings, vector_index, k, candidates, theme_weight)
+
+        old_to_new = np.full(previous.ids.shape[0] + 1, -1, dtype=np.int64)
+        old_to_new[source_rows[reused]] = np.flatnonzero(reused)
+        # Previous ids with -1 (padding) land on the extra last slot, which stays -1
+        previous_ids = np.asarray(previous.ids, dtype=np.int64)
+        renumbered = old_to_new[np.where(previous_ids >= 0, previous_ids, -1)]
+        stale = (renumbered < 0) & (previous_ids >= 0)
+
+        ids = np.full((num_docs, k), -1, dtype=np.int32)
+        scores = np.zeros((num_docs, k), dtype=np.float16)
+        reused_rows = np.flatnonzero(reused)
+        ids[reused_rows] = renumbered[source_rows[reused_rows]]
+        scores[reused_rows] = previous.scores[source_rows[reused_rows]]
+
+        dirty = ~reused
+        dirty[reused_rows] = stale[source_rows[reused_rows]].any(axis=1)
+
+        keys = _row_keys(dataset)
+        count = min(num_docs, max(candidates, k) + 1)
+        offers = []
+        for row, row_candidates, blended in _blended_candidates(
+            np.flatnonzero(dirty), keys, _row_themes(dataset), corpus_embeddings, vector_index, count, theme_weight
+        ):
+            ids[row], scores[row] = -1, 0
+            _keep_best(ids, scores, row, row_candidates, blended)
+            if not reused[row]:
+                offers.append((row, row_candidates, blended))
+
+        # Blended scores are symmetric: offer each new or edited verse to the
+        # untouched rows among its own candidates
+        for row, row_candidates, blended in offers:
+            for other, score in zip(row_candidates.tolist(), blended.tolist()):
+                if not dirty[other]:
+                    _offer(ids, scores, other, row, score)
+
+        return cls(ids, scores)
+
+    def neighbors(self, row: int, top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, float32 scores) of a verse's best `top_k` neighbours, in O(top_k)."""
+        ids = self.ids[row, :top_k]
+        keep = ids >= 0
+        return ids[keep], self.scores[row, :top_k][keep].astype(np.float32)
+
+    def save(self, directory: Path, fingerprint: str, candidates: int = SIMILAR_CANDIDATES,
+             theme_weight: float = SIMILAR_THEME_WEIGHT) -> None:
+        """Write the graph next to the embedding cache, tagged with its fingerprint and settings."""
+        directory.mkdir(parents=True, exist_ok=True)
+        for filename, array in ((NEIGHBOR_IDS_FILE, self.ids), (NEIGHBOR_SCORES_FILE, self.scores)):
+            tmp = directory / f"{filename}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                np.save(file, np.ascontiguousarray(array))
+            os.replace(tmp, directory / filename)
+
+        manifest = {
+            'fingerprint': fingerprint,
+            'k': self.k,
+            'candidates': candidates,
+            'theme_weight': theme_weight,
+            'num_verses': int(self.ids.shape[0])
+        }
+        tmp = directory / f"{NEIGHBOR_MANIFEST_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp, directory / NEIGHBOR_MANIFEST_FILE)
+
+    @classmethod
+    def load(
+        cls,
+        directory: Path,
+        fingerprint: str,
+        k: int = SIMILAR_K,
+        candidates: int = SIMILAR_CANDIDATES,
+        theme_weight: float = SIMILAR_THEME_WEIGHT
+    ) -> Optional['NeighborGraph']:
+        """Memory-map a saved graph built from the same embeddings and settings, else None."""
+        try:
+            with open(directory / NEIGHBOR_MANIFEST_FILE, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            if (manifest.get('fingerprint') != fingerprint or manifest.get('k') != k
+                    or manifest.get('candidates') != candidates or manifest.get('theme_weight') != theme_weight):
+                return None
+            ids = np.load(directory / NEIGHBOR_IDS_FILE, mmap_mode='r')
+            scores = np.load(directory / NEIGHBOR_SCORES_FILE, mmap_mode='r')
+        except (FileNotFoundError, ValueError, json.JSONDecodeError):
+            return None
+        if ids.shape != scores.shape or ids.shape[0] != manifest.get('num_verses'):
+            return None
+        return cls(ids, scores)
+
+def load_or_build_neighbor_graph(
+    dataset,
+    corpus_embeddings,
+    vector_index=None,
+    cache_dir: Optional[str] = None
+) -> NeighborGraph:
+    """
+    Load the neighbour graph from the embedding cache directory when it
+    matches the cached embeddings' fingerprint, else build (and save) it.
+    """
+    from bhagavadgpt import embedding_cache
+
+    directory = embedding_cache.get_cache_dir(cache_dir)
+    manifest = embedding_cache.read_manifest(directory)
+    fingerprint = manifest.get('fingerprint') if manifest and manifest.get('shape') == list(corpus_embeddings.shape) else None
+
+    if fingerprint:
+        graph = NeighborGraph.load(directory, fingerprint)
+        if graph is not None:
+            print(f"✓ Loaded neighbour graph from {directory} ({graph.k} per verse)")
+            return graph
+
+    graph = NeighborGraph.build(dataset, corpus_embeddings, vector_index)
+    print(f"✓ Neighbour graph built ({graph.k} per verse)")
+
+    if fingerprint:
+        try:
+            graph.save(directory, fingerprint)
+        except OSError as e:
+            print(f"Warning: Could not write neighbour graph: {e}")
+
+    return graph
+
+# ==================== Lookups ====================
+
+def parse_similar_top_k(args: Mapping[str, Any]) -> int:
+    """
+    Read `top_k` from the query string of a /similar request.
+    Raises ValueError with a client-facing message on invalid input.
+    """
+    value = args.get('top_k', min(DEFAULT_SIMILAR_TOP_K, SIMILAR_K))
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        top_k = 0
+    if not 1 <= top_k <= SIMILAR_K:
+        raise ValueError(f"'top_k' must be an integer between 1 and {SIMILAR_K}")
+    return top_k
+
+def similar_verses(index, chapter: int, verse: int, top_k: int = DEFAULT_SIMILAR_TOP_K) -> Optional[Dict[str, Any]]:
+    """
+    /similar payload for one verse of a SearchIndex snapshot: the verse and
+    its `top_k` neighbours (with their score and the themes they share), or
+    None if the verse does not exist.
+    """
+    from bhagavadgpt.search import verse_fields, verse_payload
+
+    with stage('similar'):
+        row = index.row_of(chapter, verse)
+        if row is None:
+            return None
+
+        item = index.dataset[row]
+        source_themes = set(item.get('themes') or [])
+        similar = []
+        ids, scores = index.neighbor_graph.neighbors(row, top_k)
+        for neighbor, score in zip(ids.tolist(), scores.tolist()):
+            neighbor_item = index.dataset[neighbor]
+            # float16 scores are only good to about three decimals
+            payload = verse_payload({'verse_data': neighbor_item, 'score': round(score, 4)})
+            payload['shared_themes'] = [theme for theme in neighbor_item.get('themes') or [] if theme in source_themes]
+            similar.append(payload)
+
+        return {'verse': verse_fields(item), 'similar': similar}
@@ -0,0 +1,196 @@
+"""
+BhagavadGPT - Quantized Embeddings
+Compact corpus embeddings: float16, or int8 with a per-vector scale.
+Queries are scored against the compact codes block by block (upcast into a
+small reusable float32 buffer so NumPy can use BLAS), and only a shortlist
+is re-scored with the full-precision vectors, which stay memory-mapped on
+disk instead of resident in every worker.
+
+EMBEDDING_DTYPE selects the storage: float32 (default, no quantization),
+float16 or int8. int8 is the one to use for speed: NumPy's float16 to
+float32 conversion has no vectorized path, so float16 saves memory but
+scores about 10x slower than float32. Codes are saved next to the
+embedding cache and reused while its fingerprint matches.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+# ==================== Configuration ====================
+
+EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
+EMBEDDING_DTYPE = os.environ.get('EMBEDDING_DTYPE', 'float32').lower()
+# Approximate top candidates re-scored at full precision per query
+RESCORE_CANDIDATES = int(os.environ.get('RESCORE_CANDIDATES', 50))
+# Rows upcast per block while scoring (small enough to stay in cache)
+SCORE_BLOCK_SIZE = 1024
+
+QUANTIZED_CODES_FILE = 'embeddings.{dtype}.npy'
+QUANTIZED_SCALES_FILE = 'embeddings.scales.npy'
+QUANTIZED_MANIFEST_FILE = 'quantized.json'
+
+class QuantizedEmbeddings:
+    """
+    Read-only compact embedding matrix. `codes` is float16, or int8 with
+    `scales` (vector ~= codes * scale). `full`, when available, is the
+    float32 matrix used for rescoring (normally the memory-mapped cache).
+    """
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None, full: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+        self.full = full
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the compact representation (excluding the on-disk float32 copy)."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @classmethod
+    def quantize(cls, embeddings: np.ndarray, dtype: str, full: Optional[np.ndarray] = None) -> 'QuantizedEmbeddings':
+        """Quantize float32 embeddings block by block (bounded temporary memory)."""
+        codes = np.empty(embeddings.shape, dtype=dtype)
+        scales = np.empty(embeddings.shape[0], dtype=np.float32) if dtype == 'int8' else None
+        for start in range(0, embeddings.shape[0], SCORE_BLOCK_SIZE * 16):
+            block = np.asarray(embeddings[start:start + SCORE_BLOCK_SIZE * 16], dtype=np.float32)
+            end = start + block.shape[0]
+            if scales is None:
+                codes[start:end] = block
+            else:
+                block_scales = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127.0
+                codes[start:end] = np.rint(block / block_scales[:, None])
+                scales[start:end] = block_scales
+        return cls(codes, scales, full)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """Dequantized float32 rows (approximate)."""
+        vectors = self.codes[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][..., None]
+        return vectors
+
+    def full_rows(self, rows) -> np.ndarray:
+        """Full-precision rows when the float32 matrix is available, else dequantized."""
+        if self.full is not None:
+            return np.asarray(self.full[rows], dtype=np.float32)
+        return self[rows]
+
+    def dot(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate (queries x rows) inner products against the compact codes."""
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        codes = self.codes if rows is None else self.codes[rows]
+        num_rows = codes.shape[0]
+
+        scores = np.empty((queries.shape[0], num_rows), dtype=np.float32)
+        buffer = np.empty((min(SCORE_BLOCK_SIZE, num_rows), codes.shape[1]), dtype=np.float32)
+        for start in range(0, num_rows, SCORE_BLOCK_SIZE):
+            block = codes[start:start + SCORE_BLOCK_SIZE]
+            upcast = buffer[:block.shape[0]]
+            np.copyto(upcast, block)
+            scores[:, start:start + block.shape[0]] = queries @ upcast.T
+
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def save(self, directory: Path, fingerprint: str) -> None:
+        """Write codes (and scales) next to the embedding cache, manifest last."""
+        directory.mkdir(parents=True, exist_ok=True)
+        arrays = [(QUANTIZED_CODES_FILE.format(dtype=self.dtype), self.codes)]
+        if self.scales is not None:
+            arrays.append((QUANTIZED_SCALES_FILE, self.scales))
+        for filename, array in arrays:
+            tmp = directory / f"{filename}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                np.save(file, array)
+            os.replace(tmp, directory / filename)
+
+        manifest = {'fingerprint': fingerprint, 'dtype': self.dtype, 'shape': list(self.shape)}
+        tmp = directory / f"{QUANTIZED_MANIFEST_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp, directory / QUANTIZED_MANIFEST_FILE)
+
+    @classmethod
+    def load(
+        cls,
+        directory: Path,
+        fingerprint: str,
+        dtype: str,
+        full: Optional[np.ndarray] = None
+    ) -> Optional['QuantizedEmbeddings']:
+        """Memory-map saved codes if they match the fingerprint and dtype, else None."""
+        try:
+            with open(directory / QUANTIZED_MANIFEST_FILE, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            if manifest.get('fingerprint') != fingerprint or manifest.get('dtype') != dtype:
+                return None
+            codes = np.load(directory / QUANTIZED_CODES_FILE.format(dtype=dtype), mmap_mode='r')
+            scales = np.load(directory / QUANTIZED_SCALES_FILE, mmap_mode='r') if dtype == 'int8' else None
+        except (FileNotFoundError, ValueError, json.JSONDecodeError):
+            return None
+        return cls(codes, scales, full)
+
+def exact_rows(corpus_embeddings: Union[np.ndarray, QuantizedEmbeddings], rows) -> np.ndarray:
+    """Full-precision float32 rows of plain or quantized corpus embeddings."""
+    if isinstance(corpus_embeddings, QuantizedEmbeddings):
+        return corpus_embeddings.full_rows(rows)
+    return corpus_embeddings[rows]
+
+def load_or_quantize(
+    embeddings: np.ndarray,
+    dtype: Optional[str] = None,
+    cache_dir: Optional[str] = None
+) -> Union[np.ndarray, QuantizedEmbeddings]:
+    """
+    Wrap corpus embeddings in the configured storage dtype. Codes are loaded
+    from (or saved to) the embedding cache directory when the embeddings
+    came from the cache; the float32 matrix is kept for rescoring only if it
+    is memory-mapped, so quantizing always lowers resident memory.
+    """
+    from bhagavadgpt import embedding_cache
+
+    dtype = (dtype or EMBEDDING_DTYPE).lower()
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype '{dtype}', expected one of {EMBEDDING_DTYPES}")
+    if dtype == 'float32' or embeddings.shape[0] == 0:
+        return embeddings
+    if dtype == 'float16':
+        print("Warning: float16 embeddings only save memory; scoring is ~10x slower than float32 (int8 is not)")
+
+    full = embeddings if isinstance(embeddings, np.memmap) else None
+    directory = embedding_cache.get_cache_dir(cache_dir)
+    manifest = embedding_cache.read_manifest(directory)
+    fingerprint = manifest.get('fingerprint') if manifest and manifest.get('shape') == list(embeddings.shape) else None
+
+    if fingerprint and full is not None:
+        quantized = QuantizedEmbeddings.load(directory, fingerprint, dtype, full)
+        if quantized is not None:
+            print(f"✓ Loaded {dtype} embeddings from {directory}")
+            return quantized
+
+    quantized = QuantizedEmbeddings.quantize(embeddings, dtype, full)
+    print(f"✓ Quantized embeddings to {dtype} ({embeddings.shape[0] * embeddings.shape[1] * 4 / quantized.nbytes:.1f}x smaller)")
+
+    if fingerprint and full is not None:
+        try:
+            quantized.save(directory, fingerprint)
+        except OSError as e:
+            print(f"Warning: Could not write quantized embeddings: {e}")
+
+    return quantized
@@ -0,0 +1,212 @@
+"""
+BhagavadGPT - Cross-Encoder Reranking
+Optional second retrieval stage: the hybrid scorer proposes a shortlist of
+RERANK_CANDIDATES verses and a local cross-encoder re-orders just that
+shortlist by reading the query and each verse together.
+
+The reranker only loads from a local directory (RERANKER_MODEL_PATH), so it
+never downloads anything. Pair scores are cached per (query, verse). Each
+query gets RERANK_BUDGET_MS of reranking time: when the uncached pairs are
+expected to take longer, or scoring overruns the budget, the first-stage
+order is returned instead.
+
+Save a model for offline use once with:
+    python -m bhagavadgpt.rerank --model cross-encoder/ms-marco-MiniLM-L-6-v2 --out reranker_model
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bhagavadgpt.cache import normalize_query, rerank_score_cache
+from bhagavadgpt.metrics import stage
+from bhagavadgpt.search_index import verse_key
+
+# ==================== Configuration ====================
+
+# Local cross-encoder directory ('' = reranking disabled)
+RERANKER_MODEL_PATH = os.environ.get('RERANKER_MODEL_PATH', '')
+# First-stage shortlist size handed to the cross-encoder
+RERANK_CANDIDATES = int(os.environ.get('RERANK_CANDIDATES', 20))
+# Reranking time allowed per query before falling back to first-stage order
+RERANK_BUDGET_MS = float(os.environ.get('RERANK_BUDGET_MS', 150))
+# Pairs scored per cross-encoder call (the budget is checked between calls)
+RERANK_BATCH_SIZE = int(os.environ.get('RERANK_BATCH_SIZE', 16))
+# Weight of the newest measurement in the per-pair latency estimate
+LATENCY_SMOOTHING = 0.2
+
+def rerank_text(item: Dict[str, Any]) -> str:
+    """Passage the cross-encoder reads for a verse."""
+    return f"{item.get('translation', '')} {item.get('context', '')}".strip()
+
+class Reranker:
+    """
+    Lazily loaded local cross-encoder with a per-query time budget.
+    Thread-safe; the model is loaded once on first use (or warm_up()).
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        budget_ms: float = RERANK_BUDGET_MS,
+        batch_size: int = RERANK_BATCH_SIZE
+    ):
+        self.model_path = Path(model_path)
+        self.budget = budget_ms / 1000
+        self.batch_size = max(1, batch_size)
+        self.pair_seconds: Optional[float] = None  # smoothed cost of one uncached pair
+        self.reranked = 0
+        self.fallbacks = 0
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Import sentence_transformers and load the cross-encoder (once)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    print(f"Loading reranker: {self.model_path}...")
+                    with stage('model_load'):
+                        self._model = CrossEncoder(str(self.model_path))
+        return self._model
+
+    def warm_up(self) -> None:
+        """Load the model and time one pair so the first budget estimate is real."""
+        model = self.load()
+        pair = [("warm up", "warm up")]
+        model.predict(pair, batch_size=1, show_progress_bar=False)
+        started = time.perf_counter()
+        model.predict(pair, batch_size=1, show_progress_bar=False)
+        self.pair_seconds = time.perf_counter() - started
+
+    def _observe(self, seconds: float, pairs: int) -> None:
+        per_pair = seconds / pairs
+        if self.pair_seconds is None:
+            self.pair_seconds = per_pair
+        else:
+            self.pair_seconds += LATENCY_SMOOTHING * (per_pair - self.pair_seconds)
+
+    def score(self, user_query: str, items: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Cross-encoder scores for (query, verse) pairs, from the cache where
+        possible. Returns None when the uncached pairs don't fit the budget.
+        """
+        query_key = normalize_query(user_query)
+        keys = [(query_key,) + verse_key(item) for item in items]
+        scores = [rerank_score_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if not missing:
+            return np.asarray(scores, dtype=np.float32)
+
+        model = self.load()
+        if self.pair_seconds is not None and self.pair_seconds * len(missing) > self.budget:
+            # Relax the estimate so one slow measurement can't disable reranking for good
+            self.pair_seconds *= 1.0 - LATENCY_SMOOTHING
+            return None
+
+        deadline = time.perf_counter() + self.budget
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            chunk_started = time.perf_counter()
+            predicted = model.predict(
+                [(user_query, rerank_text(items[i])) for i in chunk],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            now = time.perf_counter()
+            self._observe(now - chunk_started, len(chunk))
+            for i, value in zip(chunk, np.asarray(predicted, dtype=np.float32).reshape(-1)):
+                scores[i] = float(value)
+                rerank_score_cache.put(keys[i], scores[i])
+
+            remaining = missing[start + self.batch_size:]
+            # Scored pairs stay cached, so a later request can finish the job
+            if remaining and (now > deadline or now + self.pair_seconds * len(remaining) > deadline):
+                return None
+
+        return np.asarray(scores, dtype=np.float32)
+
+    def rerank(self, user_query: str, results: List[Dict[str, Any]], top_k: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Re-order first-stage results by cross-encoder score and keep top_k.
+        Each kept result gains a 'rerank_score'; 'score' stays the hybrid
+        score. Returns (results, reranked); on a budget overrun the first
+        `top_k` results in first-stage order and False.
+        """
+        if len(results) <= 1:
+            return results[:top_k], True
+
+        with stage('rerank'):
+            scores = self.score(user_query, [result['verse_data'] for result in results])
+
+        if scores is None:
+            self.fallbacks += 1
+            return results[:top_k], False
+
+        self.reranked += 1
+        order = np.argsort(-scores, kind='stable')[:top_k]
+        return [{**results[i], 'rerank_score': float(scores[i])} for i in order], True
+
+    def stats(self) -> Dict[str, Any]:
+        """Reranked / fallback counts and the current per-pair latency estimate."""
+        return {
+            'model_path': str(self.model_path),
+            'loaded': self.loaded,
+            'budget_ms': self.budget * 1000,
+            'reranked': self.reranked,
+            'fallbacks': self.fallbacks,
+            'pair_ms': self.pair_seconds * 1000 if self.pair_seconds is not None else None
+        }
+
+# ==================== Shared Reranker ====================
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+def reranker_available() -> bool:
+    """True when RERANKER_MODEL_PATH points at an existing local directory."""
+    return bool(RERANKER_MODEL_PATH) and Path(RERANKER_MODEL_PATH).is_dir()
+
+def get_reranker() -> Optional[Reranker]:
+    """The process-wide reranker, or None when reranking is not configured."""
+    global _reranker
+
+    if _reranker is None and reranker_available():
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = Reranker(RERANKER_MODEL_PATH)
+    return _reranker
+
+# ==================== Offline Model Export ====================
+
+def save_model(model_name: str, out_dir: str) -> None:
+    """Download a cross-encoder once and save it for offline loading."""
+    from sentence_transformers import CrossEncoder
+
+    CrossEncoder(model_name).save(out_dir)
+    print(f"✓ Saved reranker {model_name} to {out_dir}")
+    print(f"  Enable it with RERANKER_MODEL_PATH={out_dir}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Save a cross-encoder reranker for offline use")
+    parser.add_argument('--model', default='cross-encoder/ms-marco-MiniLM-L-6-v2')
+    parser.add_argument('--out', default='reranker_model')
+    args = parser.parse_args(argv)
+
+    save_model(args.model, args.out)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+BhagavadGPT - Response Encoding
+Response shaping, streaming and compression for /api/chat.
+
+Clients choose what a chat response carries with `response_format`:
+- 'both' (default): the formatted `reply` text and the structured `verses`
+- 'structured': only `verses` (the reply text is rebuilt client-side)
+- 'text': only `reply`
+
+With `stream` set to 'ndjson' or 'sse' the verses are sent one event per
+verse as they are formatted, followed by a final 'done' event. Larger
+non-streamed JSON and text bodies are gzip- or brotli-encoded when the
+client accepts it (brotli only if the `brotli` package is installed).
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from bhagavadgpt.metrics import stage
+from bhagavadgpt.search import format_verse, verse_payload
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ==================== Configuration ====================
+
+RESPONSE_FORMATS = ('both', 'structured', 'text')
+STREAM_FORMATS = ('ndjson', 'sse')
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+# Bodies smaller than this are sent uncompressed (0 disables compression)
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript')
+
+# ==================== Request Options ====================
+
+def parse_response_options(data: Dict[str, Any], allow_stream: bool = True) -> Dict[str, Any]:
+    """
+    Validate `response_format` and `stream` from a chat request body.
+    Returns {'response_format': str, 'stream': str or None}.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    response_format = data.get('response_format', 'both')
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"'response_format' must be one of: {', '.join(RESPONSE_FORMATS)}")
+
+    stream = data.get('stream')
+    if stream in (None, False):
+        stream = None
+    elif stream is True:
+        stream = 'ndjson'
+    elif stream not in STREAM_FORMATS:
+        raise ValueError(f"'stream' must be one of: {', '.join(STREAM_FORMATS)}")
+    if stream and not allow_stream:
+        raise ValueError("'stream' is not supported on this endpoint")
+
+    return {'response_format': response_format, 'stream': stream}
+
+# ==================== Streaming ====================
+
+def stream_events(results: List[Dict[str, Any]], response_format: str = 'both') -> Iterator[tuple]:
+    """
+    Yield (event, payload) pairs: one 'verse' per result in rank order, then
+    'done' with the confidence score and verse count.
+    """
+    for rank, result in enumerate(results, 1):
+        with stage('format'):
+            payload = {'rank': rank}
+            if response_format != 'text':
+                payload.update(verse_payload(result))
+            if response_format != 'structured':
+                payload['text'] = format_verse(result)
+        yield 'verse', payload
+
+    yield 'done', {
+        'count': len(results),
+        'confidence_score': max([r['score'] for r in results]) if results else 0
+    }
+
+def encode_event(event: str, payload: Dict[str, Any], stream: str) -> bytes:
+    """One NDJSON line ({"event": ..., **payload}) or one SSE message."""
+    if stream == 'sse':
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+        return f"event: {event}\ndata: {data}\n\n".encode('utf-8')
+    line = json.dumps({'event': event, **payload}, ensure_ascii=False, separators=(',', ':'))
+    return (line + "\n").encode('utf-8')
+
+def stream_chat(results: List[Dict[str, Any]], response_format: str, stream: str) -> Iterator[bytes]:
+    """
+    Encoded chat events for a streamed response body. The 200 status is
+    already sent, so a failure part-way through becomes an 'error' event.
+    """
+    try:
+        for event, payload in stream_events(results, response_format):
+            yield encode_event(event, payload, stream)
+    except Exception as e:
+        print(f"Error while streaming chat response: {e}")
+        yield encode_event('error', {'error': 'Internal server error', 'details': str(e)}, stream)
+
+# ==================== Compression ====================
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported Content-Encoding for an Accept-Encoding header, if any."""
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+def should_compress(content_type: Optional[str], size: int) -> bool:
+    """Only text-like bodies of at least COMPRESS_MIN_BYTES are worth encoding."""
+    if COMPRESS_MIN_BYTES <= 0 or size < COMPRESS_MIN_BYTES or not content_type:
+        return False
+    return content_type.split(';')[0].strip().lower() in COMPRESSIBLE_TYPES
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode `body` with 'br' or 'gzip'."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
@@ -0,0 +1,585 @@
+"""
+BhagavadGPT - Search Core
+Dataset loading, embedding and hybrid verse retrieval shared by both Flask apps
+"""
+
+import json
+import os
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+
+import numpy as np
+
+from bhagavadgpt import embedding_cache
+from bhagavadgpt.batching import batching_encoder
+from bhagavadgpt.encoder import create_encoder
+from bhagavadgpt.ingest import is_json_lines, iter_records
+from bhagavadgpt.cache import query_embedding_cache, result_cache, clear_caches, normalize_query
+from bhagavadgpt.filters import FilterIndex, Filters, parse_filters
+from bhagavadgpt.keyword_index import KeywordIndex, tokenize
+from bhagavadgpt.metrics import stage
+from bhagavadgpt.quantization import QuantizedEmbeddings, RESCORE_CANDIDATES, exact_rows, load_or_quantize
+from bhagavadgpt.rerank import RERANK_CANDIDATES, get_reranker, reranker_available
+from bhagavadgpt.vector_index import load_or_build_vector_index
+
+if TYPE_CHECKING:
+    # Only for annotations: importing it at runtime pulls in torch
+    from sentence_transformers import SentenceTransformer
+
+# ==================== Configuration ====================
+
+STOPWORDS = {
+    "i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours",
+    "yourself", "yourselves", "he", "him", "his", "himself", "she", "her", "hers",
+    "herself", "it", "its", "itself", "they", "them", "their", "theirs", "themselves",
+    "what", "which", "who", "whom", "this", "that", "these", "those", "am", "is", "are",
+    "was", "were", "be", "been", "being", "have", "has", "had", "having", "do", "does",
+    "did", "doing", "a", "an", "the", "and", "but", "if", "or", "because", "as", "until",
+    "while", "of", "at", "by", "for", "with", "about", "against", "between", "into",
+    "through", "during", "before", "after", "above", "below", "to", "from", "up", "down",
+    "in", "out", "on", "off", "over", "under", "again", "further", "then", "once", "here",
+    "there", "when", "where", "why", "how", "all", "any", "both", "each", "few", "more",
+    "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so",
+    "than", "too", "very", "s", "t", "can", "will", "just", "don", "should", "now"
+}
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Lexical scorer for the keyword part of the hybrid score: 'count' (number of
+# query keywords present) or 'bm25' (field-weighted BM25F)
+KEYWORD_SCORERS = ('count', 'bm25')
+KEYWORD_SCORER = os.environ.get('KEYWORD_SCORER', 'count').lower()
+
+# Upper bound on messages accepted by /api/chat/batch in one request
+MAX_BATCH_MESSAGES = int(os.environ.get('MAX_BATCH_MESSAGES', 1000))
+
+# Ranking defaults and the server limits for per-request overrides
+DEFAULT_TOP_K = 3
+MAX_TOP_K = int(os.environ.get('MAX_TOP_K', 20))
+DEFAULT_MIN_SCORE = 0.1
+DEFAULT_SEMANTIC_WEIGHT = 0.7
+
+# Candidates taken from an approximate vector index (and from the keyword
+# scores) before exact hybrid re-scoring
+ANN_CANDIDATES = int(os.environ.get('ANN_CANDIDATES', 100))
+
+# Filters matching at most this fraction of the corpus score only the
+# matching verses; broader filters score everything and mask the rest
+FILTER_SUBSET_FRACTION = 0.2
+
+# Text fed to the encoder for every verse. Part of the embedding cache
+# fingerprint, so any change here invalidates cached embeddings.
+SEARCH_TEXT_TEMPLATE = (
+    "Theme: {themes}. Keywords: {keywords}. "
+    "Context: {context}. "
+    "Translation: {translation}"
+)
+
+# ==================== Helper Functions ====================
+
+def load_gita_dataset(file_path: str = 'bhagavad_gita_dataset_expanded.json') -> List[Dict[str, Any]]:
+    """Load the Bhagavad Gita dataset from a JSON array or JSON Lines file."""
+    try:
+        if is_json_lines(file_path):
+            data = list(iter_records(file_path))
+        else:
+            with open(file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        print(f"✓ Loaded dataset with {len(data)} verses")
+        return data
+    except FileNotFoundError:
+        print(f"Error: Dataset file '{file_path}' not found")
+        print("Please generate it by running: jupyter notebook code.ipynb")
+        return []
+    except json.JSONDecodeError:
+        print(f"Error: Invalid JSON format in '{file_path}'")
+        return []
+
+def build_search_text(item: Dict[str, Any]) -> str:
+    """Build the combined text that represents a verse for semantic search."""
+    return SEARCH_TEXT_TEMPLATE.format(
+        themes=", ".join(item.get("themes", [])),
+        keywords=", ".join(item.get("keywords", [])),
+        context=item.get('context', ''),
+        translation=item.get('translation', '')
+    )
+
+def load_model(model_name: str = MODEL_NAME) -> 'SentenceTransformer':
+    """
+    Create the encoder used for query and corpus encoding. Heavy libraries
+    (torch, sentence_transformers, onnxruntime) are imported on first use.
+    Concurrent single-query encodes are micro-batched (ENCODE_BATCHING).
+    """
+    return batching_encoder(create_encoder(model_name))
+
+def encode_texts(model: 'SentenceTransformer', texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+    """Encode texts into L2-normalized float32 vectors (cosine == dot product)."""
+    embeddings = model.encode(
+        texts,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=show_progress_bar
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+def preprocess_and_embed_dataset(
+    dataset: List[Dict[str, Any]],
+    cache_dir: str = None,
+    show_progress_bar: bool = False,
+    model=None,
+    allow_encode: bool = True
+):
+    """
+    Create the model and load the embeddings for all verses in the dataset.
+
+    Corpus embeddings are read from the on-disk cache when its fingerprint
+    matches the dataset, model and search text template; otherwise they are
+    generated and written back to the cache. With a warm cache the model
+    is not actually loaded until the first query is encoded. With
+    EMBEDDING_DTYPE=float16/int8 the embeddings are returned quantized.
+
+    A different encoder (e.g. the benchmarks' offline stub) can be passed as
+    `model`; its `model_name` is then part of the cache fingerprint. With
+    `allow_encode=False` a cache miss raises RuntimeError instead of loading
+    the model to encode the corpus.
+    """
+    model_name = MODEL_NAME if model is None else model.model_name
+    if model is None:
+        model = load_model(MODEL_NAME)
+
+    def encode_corpus(texts: List[str]) -> np.ndarray:
+        if not allow_encode:
+            raise RuntimeError("No cached embeddings match the dataset; build them with "
+                               "python -m bhagavadgpt.embedding_cache (or an index bundle) first")
+        with stage('corpus_encode'):
+            return encode_texts(model, texts, show_progress_bar)
+
+    # Search text is rendered lazily per batch instead of stored on each verse
+    corpus_embeddings = embedding_cache.load_or_build(
+        lambda: (build_search_text(item) for item in dataset),
+        encode_corpus,
+        model_name=model_name,
+        cache_dir=cache_dir
+    )
+    corpus_embeddings = load_or_quantize(corpus_embeddings, cache_dir=cache_dir)
+
+    # Cached query embeddings and results refer to the previous model/corpus
+    clear_caches()
+
+    print("✓ Embeddings ready")
+    return model, corpus_embeddings
+
+def build_keyword_index(dataset: List[Dict[str, Any]], scorer: str = None):
+    """
+    Build the index used for lexical scoring: the inverted keyword count
+    index or the BM25F matrix, selected by `scorer` / KEYWORD_SCORER.
+    """
+    scorer = (scorer or KEYWORD_SCORER).lower()
+    if scorer not in KEYWORD_SCORERS:
+        raise ValueError(f"Unknown keyword scorer '{scorer}', expected one of {KEYWORD_SCORERS}")
+
+    if scorer == 'bm25':
+        from bhagavadgpt.bm25 import BM25Index
+
+        keyword_index = BM25Index.build(dataset)
+        print(f"✓ BM25 index built ({len(keyword_index.vocabulary)} terms)")
+    else:
+        keyword_index = KeywordIndex.build(dataset)
+        print(f"✓ Keyword index built ({len(keyword_index.postings)} terms)")
+    return keyword_index
+
+def build_filter_index(dataset: List[Dict[str, Any]]) -> FilterIndex:
+    """Build the chapter / theme / attribute bitmaps used for pre-filtering."""
+    return FilterIndex.build(dataset)
+
+def build_vector_index(corpus_embeddings: np.ndarray, backend: str = None, cache_dir: str = None):
+    """Create the nearest-neighbour index (VECTOR_INDEX: exact or ivf)."""
+    return load_or_build_vector_index(corpus_embeddings, backend=backend, cache_dir=cache_dir)
+
+def warm_up_model(model: 'SentenceTransformer') -> None:
+    """
+    Load the encoder (and the reranker, when configured) and run one forward
+    pass so the first query is fast.
+    """
+    encode_texts(model, ["warm up"])
+    reranker = get_reranker()
+    if reranker is not None:
+        reranker.warm_up()
+
+def extract_keywords(text: str) -> set:
+    """Extract meaningful keywords from text."""
+    return {word for word in tokenize(text) if word not in STOPWORDS}
+
+def encode_queries(model: 'SentenceTransformer', user_queries: List[str]) -> np.ndarray:
+    """
+    Encode queries, reusing cached embeddings for repeated (normalized)
+    query text and encoding all misses in a single call.
+    """
+    keys = [normalize_query(user_query) for user_query in user_queries]
+    embeddings = [query_embedding_cache.get(key) for key in keys]
+
+    missing = list(dict.fromkeys(key for key, embedding in zip(keys, embeddings) if embedding is None))
+    if missing:
+        with stage('query_encode'):
+            encoded = dict(zip(missing, encode_texts(model, missing)))
+        for key, embedding in encoded.items():
+            embedding.setflags(write=False)
+            query_embedding_cache.put(key, embedding)
+        embeddings = [encoded[key] if embedding is None else embedding
+                      for key, embedding in zip(keys, embeddings)]
+
+    return np.stack(embeddings)
+
+def semantic_scores(model: 'SentenceTransformer', user_query: str, corpus_embeddings: np.ndarray) -> np.ndarray:
+    """Cosine similarity between the query and every verse embedding."""
+    query_embedding = encode_queries(model, [user_query])[0]
+    return corpus_embeddings @ query_embedding
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k best scores in each row, best first, using a partial
+    selection so the cost does not depend on sorting the whole corpus.
+    """
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+def parse_search_options(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Read optional `top_k`, `min_score`, `semantic_weight`, `filters` and
+    `rerank` from a request body, applying defaults and validating them
+    against the server limits. Reranking is on by default when a reranker
+    is configured.
+    Raises ValueError with a client-facing message on invalid input.
+    """
+    top_k = data.get('top_k', DEFAULT_TOP_K)
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"'top_k' must be an integer between 1 and {MAX_TOP_K}")
+
+    min_score = data.get('min_score', DEFAULT_MIN_SCORE)
+    if isinstance(min_score, bool) or not isinstance(min_score, (int, float)) or not 0 <= min_score <= 1:
+        raise ValueError("'min_score' must be a number between 0 and 1")
+
+    semantic_weight = data.get('semantic_weight', DEFAULT_SEMANTIC_WEIGHT)
+    if isinstance(semantic_weight, bool) or not isinstance(semantic_weight, (int, float)) or not 0 <= semantic_weight <= 1:
+        raise ValueError("'semantic_weight' must be a number between 0 and 1")
+
+    rerank = data.get('rerank', reranker_available())
+    if not isinstance(rerank, bool):
+        raise ValueError("'rerank' must be true or false")
+    if rerank and not reranker_available():
+        raise ValueError("'rerank' is not available: no reranker model is configured")
+
+    return {
+        'top_k': top_k,
+        'min_score': float(min_score),
+        'semantic_weight': float(semantic_weight),
+        'filters': parse_filters(data),
+        'rerank': rerank
+    }
+
+def rank_candidates(
+    query_embedding: np.ndarray,
+    keyword_scores: np.ndarray,
+    candidate_ids: np.ndarray,
+    corpus_embeddings: np.ndarray,
+    top_k: int,
+    semantic_weight: float
+):
+    """
+    Exact hybrid re-scoring of one query over a candidate set from an
+    approximate vector index, merged with the best keyword matches.
+    Returns (verse ids, combined scores), best first.
+    """
+    keyword_ids = top_k_indices(keyword_scores, len(candidate_ids))[0]
+    keyword_ids = keyword_ids[keyword_scores[keyword_ids] > 0]
+    candidates = np.unique(np.concatenate([candidate_ids[candidate_ids >= 0], keyword_ids]))
+
+    cosine_scores = exact_rows(corpus_embeddings, candidates) @ query_embedding
+    combined_scores = semantic_weight * cosine_scores + (1.0 - semantic_weight) * keyword_scores[candidates]
+
+    best = top_k_indices(combined_scores, top_k)[0]
+    return candidates[best], combined_scores[best]
+
+def rescore_shortlist(
+    query_embedding: np.ndarray,
+    keyword_scores: np.ndarray,
+    approx_scores: np.ndarray,
+    shortlist: np.ndarray,
+    rows: Optional[np.ndarray],
+    corpus_embeddings: QuantizedEmbeddings,
+    top_k: int,
+    semantic_weight: float
+):
+    """
+    Re-rank one query's shortlist from quantized scoring with full-precision
+    vectors. `shortlist` indexes the scored rows (`rows` maps them to corpus
+    ids when filtered); masked-out entries are dropped.
+    Returns (verse ids, combined scores), best first.
+    """
+    shortlist = shortlist[np.isfinite(approx_scores[shortlist])]
+    ids = shortlist if rows is None else rows[shortlist]
+
+    cosine_scores = corpus_embeddings.full_rows(ids) @ query_embedding
+    combined_scores = semantic_weight * cosine_scores + (1.0 - semantic_weight) * keyword_scores[shortlist]
+
+    best = top_k_indices(combined_scores, top_k)[0]
+    return ids[best], combined_scores[best]
+
+def rank_queries(
+    dataset: List[Dict[str, Any]],
+    user_queries: List[str],
+    model: 'SentenceTransformer',
+    corpus_embeddings: np.ndarray,
+    keyword_index,
+    vector_index=None,
+    filter_index: Optional[FilterIndex] = None,
+    top_k: int = DEFAULT_TOP_K,
+    min_score: float = DEFAULT_MIN_SCORE,
+    semantic_weight: float = DEFAULT_SEMANTIC_WEIGHT,
+    filters: Optional[Filters] = None,
+    query_embeddings: Optional[np.ndarray] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Score and rank queries without consulting the result cache: one encode
+    call, then either one exact (queries x corpus) similarity matrix or an
+    approximate candidate search with exact re-scoring, and a per-row top k.
+    The keyword weight is 1 - semantic_weight. Callers that already hold
+    (e.g. context-blended) query vectors pass them as `query_embeddings`.
+
+    With `filters`, the matching verses are resolved from the filter bitmaps
+    first. Selective filters score only that subset; broad ones score the
+    whole corpus (gathering most rows costs more than it saves) and mask the
+    rest out.
+    """
+    rows = mask = None
+    if filters:
+        if filter_index is None:
+            filter_index = build_filter_index(dataset)
+        mask = filter_index.mask(filters)
+        matched = int(np.count_nonzero(mask))
+        if matched == 0:
+            return [[] for _ in user_queries]
+        if matched <= FILTER_SUBSET_FRACTION * mask.size:
+            rows, mask = np.flatnonzero(mask), None
+
+    # Calculate normalized (0-1) keyword scores from the index
+    with stage('keyword_score'):
+        keyword_scores = keyword_index.score_many(
+            [extract_keywords(user_query) for user_query in user_queries], rows
+        )
+        if mask is not None:
+            # Re-normalize over the filtered verses only, as the subset path does
+            keyword_scores *= mask
+            max_scores = keyword_scores.max(axis=1, keepdims=True)
+            np.divide(keyword_scores, max_scores, out=keyword_scores, where=max_scores > 0)
+
+    # Calculate semantic scores using embeddings
+    if query_embeddings is None:
+        query_embeddings = encode_queries(model, user_queries)
+
+    if rows is not None or vector_index is None or vector_index.exact:
+        quantized = isinstance(corpus_embeddings, QuantizedEmbeddings)
+        with stage('similarity'):
+            if quantized:
+                cosine_scores = corpus_embeddings.dot(query_embeddings, rows)
+            else:
+                subset_embeddings = corpus_embeddings if rows is None else corpus_embeddings[rows]
+                cosine_scores = query_embeddings @ subset_embeddings.T
+
+            # Combine scores (70% semantic, 30% keyword by default)
+            combined_scores = semantic_weight * cosine_scores + (1.0 - semantic_weight) * keyword_scores
+            if mask is not None:
+                combined_scores[:, ~mask] = -np.inf
+
+        with stage('top_k'):
+            if quantized:
+                # Approximate scores pick a shortlist; full precision re-ranks it
+                shortlists = top_k_indices(combined_scores, max(RESCORE_CANDIDATES, top_k))
+                ranked = [
+                    rescore_shortlist(
+                        query_embeddings[row], keyword_scores[row], combined_scores[row], shortlist,
+                        rows, corpus_embeddings, top_k, semantic_weight
+                    )
+                    for row, shortlist in enumerate(shortlists)
+                ]
+            else:
+                # Get top k results per query (mapped back to corpus ids when filtered)
+                top_indices = top_k_indices(combined_scores, top_k)
+                ranked = [
+                    (indices if rows is None else rows[indices], combined_scores[row, indices])
+                    for row, indices in enumerate(top_indices)
+                ]
+    else:
+        # Only re-score the candidates proposed by the approximate index,
+        # over-fetching in proportion to how much a filter discards
+        num_candidates = max(ANN_CANDIDATES, top_k)
+        if mask is not None:
+            num_candidates = int(np.ceil(num_candidates * mask.size / matched))
+        with stage('similarity'):
+            candidate_ids, _ = vector_index.search(query_embeddings, num_candidates)
+            if mask is not None:
+                candidate_ids = np.where(mask[candidate_ids] & (candidate_ids >= 0), candidate_ids, -1)
+        with stage('top_k'):
+            ranked = [
+                rank_candidates(
+                    query_embeddings[row], keyword_scores[row], candidate_ids[row],
+                    corpus_embeddings, top_k, semantic_weight
+                )
+                for row in range(len(user_queries))
+            ]
+
+    batch_results = []
+    for indices, scores in ranked:
+        results = []
+        for idx, score in zip(indices, scores):
+            if score > min_score:  # Minimum threshold
+                results.append({
+                    'verse_data': dataset[idx],
+                    'score': float(score)
+                })
+        batch_results.append(results)
+
+    return batch_results
+
+def search_verses_hybrid_batch(
+    dataset: List[Dict[str, Any]],
+    user_queries: List[str],
+    model: 'SentenceTransformer',
+    corpus_embeddings: np.ndarray,
+    keyword_index=None,
+    vector_index=None,
+    filter_index: Optional[FilterIndex] = None,
+    top_k: int = DEFAULT_TOP_K,
+    min_score: float = DEFAULT_MIN_SCORE,
+    semantic_weight: float = DEFAULT_SEMANTIC_WEIGHT,
+    filters: Optional[Filters] = None,
+    rerank: bool = False
+) -> List[List[Dict[str, Any]]]:
+    """
+    Hybrid search for many queries at once. Repeated queries are served
+    from the result cache; the rest are ranked together by rank_queries.
+
+    With `rerank`, the hybrid scorer picks a RERANK_CANDIDATES shortlist and
+    the cross-encoder re-orders it. Queries whose reranking ran out of time
+    keep the first-stage order and are not cached, so a repeat can retry.
+    """
+    if not user_queries:
+        return []
+
+    if keyword_index is None:
+        keyword_index = build_keyword_index(dataset)
+
+    reranker = get_reranker() if rerank else None
+    options = (top_k, min_score, semantic_weight, filters, reranker is not None)
+    keys = [(normalize_query(user_query),) + options for user_query in user_queries]
+    batch_results = [result_cache.get(key) for key in keys]
+
+    pending = [i for i, results in enumerate(batch_results) if results is None]
+    if pending:
+        ranked = rank_queries(
+            dataset, [user_queries[i] for i in pending], model, corpus_embeddings, keyword_index,
+            vector_index, filter_index, top_k=top_k if reranker is None else max(top_k, RERANK_CANDIDATES),
+            min_score=min_score, semantic_weight=semantic_weight, filters=filters
+        )
+        for i, results in zip(pending, ranked):
+            complete = True
+            if reranker is not None:
+                results, complete = reranker.rerank(user_queries[i], results, top_k)
+            if complete:
+                result_cache.put(keys[i], results)
+            batch_results[i] = results
+
+    # Hand out copies so callers can't modify cached result lists
+    return [list(results) for results in batch_results]
+
+def search_verses_hybrid(
+    dataset: List[Dict[str, Any]],
+    user_query: str,
+    model: 'SentenceTransformer',
+    corpus_embeddings: np.ndarray,
+    keyword_index=None,
+    vector_index=None,
+    filter_index: Optional[FilterIndex] = None,
+    top_k: int = DEFAULT_TOP_K,
+    min_score: float = DEFAULT_MIN_SCORE,
+    semantic_weight: float = DEFAULT_SEMANTIC_WEIGHT,
+    filters: Optional[Filters] = None,
+    rerank: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Hybrid search combining semantic similarity and keyword matching.
+    Returns the top_k (default 3) matching verses scoring above min_score,
+    optionally restricted to the verses matching `filters` and reranked by
+    the cross-encoder (`rerank`).
+    """
+    return search_verses_hybrid_batch(
+        dataset, [user_query], model, corpus_embeddings, keyword_index, vector_index, filter_index,
+        top_k=top_k, min_score=min_score, semantic_weight=semantic_weight, filters=filters,
+        rerank=rerank
+    )[0]
+
+NO_MATCH_REPLY = "I couldn't find a matching verse. Please try rephrasing your question."
+
+def format_verse(result: Dict[str, Any]) -> str:
+    """Format one ranked verse as a readable text block."""
+    verse = result['verse_data']
+    score = result['score']
+
+    chapter = verse.get('chapter', 'N/A')
+    verse_num = verse.get('verse', 'N/A')
+    translation = verse.get('translation', '')
+    themes = ", ".join(verse.get('themes', []))
+    context = verse.get('context', '')
+
+    return (
+        f"\n{'='*60}\n"
+        f"📖 Chapter {chapter}, Verse {verse_num}\n"
+        f"{'='*60}\n"
+        f"\n{translation}\n"
+        f"\n📌 Themes: {themes}"
+        f"\n\n💭 Context: {context}"
+        f"\n(Confidence: {score*100:.1f}%)"
+    )
+
+def format_response(results: List[Dict[str, Any]]) -> str:
+    """Format search results into a readable response."""
+    if not results:
+        return NO_MATCH_REPLY
+    return "\n".join(format_verse(result) for result in results)
+
+def verse_fields(verse: Dict[str, Any]) -> Dict[str, Any]:
+    """Structured fields of one verse (without any score)."""
+    return {
+        'chapter': verse.get('chapter'),
+        'verse': verse.get('verse'),
+        'translation': verse.get('translation'),
+        'themes': verse.get('themes', []),
+        'context': verse.get('context'),
+    }
+
+def verse_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Structured fields of one ranked verse, as sent in 'verses'."""
+    return {
+        **verse_fields(result['verse_data']),
+        'score': result['score'],
+        **({'rerank_score': result['rerank_score']} if 'rerank_score' in result else {})
+    }
+
+def build_chat_response(results: List[Dict[str, Any]], response_format: str = 'both') -> Dict[str, Any]:
+    """
+    Build the /api/chat JSON payload. `response_format` selects the reply
+    text ('text'), the structured verses ('structured') or both (default).
+    """
+    with stage('format'):
+        payload = {}
+        if response_format != 'structured':
+            payload['reply'] = format_response(results)
+        if response_format != 'text':
+            payload['verses'] = [verse_payload(result) for result in results]
+        payload['confidence_score'] = max([r['score'] for r in results]) if results else 0
+        return payload
@@ -0,0 +1,79 @@
+"""
+BhagavadGPT - Search Index Snapshot
+Bundles everything a query reads (verses, embeddings, keyword, vector and
+filter indexes, neighbour graph) into one object that is replaced as a whole, so a request that
+grabbed a snapshot never sees a half-updated index.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bhagavadgpt.filters import FilterIndex
+from bhagavadgpt.neighbors import NeighborGraph, load_or_build_neighbor_graph
+from bhagavadgpt.verse_store import VerseStore, pack_key
+
+def verse_key(item: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Identity of a verse across dataset versions: (chapter, verse)."""
+    return (item.get('chapter'), item.get('verse'))
+
+def verse_hash(item: Dict[str, Any]) -> str:
+    """Hash of the text a verse is embedded from; changes force re-encoding."""
+    from bhagavadgpt.search import build_search_text
+
+    return hashlib.sha1(build_search_text(item).encode('utf-8')).hexdigest()
+
+class SearchIndex:
+    """Read-only snapshot of the searchable corpus."""
+
+    def __init__(
+        self,
+        dataset: List[Dict[str, Any]],
+        corpus_embeddings: np.ndarray,
+        keyword_index,
+        vector_index,
+        verse_hashes: Optional[List[str]] = None,
+        filter_index=None,
+        neighbor_graph=None
+    ):
+        self.dataset = dataset
+        self.corpus_embeddings = corpus_embeddings
+        self.keyword_index = keyword_index
+        self.vector_index = vector_index
+        self.verse_hashes = verse_hashes if verse_hashes is not None else [verse_hash(item) for item in dataset]
+        self.filter_index = filter_index if filter_index is not None else FilterIndex.build(dataset)
+        self.neighbor_graph = (
+            neighbor_graph if neighbor_graph is not None
+            else NeighborGraph.build(dataset, corpus_embeddings, vector_index)
+        )
+        # Packed (chapter, verse) -> first row, built on first lookup (list datasets only)
+        self._rows: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.dataset)
+
+    def row_of(self, chapter: Any, verse: Any) -> Optional[int]:
+        """Row of (chapter, verse), the first one on duplicates, or None."""
+        if isinstance(self.dataset, VerseStore):
+            return self.dataset.row_of(chapter, verse)
+        if self._rows is None:
+            rows: Dict[int, int] = {}
+            for row, item in enumerate(self.dataset):
+                rows.setdefault(pack_key(item.get('chapter'), item.get('verse')), row)
+            self._rows = rows
+        return self._rows.get(pack_key(chapter, verse))
+
+    @classmethod
+    def build(cls, dataset: List[Dict[str, Any]], corpus_embeddings: np.ndarray) -> 'SearchIndex':
+        """Build the keyword and vector indexes and the neighbour graph over already-embedded verses."""
+        from bhagavadgpt.search import build_keyword_index, build_vector_index
+
+        vector_index = build_vector_index(corpus_embeddings)
+        return cls(
+            dataset,
+            corpus_embeddings,
+            build_keyword_index(dataset),
+            vector_index,
+            neighbor_graph=load_or_build_neighbor_graph(dataset, corpus_embeddings, vector_index)
+        )
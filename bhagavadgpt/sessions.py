@@ -0,0 +1,141 @@
+"""
+BhagavadGPT - Conversation Sessions
+Optional per-conversation state for /api/chat, keyed by a client-chosen
+`session_id`, so follow-ups like "tell me more" stay on topic.
+
+A session holds a fixed amount of state: one decayed running context
+embedding (the mean of past query embeddings, weighted towards recent
+turns) and the last SESSION_MAX_SHOWN verses already returned. A follow-up
+query's embedding is blended with the context vector, so the history is
+never re-encoded, and verses shown earlier are skipped. Sessions live in a
+bounded LRU store (SESSION_MAX_COUNT) and expire after SESSION_TTL seconds
+without activity. Each server process keeps its own sessions.
+"""
+
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bhagavadgpt.cache import session_store
+from bhagavadgpt.filters import Filters
+from bhagavadgpt.search import (
+    DEFAULT_MIN_SCORE, DEFAULT_SEMANTIC_WEIGHT, DEFAULT_TOP_K, encode_queries, rank_queries,
+    search_verses_hybrid,
+)
+from bhagavadgpt.search_index import verse_key
+
+# ==================== Configuration ====================
+
+# Share of a follow-up's query vector taken from the conversation context
+SESSION_CONTEXT_WEIGHT = float(os.environ.get('SESSION_CONTEXT_WEIGHT', 0.35))
+# Weight kept by the old context at each turn (0 = only the latest message)
+SESSION_DECAY = float(os.environ.get('SESSION_DECAY', 0.5))
+# Most recently shown verses remembered per session for de-duplication
+SESSION_MAX_SHOWN = int(os.environ.get('SESSION_MAX_SHOWN', 50))
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def parse_session_id(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Read the optional `session_id` from a request body.
+    Raises ValueError with a client-facing message on invalid input.
+    """
+    session_id = data.get('session_id')
+    if session_id is None:
+        return None
+    if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+        raise ValueError("'session_id' must be 1-64 letters, digits, '-' or '_'")
+    return session_id
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+class Session:
+    """Fixed-size conversation state: context vector, shown verses, turn count."""
+
+    __slots__ = ('context', 'shown', 'turns', 'lock')
+
+    def __init__(self):
+        self.context: Optional[np.ndarray] = None
+        self.shown: deque = deque(maxlen=SESSION_MAX_SHOWN)
+        self.turns = 0
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> Tuple[Optional[np.ndarray], set]:
+        """Context vector and shown verse keys as of now."""
+        with self.lock:
+            return self.context, set(self.shown)
+
+    def record(self, query_embedding: np.ndarray, results: List[Dict[str, Any]]) -> None:
+        """Fold a turn's query into the decayed context and remember its verses."""
+        with self.lock:
+            if self.context is None:
+                self.context = query_embedding.astype(np.float32)
+            else:
+                blended = SESSION_DECAY * self.context + (1.0 - SESSION_DECAY) * query_embedding
+                self.context = _normalize(blended).astype(np.float32)
+            self.shown.extend(verse_key(result['verse_data']) for result in results)
+            self.turns += 1
+
+_create_lock = threading.Lock()
+
+def get_session(session_id: str) -> Session:
+    """The live session for `session_id`, creating it (and evicting the LRU one) if needed."""
+    session = session_store.get(session_id)
+    if session is None:
+        with _create_lock:
+            session = session_store.get(session_id)
+            if session is None:
+                session = Session()
+                session_store.put(session_id, session)
+    return session
+
+def search_in_session(
+    session_id: str,
+    dataset: List[Dict[str, Any]],
+    user_query: str,
+    model,
+    corpus_embeddings: np.ndarray,
+    keyword_index,
+    vector_index=None,
+    filter_index=None,
+    top_k: int = DEFAULT_TOP_K,
+    min_score: float = DEFAULT_MIN_SCORE,
+    semantic_weight: float = DEFAULT_SEMANTIC_WEIGHT,
+    filters: Optional[Filters] = None,
+    rerank: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    search_verses_hybrid for one turn of a conversation. The first turn is
+    an ordinary (cached) search. Later turns blend the context vector into
+    the query embedding, over-fetch by the number of verses already shown
+    and drop those. The cross-encoder only sees the latest message, so
+    blended turns are not reranked.
+    """
+    session = get_session(session_id)
+    context, shown = session.snapshot()
+    query_embedding = encode_queries(model, [user_query])[0]
+
+    if context is None:
+        results = search_verses_hybrid(
+            dataset, user_query, model, corpus_embeddings, keyword_index, vector_index, filter_index,
+            top_k=top_k, min_score=min_score, semantic_weight=semantic_weight, filters=filters,
+            rerank=rerank
+        )
+    else:
+        blended = _normalize((1.0 - SESSION_CONTEXT_WEIGHT) * query_embedding + SESSION_CONTEXT_WEIGHT * context)
+        ranked = rank_queries(
+            dataset, [user_query], model, corpus_embeddings, keyword_index, vector_index, filter_index,
+            top_k=top_k + len(shown), min_score=min_score, semantic_weight=semantic_weight,
+            filters=filters, query_embeddings=blended[np.newaxis, :].astype(np.float32)
+        )[0]
+        results = [result for result in ranked if verse_key(result['verse_data']) not in shown][:top_k]
+
+    session.record(query_embedding, results)
+    # Re-inserting refreshes the session's TTL and LRU position
+    session_store.put(session_id, session)
+    return results
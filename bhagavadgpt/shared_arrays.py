@@ -0,0 +1,55 @@
+"""
+BhagavadGPT - Shared Arrays
+Places corpus embeddings in memory that forked workers share instead of
+copying. Memory-mapped arrays (the embedding cache) already live in the
+shared page cache and are left alone; in-memory arrays are moved into a
+`multiprocessing.shared_memory` block created by the master process.
+"""
+
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+from bhagavadgpt.quantization import QuantizedEmbeddings
+
+def share_array(array: np.ndarray, blocks: List[shared_memory.SharedMemory]) -> np.ndarray:
+    """Read-only shared view of `array`; new shared blocks are appended to `blocks`."""
+    if array is None or isinstance(array, np.memmap) or array.nbytes == 0:
+        return array
+
+    block = shared_memory.SharedMemory(create=True, size=array.nbytes)
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    shared[...] = array
+    shared.setflags(write=False)
+    blocks.append(block)
+    return shared
+
+def share_embeddings(corpus_embeddings) -> Tuple[object, List[shared_memory.SharedMemory]]:
+    """
+    Shared copy of plain or quantized corpus embeddings. Returns the new
+    embeddings and the shared memory blocks, which the caller must close
+    and unlink at shutdown.
+    """
+    blocks: List[shared_memory.SharedMemory] = []
+    if isinstance(corpus_embeddings, QuantizedEmbeddings):
+        shared = QuantizedEmbeddings(
+            share_array(corpus_embeddings.codes, blocks),
+            share_array(corpus_embeddings.scales, blocks),
+            corpus_embeddings.full
+        )
+    else:
+        shared = share_array(corpus_embeddings, blocks)
+    return shared, blocks
+
+def release(blocks: List[shared_memory.SharedMemory]) -> None:
+    """Close and unlink shared memory blocks (master process only)."""
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass  # NumPy views still reference it; the mapping goes away on exit
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
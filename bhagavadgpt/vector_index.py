@@ -0,0 +1,269 @@
+"""
+BhagavadGPT - Vector Indexes
+Pluggable nearest-neighbour search over the (L2-normalized) corpus
+embeddings: an exact brute-force backend and an IVF (inverted file)
+approximate backend built with NumPy spherical k-means.
+
+VECTOR_INDEX selects the backend ('exact' or 'ivf'). IVF indexes are
+persisted next to the embedding cache and rebuilt when its fingerprint
+changes.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+# ==================== Configuration ====================
+
+VECTOR_INDEX_BACKENDS = ('exact', 'ivf')
+VECTOR_INDEX = os.environ.get('VECTOR_INDEX', 'exact').lower()
+# Number of IVF lists (0 = about 4 * sqrt(corpus size))
+IVF_NLIST = int(os.environ.get('IVF_NLIST', 0))
+# Lists scanned per query: higher = better recall, slower
+IVF_NPROBE = int(os.environ.get('IVF_NPROBE', 8))
+IVF_TRAIN_ITERATIONS = 10
+IVF_MAX_TRAINING_POINTS = 50000
+
+IVF_CENTROIDS_FILE = 'ivf_centroids.npy'
+IVF_LIST_IDS_FILE = 'ivf_list_ids.npy'
+IVF_LIST_OFFSETS_FILE = 'ivf_list_offsets.npy'
+IVF_MANIFEST_FILE = 'ivf_manifest.json'
+
+# Rows scored per block when assigning vectors to centroids (bounds memory)
+ASSIGN_BLOCK_SIZE = 8192
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values of a 1-D array, best first."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def _pad(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pad result rows shorter than k with id -1 / score -inf."""
+    missing = k - ids.shape[0]
+    if missing <= 0:
+        return ids, scores
+    return (
+        np.concatenate([ids, np.full(missing, -1, dtype=ids.dtype)]),
+        np.concatenate([scores, np.full(missing, -np.inf, dtype=np.float32)])
+    )
+
+class ExactIndex:
+    """Brute-force inner-product search over every embedding."""
+
+    exact = True
+    name = 'exact'
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (ids, scores) per query row; rows padded with -1 when k > corpus."""
+        scores = np.atleast_2d(queries) @ self.embeddings.T
+        ids = np.empty((scores.shape[0], k), dtype=np.int64)
+        top_scores = np.empty((scores.shape[0], k), dtype=np.float32)
+        for row in range(scores.shape[0]):
+            row_ids = _top_k(scores[row], k)
+            ids[row], top_scores[row] = _pad(row_ids, scores[row, row_ids].astype(np.float32), k)
+        return ids, top_scores
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means
+    centroid and a query only scans the `nprobe` closest buckets.
+    """
+
+    exact = False
+    name = 'ivf'
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        centroids: np.ndarray,
+        list_ids: np.ndarray,
+        list_offsets: np.ndarray,
+        nprobe: int = IVF_NPROBE
+    ):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_ids = list_ids
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @staticmethod
+    def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid (by inner product) for each vector, in blocks."""
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], ASSIGN_BLOCK_SIZE):
+            block = np.asarray(vectors[start:start + ASSIGN_BLOCK_SIZE], dtype=np.float32)
+            assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        nlist: int = IVF_NLIST,
+        nprobe: int = IVF_NPROBE,
+        iterations: int = IVF_TRAIN_ITERATIONS,
+        seed: int = 0
+    ) -> 'IVFIndex':
+        """Train centroids with spherical k-means and bucket every vector."""
+        num_vectors = embeddings.shape[0]
+        if nlist <= 0:
+            nlist = int(4 * np.sqrt(num_vectors))
+        nlist = max(1, min(nlist, num_vectors))
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(num_vectors, max(nlist * 40, IVF_MAX_TRAINING_POINTS))
+        sample_ids = np.sort(rng.choice(num_vectors, size=sample_size, replace=False))
+        sample = np.asarray(embeddings[sample_ids], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls.assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+
+            # Re-seed empty lists from random training points
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                sums[empty] = sample[rng.choice(sample_size, size=empty.size, replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        return cls.from_centroids(embeddings, centroids.astype(np.float32), nprobe)
+
+    @classmethod
+    def from_centroids(cls, embeddings: np.ndarray, centroids: np.ndarray, nprobe: int = IVF_NPROBE) -> 'IVFIndex':
+        """Bucket every vector under already-trained centroids."""
+        nlist = centroids.shape[0]
+        assignments = cls.assign(embeddings, centroids)
+        list_ids = np.argsort(assignments, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=list_offsets[1:])
+
+        return cls(embeddings, centroids, list_ids, list_offsets, nprobe)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k (ids, scores) per query row, padded with -1."""
+        queries = np.atleast_2d(queries)
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+
+        ids = np.empty((queries.shape[0], k), dtype=np.int64)
+        top_scores = np.empty((queries.shape[0], k), dtype=np.float32)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes[row]
+            ])
+            scores = self.embeddings[candidates] @ query
+            best = _top_k(scores, k)
+            ids[row], top_scores[row] = _pad(candidates[best].astype(np.int64), scores[best].astype(np.float32), k)
+        return ids, top_scores
+
+    def save(self, directory: Path, fingerprint: str) -> None:
+        """Write the index next to the embedding cache, tagged with its fingerprint."""
+        directory.mkdir(parents=True, exist_ok=True)
+        for filename, array in (
+            (IVF_CENTROIDS_FILE, self.centroids),
+            (IVF_LIST_IDS_FILE, self.list_ids),
+            (IVF_LIST_OFFSETS_FILE, self.list_offsets),
+        ):
+            tmp = directory / f"{filename}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                np.save(file, array)
+            os.replace(tmp, directory / filename)
+
+        manifest = {
+            'fingerprint': fingerprint,
+            'nlist': self.nlist,
+            'num_vectors': int(self.list_ids.shape[0])
+        }
+        tmp = directory / f"{IVF_MANIFEST_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp, directory / IVF_MANIFEST_FILE)
+
+    @classmethod
+    def load(
+        cls,
+        directory: Path,
+        embeddings: np.ndarray,
+        fingerprint: str,
+        nprobe: int = IVF_NPROBE
+    ) -> Optional['IVFIndex']:
+        """Memory-map a saved index if it matches the embeddings, else None."""
+        try:
+            with open(directory / IVF_MANIFEST_FILE, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            if manifest.get('fingerprint') != fingerprint or manifest.get('num_vectors') != embeddings.shape[0]:
+                return None
+            return cls(
+                embeddings,
+                np.load(directory / IVF_CENTROIDS_FILE, mmap_mode='r'),
+                np.load(directory / IVF_LIST_IDS_FILE, mmap_mode='r'),
+                np.load(directory / IVF_LIST_OFFSETS_FILE, mmap_mode='r'),
+                nprobe
+            )
+        except (FileNotFoundError, ValueError, json.JSONDecodeError):
+            return None
+
+def rebuild_vector_index(vector_index, embeddings: np.ndarray):
+    """
+    Same kind of index over updated embeddings. IVF keeps its trained
+    centroids and only re-buckets the vectors, which is cheap.
+    """
+    if isinstance(vector_index, IVFIndex):
+        return IVFIndex.from_centroids(embeddings, np.asarray(vector_index.centroids), vector_index.nprobe)
+    return ExactIndex(embeddings)
+
+def load_or_build_vector_index(
+    embeddings: np.ndarray,
+    backend: Optional[str] = None,
+    cache_dir: Optional[str] = None
+):
+    """
+    Create the configured vector index. IVF indexes are loaded from the
+    embedding cache directory when they match the cached embeddings'
+    fingerprint and are built (and saved) otherwise.
+    """
+    from bhagavadgpt import embedding_cache
+
+    backend = (backend or VECTOR_INDEX).lower()
+    if backend not in VECTOR_INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index '{backend}', expected one of {VECTOR_INDEX_BACKENDS}")
+
+    if backend == 'exact':
+        return ExactIndex(embeddings)
+
+    directory = embedding_cache.get_cache_dir(cache_dir)
+    manifest = embedding_cache.read_manifest(directory)
+    fingerprint = manifest.get('fingerprint') if manifest and manifest.get('shape') == list(embeddings.shape) else None
+
+    if fingerprint:
+        index = IVFIndex.load(directory, embeddings, fingerprint)
+        if index is not None:
+            print(f"✓ Loaded IVF index from {directory} ({index.nlist} lists)")
+            return index
+
+    index = IVFIndex.build(embeddings)
+    print(f"✓ IVF index built ({index.nlist} lists, nprobe={index.nprobe})")
+
+    if fingerprint:
+        try:
+            index.save(directory, fingerprint)
+        except OSError as e:
+            print(f"Warning: Could not write IVF index: {e}")
+
+    return index
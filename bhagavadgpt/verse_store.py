@@ -0,0 +1,340 @@
+"""
+BhagavadGPT - Columnar Verse Store
+Read-only struct-of-arrays replacement for the list-of-dicts dataset:
+chapter/verse as small integer arrays, themes/keywords/attributes as
+interned ids, and all text in one UTF-8 buffer addressed by offsets.
+
+The arrays are saved as .npy files next to the embedding cache and
+memory-mapped on load, so forked workers share the same pages instead of
+each holding a copy of every verse. Rows are materialized into plain dicts
+only when accessed, which keeps the store a drop-in replacement wherever
+the search core reads `dataset[row]` or iterates the dataset. A per-verse
+bitmask records which optional fields the record had, so a materialized
+verse has the same fields as its JSON record.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from bhagavadgpt import embedding_cache
+from bhagavadgpt.ingest import iter_records
+
+# ==================== Configuration ====================
+
+VERSE_STORE_DIR = 'verse_store'
+VERSE_STORE_MANIFEST = 'verse_store.json'
+VERSE_STORE_FORMAT_VERSION = 2
+
+# Free-text fields, concatenated into the shared text buffer
+TEXT_FIELDS = ('sanskrit', 'translation', 'context', 'speaker')
+# List-of-label fields, stored as interned ids in CSR layout
+LABEL_FIELDS = ('themes', 'keywords')
+# Everything else (references, metadata, ...) is kept as one JSON text per verse
+CORE_FIELDS = ('chapter', 'verse', 'attributes') + TEXT_FIELDS + LABEL_FIELDS
+# Fields a record may lack; bit i of a verse's `fields` mask marks field i present
+OPTIONAL_FIELDS = TEXT_FIELDS + LABEL_FIELDS + ('attributes',)
+
+# Packed (chapter, verse) lookup key; -1 marks a missing number
+KEY_SHIFT = 16
+READ_CHUNK_SIZE = 1 << 20
+
+def _as_number(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+def _key_number(item: Dict[str, Any], field: str, row: int) -> int:
+    """A record's chapter or verse as an int (numeric strings accepted); ValueError otherwise."""
+    value = item.get(field)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise ValueError(f"Verse record {row}: '{field}' must be an integer, got {value!r}")
+
+def pack_key(chapter: Any, verse: Any) -> int:
+    """(chapter, verse) -> single sortable integer."""
+    return (_as_number(chapter) << KEY_SHIFT) + _as_number(verse)
+
+class VerseStore:
+    """Columnar, read-only verse collection indexed by row id."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], vocabularies: Dict[str, List[str]], attribute_keys: List[str]):
+        self.chapters = arrays['chapters']
+        self.verses = arrays['verses']
+        self.text_buffer = arrays['text_buffer']
+        self.text_offsets = arrays['text_offsets']
+        self.label_ids = {field: arrays[f'{field}_ids'] for field in LABEL_FIELDS}
+        self.label_offsets = {field: arrays[f'{field}_offsets'] for field in LABEL_FIELDS}
+        self.attributes = arrays['attributes']
+        self.fields = arrays['fields']
+        self.sorted_keys = arrays['sorted_keys']
+        self.sorted_rows = arrays['sorted_rows']
+        self.vocabularies = vocabularies
+        self.attribute_keys = attribute_keys
+        self._label_lookup = {
+            field: {label: i for i, label in enumerate(labels)} for field, labels in vocabularies.items()
+        }
+
+    # ---------- construction ----------
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'VerseStore':
+        """
+        Build a store from verse dicts in one streaming pass. Raises
+        ValueError for a record without an integer chapter or verse.
+        """
+        chapters: List[int] = []
+        verses: List[int] = []
+        fields: List[int] = []
+        text_buffer = bytearray()
+        text_offsets = [0]
+        label_ids = {field: [] for field in LABEL_FIELDS}
+        label_offsets = {field: [0] for field in LABEL_FIELDS}
+        lookups: Dict[str, Dict[str, int]] = {field: {} for field in LABEL_FIELDS + ('attributes',)}
+        attribute_keys: Dict[str, int] = {}
+        attribute_rows: List[Dict[int, int]] = []
+
+        for row, item in enumerate(records):
+            chapters.append(_key_number(item, 'chapter', row))
+            verses.append(_key_number(item, 'verse', row))
+            fields.append(sum(1 << bit for bit, field in enumerate(OPTIONAL_FIELDS) if field in item))
+
+            extra = {k: v for k, v in item.items() if k not in CORE_FIELDS}
+            texts = [item.get(field) or '' for field in TEXT_FIELDS]
+            texts.append(json.dumps(extra, ensure_ascii=False) if extra else '')
+            for text in texts:
+                text_buffer += str(text).encode('utf-8')
+                text_offsets.append(len(text_buffer))
+
+            for field in LABEL_FIELDS:
+                lookup = lookups[field]
+                for label in item.get(field) or []:
+                    label_ids[field].append(lookup.setdefault(label, len(lookup)))
+                label_offsets[field].append(len(label_ids[field]))
+
+            row_attributes = {}
+            for key, value in (item.get('attributes') or {}).items():
+                column = attribute_keys.setdefault(key, len(attribute_keys))
+                row_attributes[column] = lookups['attributes'].setdefault(str(value), len(lookups['attributes']))
+            attribute_rows.append(row_attributes)
+
+        attributes = np.full((len(chapters), len(attribute_keys)), -1, dtype=np.int32)
+        for row, row_attributes in enumerate(attribute_rows):
+            for column, value_id in row_attributes.items():
+                attributes[row, column] = value_id
+
+        chapter_array = np.array(chapters, dtype=np.int16)
+        verse_array = np.array(verses, dtype=np.int16)
+        keys = (chapter_array.astype(np.int64) << KEY_SHIFT) + verse_array
+        sorted_rows = np.argsort(keys, kind='stable').astype(np.int32)
+
+        arrays = {
+            'chapters': chapter_array,
+            'verses': verse_array,
+            'text_buffer': np.frombuffer(bytes(text_buffer), dtype=np.uint8),
+            'text_offsets': np.array(text_offsets, dtype=np.int64),
+            'attributes': attributes,
+            'fields': np.array(fields, dtype=np.uint8),
+            'sorted_keys': keys[sorted_rows],
+            'sorted_rows': sorted_rows,
+        }
+        for field in LABEL_FIELDS:
+            arrays[f'{field}_ids'] = np.array(label_ids[field], dtype=np.int32)
+            arrays[f'{field}_offsets'] = np.array(label_offsets[field], dtype=np.int64)
+
+        vocabularies = {field: list(lookup) for field, lookup in lookups.items()}
+        return cls(arrays, vocabularies, list(attribute_keys))
+
+    def save(self, directory: Path, fingerprint: str) -> None:
+        """Write every column as .npy plus a manifest (written last)."""
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, array in self._arrays().items():
+            tmp = directory / f"{name}.npy.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                np.save(file, np.ascontiguousarray(array))
+            os.replace(tmp, directory / f"{name}.npy")
+
+        manifest = {
+            'format_version': VERSE_STORE_FORMAT_VERSION,
+            'fingerprint': fingerprint,
+            'num_verses': len(self),
+            'vocabularies': self.vocabularies,
+            'attribute_keys': self.attribute_keys
+        }
+        tmp = directory / f"{VERSE_STORE_MANIFEST}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False)
+        os.replace(tmp, directory / VERSE_STORE_MANIFEST)
+
+    @classmethod
+    def load(cls, directory: Path, fingerprint: str) -> Optional['VerseStore']:
+        """Memory-map a saved store if its fingerprint matches, else None."""
+        try:
+            with open(directory / VERSE_STORE_MANIFEST, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            if (manifest.get('format_version') != VERSE_STORE_FORMAT_VERSION
+                    or manifest.get('fingerprint') != fingerprint):
+                return None
+            names = ['chapters', 'verses', 'text_buffer', 'text_offsets', 'attributes', 'fields', 'sorted_keys', 'sorted_rows']
+            names += [f'{field}_{part}' for field in LABEL_FIELDS for part in ('ids', 'offsets')]
+            arrays = {name: np.load(directory / f"{name}.npy", mmap_mode='r') for name in names}
+        except (FileNotFoundError, ValueError, json.JSONDecodeError):
+            return None
+
+        if arrays['chapters'].shape[0] != manifest.get('num_verses'):
+            return None
+        return cls(arrays, manifest['vocabularies'], manifest['attribute_keys'])
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {
+            'chapters': self.chapters,
+            'verses': self.verses,
+            'text_buffer': self.text_buffer,
+            'text_offsets': self.text_offsets,
+            'attributes': self.attributes,
+            'fields': self.fields,
+            'sorted_keys': self.sorted_keys,
+            'sorted_rows': self.sorted_rows,
+        }
+        for field in LABEL_FIELDS:
+            arrays[f'{field}_ids'] = self.label_ids[field]
+            arrays[f'{field}_offsets'] = self.label_offsets[field]
+        return arrays
+
+    # ---------- lookups ----------
+
+    def __len__(self) -> int:
+        return self.chapters.shape[0]
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        """Materialize one verse as a plain dict (same fields as the JSON record)."""
+        row = self._check_row(row)
+        item = {
+            'chapter': int(self.chapters[row]),
+            'verse': int(self.verses[row]),
+            'sanskrit': self.text(row, 'sanskrit'),
+            'translation': self.text(row, 'translation'),
+            'themes': self.labels(row, 'themes'),
+            'keywords': self.labels(row, 'keywords'),
+            'context': self.text(row, 'context'),
+            'speaker': self.text(row, 'speaker'),
+            'attributes': self.attribute_dict(row),
+        }
+        present = int(self.fields[row])
+        for bit, field in enumerate(OPTIONAL_FIELDS):
+            if not present >> bit & 1:
+                del item[field]
+        extra = self._field_text(row, len(TEXT_FIELDS))
+        if extra:
+            item.update(json.loads(extra))
+        return item
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def _check_row(self, row: int) -> int:
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"Verse row {row} out of range")
+        return row
+
+    def _field_text(self, row: int, field_index: int) -> str:
+        position = row * (len(TEXT_FIELDS) + 1) + field_index
+        start, end = self.text_offsets[position], self.text_offsets[position + 1]
+        return bytes(self.text_buffer[start:end]).decode('utf-8')
+
+    def text(self, row: int, field: str) -> str:
+        """One text field of a verse, without materializing the rest."""
+        return self._field_text(self._check_row(row), TEXT_FIELDS.index(field))
+
+    def label_id_array(self, row: int, field: str) -> np.ndarray:
+        """Interned ids of a verse's themes or keywords."""
+        row = self._check_row(row)
+        offsets = self.label_offsets[field]
+        return self.label_ids[field][offsets[row]:offsets[row + 1]]
+
+    def labels(self, row: int, field: str) -> List[str]:
+        vocabulary = self.vocabularies[field]
+        return [vocabulary[i] for i in self.label_id_array(row, field)]
+
+    def label_id(self, field: str, label: str) -> Optional[int]:
+        """Interned id of a theme/keyword/attribute value, or None if unknown."""
+        return self._label_lookup[field].get(label)
+
+    def attribute_dict(self, row: int) -> Dict[str, str]:
+        vocabulary = self.vocabularies['attributes']
+        return {
+            key: vocabulary[value_id]
+            for key, value_id in zip(self.attribute_keys, self.attributes[row])
+            if value_id >= 0
+        }
+
+    def row_of(self, chapter: Any, verse: Any) -> Optional[int]:
+        """Row id of (chapter, verse) by binary search (first row on duplicates)."""
+        key = pack_key(chapter, verse)
+        position = int(np.searchsorted(self.sorted_keys, key))
+        if position < len(self) and self.sorted_keys[position] == key:
+            return int(self.sorted_rows[position])
+        return None
+
+    def get(self, chapter: Any, verse: Any) -> Optional[Dict[str, Any]]:
+        """Verse dict for (chapter, verse), or None."""
+        row = self.row_of(chapter, verse)
+        return None if row is None else self[row]
+
+# ==================== Loading ====================
+
+def file_fingerprint(file_path: str) -> str:
+    """sha256 of the dataset file plus the store format version."""
+    digest = hashlib.sha256(f"v{VERSE_STORE_FORMAT_VERSION}\0".encode('utf-8'))
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_verse_store(
+    file_path: str = 'bhagavad_gita_dataset_expanded.json',
+    cache_dir: Optional[str] = None
+) -> VerseStore:
+    """
+    Memory-map the verse store built from `file_path`, building it (records
+    are streamed, never held as dicts) and saving it next to the embedding
+    cache when missing or stale. Falls back to an in-memory store when the
+    cache directory is not writable, and to an empty store on errors.
+    """
+    try:
+        fingerprint = file_fingerprint(file_path)
+        directory = embedding_cache.get_cache_dir(cache_dir) / VERSE_STORE_DIR
+
+        store = VerseStore.load(directory, fingerprint)
+        if store is not None:
+            print(f"✓ Loaded verse store with {len(store)} verses from {directory}")
+            return store
+
+        store = VerseStore.from_records(iter_records(file_path))
+        try:
+            store.save(directory, fingerprint)
+            store = VerseStore.load(directory, fingerprint) or store
+        except OSError as e:
+            print(f"Warning: Could not write verse store: {e}")
+
+        print(f"✓ Loaded dataset with {len(store)} verses")
+        return store
+    except FileNotFoundError:
+        print(f"Error: Dataset file '{file_path}' not found")
+        print("Please generate it by running: jupyter notebook code.ipynb")
+    except json.JSONDecodeError:
+        print(f"Error: Invalid JSON format in '{file_path}'")
+    except ValueError as e:
+        print(f"Error: {e} in '{file_path}'")
+    return VerseStore.from_records([])
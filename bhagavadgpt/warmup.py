@@ -0,0 +1,102 @@
+"""
+BhagavadGPT - Background Warm-up
+Thread-safe, single-flight initializer that loads the dataset, embeddings
+and model in a background thread and reports its phase and timings.
+"""
+
+import os
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+# ==================== Configuration ====================
+
+# Start warm-up when the app module is imported (set to 0 to start lazily)
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', '1') == '1'
+# Seconds a request may wait for warm-up before getting a 503
+WARMUP_WAIT_SECONDS = float(os.environ.get('WARMUP_WAIT_SECONDS', 0))
+# Retry-After hint (seconds) sent with 503 responses during warm-up
+WARMUP_RETRY_AFTER = int(os.environ.get('WARMUP_RETRY_AFTER', 5))
+
+PHASE_IDLE = 'idle'
+PHASE_READY = 'ready'
+PHASE_FAILED = 'failed'
+
+class Initializer:
+    """
+    Runs `load(phase)` at most once at a time in a daemon thread. `load`
+    calls `phase(name)` as it moves through its steps so progress and
+    per-phase timings can be reported. A failed run may be started again.
+    """
+
+    def __init__(self, load: Callable[[Callable[[str], None]], None]):
+        self._load = load
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.phase = PHASE_IDLE
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+        self._phase_started: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == PHASE_READY
+
+    def start(self) -> bool:
+        """Start warm-up unless it is running or done. Returns True if started."""
+        with self._lock:
+            if self._thread is not None and self.phase != PHASE_FAILED:
+                return False
+
+            self.phase = 'starting'
+            self.error = None
+            self.timings = {}
+            self.started_at = time.time()
+            self.finished_at = None
+            self._phase_started = time.perf_counter()
+            self._done.clear()
+            self._thread = threading.Thread(target=self._run, name='bhagavadgpt-warmup', daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up finishes (or `timeout` elapses). Returns `ready`."""
+        if timeout is None or timeout > 0:
+            self._done.wait(timeout)
+        return self.ready
+
+    def _enter_phase(self, name: str) -> None:
+        now = time.perf_counter()
+        self.timings[self.phase] = round(now - self._phase_started, 4)
+        self._phase_started = now
+        self.phase = name
+        print(f"⏳ Warm-up phase: {name}")
+
+    def _run(self) -> None:
+        try:
+            self._load(self._enter_phase)
+            self._enter_phase(PHASE_READY)
+        except Exception as e:
+            print(f"Error during warm-up: {e}")
+            traceback.print_exc()
+            self.error = str(e)
+            self._enter_phase(PHASE_FAILED)
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Current phase, error, timings and elapsed time for /api/ready."""
+        end = self.finished_at or time.time()
+        return {
+            'ready': self.ready,
+            'phase': self.phase,
+            'error': self.error,
+            'started_at': self.started_at,
+            'elapsed_seconds': round(end - self.started_at, 4) if self.started_at else 0.0,
+            'timings': dict(self.timings)
+        }
@@ -3,17 +3,31 @@
  * Handles chat interaction and API communication
  */
 
+const NO_MATCH_REPLY = "I couldn't find a matching verse. Please try rephrasing your question.";
+// A cold server answers 503 + Retry-After while warming up; retry this many times
+const WARMUP_MAX_RETRIES = 12;
+const WARMUP_DEFAULT_DELAY_SECONDS = 5;
+
 class BhagavadGPT {
     constructor() {
         this.userInput = document.getElementById("user-input");
         this.sendBtn = document.getElementById("send-btn");
         this.chatMessages = document.getElementById("chat-messages");
         this.baseUrl = window.location.origin;
+        // One conversation per page load: follow-ups are searched in its context
+        this.sessionId = this.createSessionId();
         
         this.initializeEventListeners();
         this.sendInitialGreeting();
     }
 
+    createSessionId() {
+        if (window.crypto && typeof window.crypto.randomUUID === "function") {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
     initializeEventListeners() {
         this.sendBtn.addEventListener("click", () => this.sendMessage());
         this.userInput.addEventListener("keypress", (event) => {
@@ -46,6 +60,38 @@ Ask your question and I'll share relevant verses with you.`;
         messageDiv.textContent = text;
         this.chatMessages.appendChild(messageDiv);
         this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+        return messageDiv;
+    }
+
+    addVerse(verse, text) {
+        // A verse message with a "More like this" button for its neighbours
+        const messageDiv = this.addMessage(text || this.formatVerse(verse), "bot");
+        const similarBtn = document.createElement("button");
+        similarBtn.classList.add("similar-btn");
+        similarBtn.textContent = "More like this";
+        similarBtn.addEventListener("click", () => this.showSimilar(verse, similarBtn));
+        messageDiv.appendChild(similarBtn);
+        this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+    }
+
+    async showSimilar(verse, button) {
+        button.disabled = true;
+        try {
+            const response = await this.fetchWhenReady(`${this.baseUrl}/api/verses/${verse.chapter}/${verse.verse}/similar`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const data = await response.json();
+            if (!data.similar.length) {
+                this.addMessage("No similar verses found.", "bot");
+            }
+            data.similar.forEach((similar) => this.addVerse(similar));
+            button.remove();
+        } catch (error) {
+            console.error("Error:", error);
+            this.addMessage("Sorry, similar verses could not be loaded.\n\nError: " + error.message, "bot");
+            button.disabled = false;
+        }
     }
 
     addLoadingMessage() {
@@ -57,6 +103,28 @@ Ask your question and I'll share relevant verses with you.`;
         this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
     }
 
+    setLoadingText(text) {
+        const loadingMsg = document.getElementById("loading-message");
+        if (loadingMsg) {
+            loadingMsg.textContent = text;
+        }
+    }
+
+    async fetchWhenReady(url, options) {
+        // Retry 503s (server warming up) after the Retry-After delay, a bounded number of times
+        for (let attempt = 0; ; attempt++) {
+            const response = await fetch(url, options);
+            if (response.status !== 503 || attempt >= WARMUP_MAX_RETRIES) {
+                return response;
+            }
+            const retryAfter = parseInt(response.headers.get("Retry-After"), 10);
+            const delay = Number.isFinite(retryAfter) && retryAfter > 0 ? retryAfter : WARMUP_DEFAULT_DELAY_SECONDS;
+            this.setLoadingText(`⏳ BhagavadGPT is warming up, retrying in ${delay}s...`);
+            await new Promise((resolve) => setTimeout(resolve, delay * 1000));
+            this.setLoadingText("🔍 Searching for relevant verses...");
+        }
+    }
+
     removeLoadingMessage() {
         const loadingMsg = document.getElementById("loading-message");
         if (loadingMsg) {
@@ -64,6 +132,65 @@ Ask your question and I'll share relevant verses with you.`;
         }
     }
 
+    formatVerse(verse) {
+        const banner = "=".repeat(60);
+        const themes = (verse.themes || []).join(", ");
+        return `${banner}
+📖 Chapter ${verse.chapter}, Verse ${verse.verse}
+${banner}
+
+${verse.translation || ""}
+
+📌 Themes: ${themes}
+
+💭 Context: ${verse.context || ""}
+(Confidence: ${(verse.score * 100).toFixed(1)}%)`;
+    }
+
+    showVerses(data) {
+        // Non-streamed response: structured verses, or the server-formatted reply
+        if (data.verses && data.verses.length) {
+            data.verses.forEach((verse) => this.addVerse(verse));
+        } else {
+            this.addMessage(data.reply || NO_MATCH_REPLY, "bot");
+        }
+    }
+
+    async readVerseStream(response) {
+        // One JSON event per line: {"event":"verse",...} per verse, then {"event":"done",...}
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = "";
+        let shown = 0;
+
+        const handleLine = (line) => {
+            if (!line.trim()) return;
+            const event = JSON.parse(line);
+            if (event.event === "verse") {
+                this.removeLoadingMessage();
+                this.addVerse(event, event.text);
+                shown += 1;
+            } else if (event.event === "error") {
+                throw new Error(event.details || event.error);
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split("\n");
+            buffered = lines.pop();
+            lines.forEach(handleLine);
+        }
+        handleLine(buffered + decoder.decode());
+
+        this.removeLoadingMessage();
+        if (shown === 0) {
+            this.addMessage(NO_MATCH_REPLY, "bot");
+        }
+    }
+
     async sendMessage() {
         const messageText = this.userInput.value.trim();
         if (messageText === "") return;
@@ -77,25 +204,33 @@ Ask your question and I'll share relevant verses with you.`;
         this.addLoadingMessage();
 
         try {
-            const response = await fetch(`${this.baseUrl}/api/chat`, {
+            // Ask for structured verses only and stream them as NDJSON lines;
+            // the reply text is rebuilt here instead of being sent twice
+            const response = await this.fetchWhenReady(`${this.baseUrl}/api/chat`, {
                 method: "POST",
                 headers: {
                     "Content-Type": "application/json",
                 },
-                body: JSON.stringify({ message: messageText }),
+                body: JSON.stringify({
+                    message: messageText,
+                    session_id: this.sessionId,
+                    response_format: "structured",
+                    stream: "ndjson",
+                }),
             });
 
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
-            
-            // Remove loading message
-            this.removeLoadingMessage();
-            
-            // Add bot response
-            this.addMessage(data.reply || "No response received", "bot");
+            const contentType = response.headers.get("Content-Type") || "";
+            if (contentType.includes("application/x-ndjson") && response.body) {
+                await this.readVerseStream(response);
+            } else {
+                const data = await response.json();
+                this.removeLoadingMessage();
+                this.showVerses(data);
+            }
             
         } catch (error) {
             this.removeLoadingMessage();
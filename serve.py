@@ -0,0 +1,189 @@
+"""
+BhagavadGPT - Production Server
+Pre-fork WSGI server: the master loads the dataset, embeddings and indexes
+once, moves the embedding matrix into shared memory, then forks worker
+processes that serve app.py on one shared listening socket. Each worker
+loads its own model with a bounded number of intra-op threads so the
+workers don't oversubscribe the cores. The master never encodes: it exits
+when the embedding cache is cold. On SIGTERM workers stop accepting
+connections and finish their in-flight requests before exiting.
+
+    python serve.py --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+# Warm-up is driven explicitly below: never start a thread before forking
+os.environ['WARMUP_ON_START'] = '0'
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import app as webapp
+from bhagavadgpt.encoder import set_encoder_threads
+from bhagavadgpt.shared_arrays import release, share_embeddings
+
+# ==================== Configuration ====================
+
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', 8000))
+# Worker processes (0 = one per CPU core)
+WORKERS = int(os.environ.get('WORKERS', 0))
+# Intra-op threads per worker (0 = cores / workers)
+WORKER_THREADS = int(os.environ.get('WORKER_THREADS', 0))
+# Seconds workers get to finish in-flight requests on shutdown before being killed
+GRACEFUL_TIMEOUT = float(os.environ.get('GRACEFUL_TIMEOUT', 30))
+LISTEN_BACKLOG = 2048
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Skip per-request access logs (they serialize on stderr under load)."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+# ==================== Master ====================
+
+def preload() -> list:
+    """Load everything shareable in the master and move embeddings to shared memory."""
+    print("\n" + "="*60)
+    print("🚀 Preloading BhagavadGPT (master)...")
+    print("="*60)
+
+    # Encoding here would import torch (and its thread pools) before forking
+    try:
+        webapp.load_search_index(allow_encode=False)
+    except RuntimeError as e:
+        print(f"\n❌ {e}")
+        raise SystemExit(1)
+    index = webapp.search_index
+
+    shared, blocks = share_embeddings(index.corpus_embeddings)
+    index.corpus_embeddings = shared
+    if index.vector_index is not None:
+        index.vector_index.embeddings = shared
+
+    # Keep refcount updates from dirtying (and so copying) preloaded objects
+    gc.freeze()
+
+    print(f"✓ Preloaded {len(index)} verses "
+          f"({'shared memory' if blocks else 'memory-mapped'} embeddings)")
+    return blocks
+
+def serve_worker(listener: socket.socket, host: str, threads: int) -> None:
+    """Worker process body: bound threads, warm the model, serve until SIGTERM."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_encoder_threads(threads)
+
+    webapp.initializer.start()
+    server = make_server(
+        host, listener.getsockname()[1], webapp.app,
+        threaded=True, request_handler=QuietRequestHandler, fd=listener.fileno()
+    )
+    # Let server_close() wait for the request threads instead of abandoning them
+    server.daemon_threads = False
+
+    def drain(signum, frame):
+        # shutdown() blocks until serve_forever() returns, which runs on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, drain)
+    server.serve_forever()
+    server.server_close()
+
+def spawn(listener: socket.socket, host: str, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve_worker(listener, host, threads)
+        finally:
+            os._exit(0)
+    return pid
+
+def stop_waiting(children: set, timeout: float) -> None:
+    """Reap draining workers; SIGKILL those still running after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while children and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            time.sleep(0.1)
+        else:
+            children.discard(pid)
+
+    for pid in children:
+        print(f"Warning: worker {pid} still busy after {timeout:.0f}s; killing it")
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run BhagavadGPT with pre-forked workers")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Worker processes (0 = CPU cores)")
+    parser.add_argument('--threads', type=int, default=WORKER_THREADS,
+                        help="Intra-op threads per worker (0 = cores / workers)")
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or cores
+    threads = args.threads or max(1, cores // workers)
+
+    blocks = preload()
+    # Workers inherit this, so /api/admin/reindex can refuse to update just one of them
+    webapp.worker_count = workers
+
+    listener = socket.create_server((args.host, args.port), backlog=LISTEN_BACKLOG)
+    listener.set_inheritable(True)
+
+    children = {spawn(listener, args.host, threads) for _ in range(workers)}
+    print(f"✓ Serving on http://{args.host}:{args.port} with {workers} workers x {threads} threads\n")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        while not stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.5)
+                continue
+            children.discard(pid)
+            if not stopping:
+                # Replace crashed workers
+                print(f"Warning: worker {pid} exited ({status}); restarting")
+                children.add(spawn(listener, args.host, threads))
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        stop_waiting(children, GRACEFUL_TIMEOUT)
+        listener.close()
+        release(blocks)
+        print("✓ Shut down")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
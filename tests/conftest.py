@@ -0,0 +1,89 @@
+"""
+Shared fixtures: app.py, asgi.py and api/index.py warmed up on a small
+synthetic dataset with the offline HashingEncoder and a temporary
+embedding cache, so the suite needs neither the sentence-transformer
+model nor the real dataset.
+
+    pip install pytest
+    python -m pytest tests
+"""
+
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# 50 chapters x 4 verses (see benchmarks.corpus.synthetic_dataset)
+DATASET_SIZE = 200
+DATASET_SEED = 7
+WARMUP_TIMEOUT = 120
+
+@pytest.fixture(scope='session')
+def environment(tmp_path_factory):
+    """Temporary cache and dataset; set before any app module is imported."""
+    directory = tmp_path_factory.mktemp('bhagavadgpt')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('EMBEDDING_CACHE_DIR', str(directory / 'embeddings'))
+        patch.setenv('INDEX_BUNDLE_DIR', '')
+        patch.setenv('WARMUP_ON_START', '0')
+
+        from benchmarks.corpus import HashingEncoder, synthetic_dataset
+
+        dataset_path = directory / 'bhagavad_gita_dataset_expanded.json'
+        with open(dataset_path, 'w', encoding='utf-8') as file:
+            json.dump(synthetic_dataset(DATASET_SIZE, DATASET_SEED), file)
+
+        encoder = HashingEncoder()
+        patch.setattr('bhagavadgpt.search.load_model', lambda model_name=None: encoder)
+        yield patch, dataset_path, encoder
+
+@pytest.fixture(scope='session')
+def corpus(environment):
+    """The synthetic dataset, its embeddings and the encoder, for unit tests of the search core."""
+    _, dataset_path, encoder = environment
+    from bhagavadgpt.search import build_search_text, encode_texts
+
+    with open(dataset_path, 'r', encoding='utf-8') as file:
+        dataset = json.load(file)
+    return dataset, encode_texts(encoder, [build_search_text(item) for item in dataset]), encoder
+
+def warm_up(module) -> None:
+    module.initializer.start()
+    assert module.initializer.wait(WARMUP_TIMEOUT), module.initializer.status()
+
+@pytest.fixture(scope='session')
+def webapp(environment):
+    """app.py, warmed up."""
+    patch, dataset_path, encoder = environment
+    import app
+
+    patch.setattr(app, 'DATASET_FILE', str(dataset_path))
+    patch.setattr(app, 'load_model', lambda model_name=None: encoder)
+    warm_up(app)
+    return app
+
+@pytest.fixture(scope='session')
+def asgi_module(webapp):
+    """asgi.py (shares app.py's index and warm-up)."""
+    import asgi
+
+    yield asgi
+    asgi.app.executor.shutdown(wait=False)
+
+@pytest.fixture(scope='session')
+def vercel_app(environment):
+    """api/index.py, warmed up."""
+    patch, dataset_path, encoder = environment
+    spec = importlib.util.spec_from_file_location('vercel_index', ROOT / 'api' / 'index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    patch.setattr(module, 'get_dataset_path', lambda: str(dataset_path))
+    patch.setattr(module, 'load_model', lambda model_name=None: encoder)
+    warm_up(module)
+    return module
@@ -0,0 +1,178 @@
+"""
+API contract: the Flask app (app.py), the ASGI app (asgi.py) and the Vercel
+function (api/index.py) answer the same requests with the same status codes
+and JSON bodies, the same streamed NDJSON/SSE events and the same
+compressed bodies. Also covers the ASGI-only behaviour: 429 when the
+executor is full and 504 when a request outlives its timeout.
+"""
+
+import asyncio
+import gzip
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import pytest
+
+# (method, path, JSON body, expected status)
+CASES = [
+    ('GET', '/api/health', None, 200),
+    ('GET', '/api/verses/count', None, 200),
+    ('GET', '/api/ready', None, 200),
+    ('POST', '/api/chat', {'message': 'fear and anger in my mind'}, 200),
+    ('POST', '/api/chat', {'message': 'how to find peace', 'top_k': 5, 'min_score': 0.0}, 200),
+    ('POST', '/api/chat', {'message': 'duty', 'filters': {'chapter': [2, 3]}}, 200),
+    ('POST', '/api/chat', {'message': '   '}, 400),
+    ('POST', '/api/chat', {'message': 'peace', 'top_k': 0}, 400),
+    ('POST', '/api/chat', {'message': 'peace', 'semantic_weight': 'x'}, 400),
+    ('POST', '/api/chat', {'message': 'peace', 'filters': {'planet': 'mars'}}, 400),
+    ('POST', '/api/chat', {'message': 'fear of war', 'response_format': 'structured'}, 200),
+    ('POST', '/api/chat', {'message': 'fear of war', 'response_format': 'text'}, 200),
+    ('POST', '/api/chat', {'message': 'peace', 'response_format': 'xml'}, 400),
+    ('POST', '/api/chat', {'message': 'peace', 'stream': 'websocket'}, 400),
+    ('GET', '/api/verses/2/3/similar', None, 200),
+    ('GET', '/api/verses/2/3/similar?top_k=3', None, 200),
+    ('GET', '/api/verses/2/3/similar?top_k=0', None, 400),
+    ('GET', '/api/verses/99/1/similar', None, 404),
+]
+
+# Streamed chats: the raw event bodies must match byte for byte
+STREAM_CASES = [
+    {'message': 'fear and anger', 'stream': 'ndjson'},
+    {'message': 'how to find peace', 'stream': 'sse', 'response_format': 'structured'},
+    {'message': 'duty', 'stream': 'ndjson', 'response_format': 'text', 'top_k': 2},
+]
+
+def case_id(case) -> str:
+    method, path, body, _ = case
+    return f"{method} {path} {json.dumps(body) if body else ''}".strip()
+
+def call_flask(module, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+    response = module.app.test_client().open(path, method=method, json=body)
+    return response.status_code, response.get_json()
+
+async def call_asgi_async(
+    application,
+    method: str,
+    path: str,
+    body: Optional[Dict[str, Any]],
+    raw: bool = False,
+    accept_encoding: Optional[str] = None
+) -> Tuple[int, Any, Dict[str, str]]:
+    """
+    Drive an ASGI app directly (no server) and collect its response: parsed
+    JSON, or the raw body bytes with `raw=True`.
+    """
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    path, _, query_string = path.partition('?')
+    request_headers = [(b'content-type', b'application/json')]
+    if accept_encoding:
+        request_headers.append((b'accept-encoding', accept_encoding.encode('latin-1')))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'path': path, 'query_string': query_string.encode('latin-1'),
+        'headers': request_headers,
+    }
+    received = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        received.append(message)
+
+    await application(scope, receive, send)
+    status = received[0]['status']
+    headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in received[0]['headers']}
+    content = b''.join(m.get('body', b'') for m in received[1:])
+    if raw:
+        return status, content, headers
+    return status, json.loads(content) if content else None, headers
+
+def comparable(path: str, content: Any) -> Any:
+    """Drop fields that legitimately differ between two calls (timestamps)."""
+    if path == '/api/ready' and isinstance(content, dict):
+        return {k: v for k, v in content.items() if k in ('ready', 'phase')}
+    return content
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_flask_and_asgi_agree(webapp, asgi_module, case):
+    method, path, body, expected_status = case
+    flask_status, flask_content = call_flask(webapp, method, path, body)
+    asgi_status, asgi_content, _ = asyncio.run(call_asgi_async(asgi_module.app, method, path, body))
+
+    assert flask_status == expected_status, flask_content
+    assert asgi_status == flask_status, asgi_content
+    assert comparable(path, asgi_content) == comparable(path, flask_content)
+
+@pytest.mark.parametrize('case', CASES, ids=case_id)
+def test_vercel_and_flask_agree(webapp, vercel_app, case):
+    method, path, body, expected_status = case
+    flask_status, flask_content = call_flask(webapp, method, path, body)
+    vercel_status, vercel_content = call_flask(vercel_app, method, path, body)
+
+    assert vercel_status == expected_status, vercel_content
+    assert comparable(path, vercel_content) == comparable(path, flask_content)
+
+def test_results_are_not_empty(webapp):
+    _, chat = call_flask(webapp, 'POST', '/api/chat', {'message': 'how to find peace', 'min_score': 0.0})
+    _, similar = call_flask(webapp, 'GET', '/api/verses/2/3/similar?top_k=3', None)
+
+    assert chat['verses']
+    assert (similar['verse']['chapter'], similar['verse']['verse']) == (2, 3)
+    assert 1 <= len(similar['similar']) <= 3
+
+@pytest.mark.parametrize('body', STREAM_CASES, ids=lambda body: json.dumps(body))
+def test_streamed_events_match(webapp, asgi_module, body):
+    flask_response = webapp.app.test_client().post('/api/chat', json=body)
+    status, content, headers = asyncio.run(call_asgi_async(asgi_module.app, 'POST', '/api/chat', body, raw=True))
+
+    assert flask_response.status_code == status == 200
+    assert flask_response.mimetype == headers.get('content-type')
+    assert flask_response.get_data() == content
+
+def test_compressed_bodies_match(webapp, asgi_module):
+    body = {'message': 'fear and anger', 'top_k': 10, 'min_score': 0.0}
+    flask_response = webapp.app.test_client().post('/api/chat', json=body, headers={'Accept-Encoding': 'gzip'})
+    status, content, headers = asyncio.run(
+        call_asgi_async(asgi_module.app, 'POST', '/api/chat', body, raw=True, accept_encoding='gzip')
+    )
+
+    assert flask_response.headers.get('Content-Encoding') == headers.get('content-encoding') == 'gzip'
+    assert json.loads(gzip.decompress(flask_response.get_data())) == json.loads(gzip.decompress(content))
+
+def test_sessions_match(webapp, asgi_module):
+    """A conversation replayed on each app (separate session ids) gets the same verses per turn."""
+    client = webapp.app.test_client()
+    for turn in ('fear about my work', 'tell me more', 'tell me more'):
+        flask_content = client.post('/api/chat', json={'message': turn, 'session_id': 'contract-flask'}).get_json()
+        _, asgi_content, _ = asyncio.run(
+            call_asgi_async(asgi_module.app, 'POST', '/api/chat', {'message': turn, 'session_id': 'contract-asgi'})
+        )
+        assert asgi_content == flask_content, turn
+
+def test_asgi_backpressure_and_timeout(webapp, asgi_module):
+    """429 once max_pending requests are offloaded, 504 when the work outlives the timeout."""
+    application = asgi_module.BhagavadASGI(max_workers=1, max_pending=2, timeout=0.2)
+    release = threading.Event()
+
+    async def scenario():
+        # Occupy the single worker thread, then queue one chat behind it
+        blocker = asyncio.ensure_future(application.offload(release.wait, 5))
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(call_asgi_async(application, 'POST', '/api/chat', {'message': 'peace'}))
+        await asyncio.sleep(0.01)
+        rejected = await call_asgi_async(application, 'POST', '/api/chat', {'message': 'peace'})
+        timed_out = await queued
+        release.set()
+        await asyncio.gather(blocker, return_exceptions=True)
+        return rejected, timed_out
+
+    try:
+        rejected, timed_out = asyncio.run(scenario())
+    finally:
+        release.set()
+        application.executor.shutdown(wait=True)
+
+    assert rejected[0] == 429 and 'retry-after' in rejected[2], rejected
+    assert timed_out[0] == 504, timed_out
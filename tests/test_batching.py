@@ -0,0 +1,79 @@
+"""
+Encoder micro-batching: concurrent encodes are coalesced into fewer calls
+and every caller gets exactly its own rows back (and its errors).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.corpus import HashingEncoder, synthetic_queries
+from bhagavadgpt.batching import BatchingEncoder
+
+class RecordingEncoder(HashingEncoder):
+    """HashingEncoder that is slow enough for requests to queue up, and records its call sizes."""
+
+    def __init__(self, delay=0.02, fail_on=None):
+        super().__init__()
+        self.delay = delay
+        self.fail_on = fail_on
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def encode(self, sentences, **kwargs):
+        with self.lock:
+            self.calls.append(1 if isinstance(sentences, str) else len(sentences))
+        time.sleep(self.delay)
+        if self.fail_on is not None and self.fail_on in sentences:
+            raise RuntimeError('encoder failed')
+        return super().encode(sentences, **kwargs)
+
+def test_concurrent_encodes_are_coalesced():
+    inner = RecordingEncoder()
+    encoder = BatchingEncoder(inner, max_batch=16, max_wait_ms=10)
+    texts = synthetic_queries(40, 0)
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(lambda text: encoder.encode(text, normalize_embeddings=True), texts))
+
+    expected = HashingEncoder().encode(texts, normalize_embeddings=True)
+    np.testing.assert_array_equal(np.stack(results), expected)
+    assert encoder.sentences == 40 and sum(inner.calls) == 40
+    assert encoder.batches < 40 and max(inner.calls) <= 16
+
+def test_mixed_normalization_and_list_requests():
+    encoder = BatchingEncoder(RecordingEncoder(), max_batch=16, max_wait_ms=10)
+    reference = HashingEncoder()
+    requests = [(['peace of mind', 'fear'], False), (['duty'], True), ('anger and desire', True)]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda r: encoder.encode(r[0], normalize_embeddings=r[1]), requests))
+
+    for (texts, normalize), result in zip(requests, results):
+        np.testing.assert_array_equal(result, reference.encode(texts, normalize_embeddings=normalize))
+
+def test_large_encodes_bypass_the_queue():
+    inner = RecordingEncoder(delay=0)
+    encoder = BatchingEncoder(inner, max_batch=4)
+
+    assert encoder.encode(synthetic_queries(10, 0)).shape == (10, inner.dim)
+    assert encoder.encode(['a', 'b'], show_progress_bar=True).shape == (2, inner.dim)
+    assert encoder.batches == 0 and inner.calls == [10, 2]
+
+def test_errors_reach_every_caller_in_the_batch():
+    encoder = BatchingEncoder(RecordingEncoder(fail_on='bad'), max_batch=16, max_wait_ms=20)
+
+    def encode(text):
+        try:
+            return encoder.encode([text, 'bad'])
+        except RuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(encode, ['one', 'two', 'three', 'four']))
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    # The dispatcher survives and keeps serving
+    assert encoder.encode('peace').shape == (HashingEncoder().dim,)
@@ -0,0 +1,77 @@
+"""
+Index bundles: a built bundle loads and verifies, and a tampered, truncated
+or missing file (or a changed dataset) makes the apps ignore it.
+"""
+
+import shutil
+
+import pytest
+
+from bhagavadgpt import bundle
+
+@pytest.fixture(scope='module')
+def built(environment, tmp_path_factory):
+    """A float32/exact bundle of the synthetic dataset."""
+    patch, dataset_path, encoder = environment
+    out = tmp_path_factory.mktemp('bundle') / 'index_bundle'
+    with pytest.MonkeyPatch.context() as build_patch:
+        build_patch.setattr(bundle, 'create_encoder', lambda model_name: encoder)
+        manifest = bundle.build_bundle(str(dataset_path), str(out), dtype='float32', vector_backend='exact')
+    return out, manifest, dataset_path
+
+@pytest.fixture
+def copy(built, tmp_path):
+    """A scratch copy of the bundle to tamper with."""
+    out, _, dataset_path = built
+    target = tmp_path / 'index_bundle'
+    shutil.copytree(out, target)
+    return target, dataset_path
+
+def load(path, dataset_path):
+    return bundle.load_bundle(str(path), dtype='float32', vector_backend='exact', dataset_path=str(dataset_path))
+
+def test_built_bundle_verifies_and_loads(built):
+    out, manifest, dataset_path = built
+
+    assert bundle.check_files(out, manifest, checksums=True) == []
+    assert bundle.main(['verify', '--bundle', str(out)]) == 0
+    index = load(out, dataset_path)
+    assert index is not None and len(index) == manifest['num_verses'] == 200
+
+def test_same_size_tampering_fails_the_checksum(copy, monkeypatch):
+    path, dataset_path = copy
+    embeddings = path / 'embeddings.npy'
+    data = bytearray(embeddings.read_bytes())
+    data[-1] ^= 0xFF
+    embeddings.write_bytes(bytes(data))
+    manifest = bundle.read_bundle_manifest(path)
+
+    # Sizes still match, so only a re-hash notices
+    assert bundle.check_files(path, manifest) == []
+    assert bundle.check_files(path, manifest, checksums=True) == ['embeddings.npy does not match its checksum']
+    assert bundle.main(['verify', '--bundle', str(path)]) == 1
+
+    monkeypatch.setattr(bundle, 'BUNDLE_VERIFY', True)
+    assert load(path, dataset_path) is None
+
+@pytest.mark.parametrize('damage', ['truncate', 'delete'])
+def test_truncated_or_missing_files_are_ignored(copy, damage):
+    path, dataset_path = copy
+    target = path / bundle.VERSE_HASHES_FILE
+    if damage == 'truncate':
+        target.write_bytes(target.read_bytes()[:-10])
+    else:
+        target.unlink()
+
+    assert len(bundle.check_files(path, bundle.read_bundle_manifest(path))) == 1
+    assert load(path, dataset_path) is None
+
+def test_changed_dataset_is_ignored(copy, tmp_path):
+    path, dataset_path = copy
+    edited = tmp_path / 'dataset.json'
+    edited.write_bytes(dataset_path.read_bytes().replace(b'"verse": 1,', b'"verse": 1 ,', 1))
+    assert edited.read_bytes() != dataset_path.read_bytes()
+
+    assert load(path, edited) is None
+    assert bundle.load_bundle_verses(str(path), str(edited)) is None
+    assert bundle.load_bundle_verses(str(path), str(dataset_path)) is not None
@@ -0,0 +1,67 @@
+"""
+Query caches: TTL expiry, LRU eviction order and their counters.
+"""
+
+import pytest
+
+from bhagavadgpt import cache
+from bhagavadgpt.cache import TTLCache, normalize_query
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+def test_entries_expire_after_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.put('peace', 1)
+
+    clock.now += 59
+    assert ttl_cache.get('peace') == 1
+    clock.now += 2
+    assert ttl_cache.get('peace') is None
+
+    stats = ttl_cache.stats()
+    assert (stats['size'], stats['hits'], stats['misses'], stats['expirations']) == (0, 1, 1, 1)
+
+def test_put_refreshes_the_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.put('peace', 1)
+    clock.now += 50
+    ttl_cache.put('peace', 2)
+    clock.now += 50
+    assert ttl_cache.get('peace') == 2
+
+def test_least_recently_used_is_evicted(clock):
+    ttl_cache = TTLCache(maxsize=3, ttl=60)
+    for key in 'abc':
+        ttl_cache.put(key, key)
+    ttl_cache.get('a')
+    ttl_cache.put('d', 'd')
+
+    assert ttl_cache.get('b') is None
+    assert [ttl_cache.get(key) for key in 'acd'] == ['a', 'c', 'd']
+    assert ttl_cache.stats()['evictions'] == 1
+
+def test_zero_size_and_clear(clock):
+    disabled = TTLCache(maxsize=0, ttl=60)
+    disabled.put('peace', 1)
+    assert disabled.get('peace') is None
+
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.put('peace', 1)
+    ttl_cache.get('peace')
+    ttl_cache.clear()
+    assert ttl_cache.get('peace') is None
+    assert ttl_cache.stats()['hits'] == 1
+
+def test_query_normalization():
+    assert normalize_query('  How to find\tPEACE \n') == 'how to find peace'
@@ -0,0 +1,83 @@
+"""
+Metadata filters: bitmap masks agree with a naive per-verse check, also
+after a save/load round trip, and filtered rankings only return matches.
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from bhagavadgpt.filters import FilterIndex, normalize_value, parse_filters
+from bhagavadgpt.search import build_keyword_index, rank_queries
+
+THEMES = ['Duty', 'devotion', 'knowledge', 'peace']
+MOODS = ['calm', 'Urgent']
+
+def random_records(count=300, seed=3):
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(count):
+        record = {'chapter': int(rng.integers(1, 19)), 'verse': i + 1}
+        record['themes'] = list(rng.choice(THEMES, int(rng.integers(0, 3)), replace=False))
+        if rng.random() < 0.7:
+            record['attributes'] = {'Mood': str(rng.choice(MOODS))}
+        records.append(record)
+    return records
+
+def matches(item, filters):
+    """Naive reference: every field has at least one of its values on the verse."""
+    for field, values in filters:
+        if field == 'chapter':
+            found = {normalize_value(item['chapter'])}
+        elif field == 'themes':
+            found = {normalize_value(theme) for theme in item.get('themes', [])}
+        else:
+            key = field.split('.', 1)[1]
+            found = {normalize_value(v) for k, v in item.get('attributes', {}).items() if normalize_value(k) == key}
+        if not found & set(values):
+            return False
+    return True
+
+FILTER_BODIES = [
+    {'chapter': 2},
+    {'chapter': [2, 3, 18]},
+    {'chapter': 99},
+    {'theme': 'duty'},
+    {'theme': ['PEACE', 'knowledge']},
+    {'theme': 'unknown'},
+    {'attributes': {'mood': 'calm'}},
+    {'attributes': {'MOOD': ['calm', 'urgent']}},
+] + [
+    dict(a, **b) for a, b in itertools.product(
+        [{'chapter': [1, 2, 3, 4, 5, 6]}, {'chapter': 7}],
+        [{'theme': 'devotion'}, {'attributes': {'mood': 'urgent'}}]
+    )
+]
+
+@pytest.mark.parametrize('body', FILTER_BODIES, ids=str)
+def test_bitmaps_match_naive_filter(body, tmp_path):
+    records = random_records()
+    filters = parse_filters({'filters': body})
+    expected = np.array([matches(item, filters) for item in records])
+
+    index = FilterIndex.build(records)
+    np.testing.assert_array_equal(index.mask(filters), expected)
+    np.testing.assert_array_equal(index.rows(filters), np.flatnonzero(expected))
+
+    index.save(tmp_path)
+    np.testing.assert_array_equal(FilterIndex.load(tmp_path).mask(filters), expected)
+
+@pytest.mark.parametrize('body', [{'chapter': [2, 3]}, {'theme': ['war', 'yoga', 'self', 'truth']}], ids=str)
+def test_filtered_ranking_only_returns_matches(corpus, body):
+    """Selective (subset) and broad (masked) filters rank exactly the matching verses."""
+    dataset, embeddings, encoder = corpus
+    filters = parse_filters({'filters': body})
+    matched = sum(matches(item, filters) for item in dataset)
+
+    [results] = rank_queries(
+        dataset, ['how to act without fear'], encoder, embeddings, build_keyword_index(dataset),
+        filter_index=FilterIndex.build(dataset), top_k=50, min_score=-1.0, filters=filters
+    )
+    assert len(results) == min(50, matched)
+    assert all(matches(result['verse_data'], filters) for result in results)
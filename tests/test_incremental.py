@@ -0,0 +1,88 @@
+"""
+Incremental re-indexing: delta validation and normalization, and which
+rows apply_delta reuses, re-encodes, adds and deletes.
+"""
+
+import numpy as np
+import pytest
+
+from bhagavadgpt.incremental import apply_delta, parse_delta, reindex_conflict
+from bhagavadgpt.quantization import QuantizedEmbeddings
+from bhagavadgpt.search_index import SearchIndex
+
+def record(chapter, verse, translation='steady wisdom in action'):
+    return {
+        'chapter': chapter,
+        'verse': verse,
+        'sanskrit': 'karmany evadhikaras te',
+        'translation': translation,
+        'context': 'Krishna to Arjuna',
+        'themes': ['duty'],
+        'keywords': ['action', 'wisdom'],
+        'attributes': {'tone': 'instructive'},
+    }
+
+@pytest.fixture
+def index(corpus):
+    dataset, embeddings, _ = corpus
+    return SearchIndex.build(list(dataset), embeddings.copy())
+
+def keys(index):
+    return [(item['chapter'], item['verse']) for item in index.dataset]
+
+def test_upsert_with_string_keys_replaces_the_verse(corpus, index, tmp_path):
+    _, _, encoder = corpus
+    new_index, stats = apply_delta(index, {'upsert': [record('2', ' 3 ')]}, encoder, cache_dir=str(tmp_path))
+
+    assert len(new_index) == len(index)
+    assert stats['added'] == 0 and stats['updated'] == 1 and stats['encoded'] == 1
+    assert keys(new_index) == keys(index)
+    assert new_index.dataset[keys(index).index((2, 3))]['translation'] == 'steady wisdom in action'
+
+def test_upsert_delete_and_reuse_counts(corpus, index, tmp_path):
+    dataset, embeddings, encoder = corpus
+    index, _ = apply_delta(index, {'upsert': [record(1, 1)]}, encoder, cache_dir=str(tmp_path))
+    delta = [
+        record(2, 3),
+        record(18, 99),
+        record(1, 1),
+        {'op': 'delete', 'chapter': 5, 'verse': 1},
+        {'op': 'delete', 'chapter': '17', 'verse': '98'},
+    ]
+    new_index, stats = apply_delta(index, delta, encoder, cache_dir=str(tmp_path))
+
+    # The re-sent (1, 1) has the same search text, so only (2, 3) and (18, 99) are encoded
+    assert stats['added'] == 1 and stats['updated'] == 1
+    assert stats['deleted'] == 1 and stats['not_found'] == 1
+    assert stats['encoded'] == 2 and stats['reused'] == len(dataset) - 2
+    assert stats['total_verses'] == len(new_index) == len(dataset)
+    assert (5, 1) not in keys(new_index) and keys(new_index)[-1] == (18, 99)
+
+    # Reused rows keep their vectors exactly
+    row = keys(new_index).index((3, 1))
+    np.testing.assert_array_equal(np.asarray(new_index.corpus_embeddings[row]), embeddings[2])
+
+@pytest.mark.parametrize('delta', [
+    {'upsert': [record('two', 3)]},
+    {'upsert': [record(2, 3.5)]},
+    {'upsert': [record(19, 1)]},
+    {'upsert': [{k: v for k, v in record(2, 3).items() if k != 'translation'}]},
+    {'delete': [{'chapter': 2}]},
+    {'upsert': ['2.3']},
+    {'upsert': {}},
+], ids=['word', 'float', 'chapter-range', 'missing-text', 'missing-verse', 'not-object', 'not-list'])
+def test_invalid_records_are_rejected(delta):
+    with pytest.raises(ValueError):
+        parse_delta(delta)
+
+def test_quantized_embeddings_without_float32_are_refused(corpus, index, tmp_path):
+    _, embeddings, encoder = corpus
+    quantized = SearchIndex(
+        index.dataset, QuantizedEmbeddings.quantize(embeddings, 'int8'),
+        index.keyword_index, index.vector_index, index.verse_hashes
+    )
+
+    assert reindex_conflict(index) is None
+    assert 'int8' in reindex_conflict(quantized)
+    with pytest.raises(RuntimeError):
+        apply_delta(quantized, {'upsert': [record(2, 3)]}, encoder, cache_dir=str(tmp_path))
@@ -0,0 +1,76 @@
+"""
+Neighbour graph: verses never list themselves (or another row with their
+chapter and verse), short rows are padded, and the incremental update
+after a delta matches a full rebuild where it recomputes rows.
+"""
+
+import numpy as np
+import pytest
+
+from bhagavadgpt.incremental import apply_delta
+from bhagavadgpt.neighbors import NeighborGraph, similar_verses
+from bhagavadgpt.search_index import SearchIndex
+from bhagavadgpt.verse_store import VerseStore
+
+def test_self_and_duplicates_are_excluded(corpus):
+    dataset, embeddings, _ = corpus
+    # Row 1 repeats row 0's chapter and verse
+    records = [dict(item) for item in dataset[:30]]
+    records[1].update(chapter=records[0]['chapter'], verse=records[0]['verse'])
+    graph = NeighborGraph.build(records, embeddings[:30], k=5)
+
+    for row in range(len(records)):
+        ids, _ = graph.neighbors(row)
+        assert row not in ids
+    assert 1 not in graph.neighbors(0)[0] and 0 not in graph.neighbors(1)[0]
+
+@pytest.mark.parametrize('store', [False, True], ids=['list', 'verse-store'])
+def test_short_rows_are_padded(corpus, store):
+    dataset, embeddings, _ = corpus
+    records = VerseStore.from_records(dataset[:4]) if store else dataset[:4]
+    graph = NeighborGraph.build(records, embeddings[:4], k=6)
+
+    assert graph.ids.shape == graph.scores.shape == (4, 6)
+    assert (graph.ids[:, 3:] == -1).all()
+    ids, scores = graph.neighbors(0, 6)
+    assert sorted(ids.tolist()) == [1, 2, 3]
+    assert scores.dtype == np.float32 and (np.diff(scores) <= 0).all()
+
+def test_similar_verses_lookup(corpus):
+    dataset, embeddings, _ = corpus
+    records = [dict(item) for item in dataset]
+    records[5].update(chapter=str(records[5]['chapter']), verse=str(records[5]['verse']))
+    index = SearchIndex.build(records, embeddings)
+
+    payload = similar_verses(index, int(records[5]['chapter']), int(records[5]['verse']), top_k=3)
+    assert payload is not None and len(payload['similar']) == 3
+    assert index.row_of(2, 1) == 1
+    assert similar_verses(index, 99, 1) is None
+
+def upsert(item, translation):
+    return dict(item, chapter=min(item['chapter'], 18), translation=translation,
+                sanskrit='-', context='-', attributes={})
+
+def test_update_after_delta_matches_rebuild(corpus, tmp_path):
+    dataset, embeddings, encoder = corpus
+    index = SearchIndex.build(list(dataset), embeddings)
+    delta = {
+        'upsert': [upsert(dataset[i], f'peace of mind through duty {i}') for i in (3, 40, 77)]
+                  + [upsert(dict(dataset[0], verse=999), 'fear anger desire war')],
+        'delete': [{'chapter': dataset[i]['chapter'], 'verse': dataset[i]['verse']} for i in (10, 11)],
+    }
+    new_index, _ = apply_delta(index, delta, encoder, cache_dir=str(tmp_path))
+    graph = new_index.neighbor_graph
+    full = NeighborGraph.build(new_index.dataset, new_index.corpus_embeddings, new_index.vector_index)
+
+    assert graph.ids.shape == (len(new_index), full.k)
+    assert graph.ids.max() < len(new_index)
+
+    # Recomputed rows (added and edited verses) equal the rebuild exactly
+    keys = [(item['chapter'], item['verse']) for item in new_index.dataset]
+    for record in delta['upsert']:
+        row = keys.index((record['chapter'], record['verse']))
+        np.testing.assert_array_equal(graph.ids[row], full.ids[row])
+
+    same = np.mean([set(a) == set(b) for a, b in zip(graph.ids.tolist(), full.ids.tolist())])
+    assert same >= 0.9
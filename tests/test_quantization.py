@@ -0,0 +1,47 @@
+"""
+Quantized embeddings: int8/float16 scores stay close to float32, and after
+full-precision rescoring the ranked top k matches float32 (up to ties).
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks.corpus import synthetic_queries
+from bhagavadgpt.quantization import QuantizedEmbeddings
+from bhagavadgpt.search import build_keyword_index, encode_texts, rank_queries
+
+TOP_K = 10
+
+def ranked(results):
+    """
+    Per row: the scores, and the verses scoring above the last one. Verses
+    tied on the k-th score may make the cut in either order.
+    """
+    rows = []
+    for row in results:
+        scores = [round(r['score'], 5) for r in row]
+        above = {(r['verse_data']['chapter'], r['verse_data']['verse']) for s, r in zip(scores, row) if s > scores[-1]}
+        rows.append((scores, above))
+    return rows
+
+@pytest.mark.parametrize('dtype, tolerance', [('int8', 0.02), ('float16', 0.002)])
+def test_compact_scores_are_close(corpus, dtype, tolerance):
+    _, embeddings, encoder = corpus
+    queries = encode_texts(encoder, synthetic_queries(20, 0))
+    quantized = QuantizedEmbeddings.quantize(embeddings, dtype)
+
+    assert quantized.dtype == dtype
+    assert np.abs(quantized.dot(queries) - queries @ embeddings.T).max() < tolerance
+    np.testing.assert_allclose(quantized.dot(queries, np.arange(5)), quantized.dot(queries)[:, :5], rtol=1e-6)
+
+@pytest.mark.parametrize('dtype', ['int8', 'float16'])
+def test_rescored_top_k_matches_float32(corpus, dtype):
+    dataset, embeddings, encoder = corpus
+    queries = synthetic_queries(20, 0)
+    keyword_index = build_keyword_index(dataset)
+    quantized = QuantizedEmbeddings.quantize(embeddings, dtype, full=embeddings)
+
+    expected = rank_queries(dataset, queries, encoder, embeddings, keyword_index, top_k=TOP_K, min_score=-1.0)
+    actual = rank_queries(dataset, queries, encoder, quantized, keyword_index, top_k=TOP_K, min_score=-1.0)
+
+    assert ranked(actual) == ranked(expected)
@@ -0,0 +1,50 @@
+"""
+Vector indexes: IVF recall against exact search, result padding and
+re-bucketing under kept centroids.
+"""
+
+import numpy as np
+
+from benchmarks.ann_recall import recall_at_k, synthetic_embeddings
+from bhagavadgpt.vector_index import ExactIndex, IVFIndex, rebuild_vector_index
+
+K = 10
+
+def corpus_and_queries(size=4000, num_queries=100, dim=64):
+    data = synthetic_embeddings(size + num_queries, dim, 16, seed=0)
+    return data[:size], data[size:]
+
+def test_ivf_recall_against_exact():
+    embeddings, queries = corpus_and_queries()
+    exact_ids, _ = ExactIndex(embeddings).search(queries, K)
+    ivf = IVFIndex.build(embeddings, nprobe=16)
+
+    assert recall_at_k(ivf.search(queries, K)[0], exact_ids) >= 0.95
+
+def test_ivf_scanning_every_list_is_exact():
+    embeddings, queries = corpus_and_queries(size=1000, num_queries=20)
+    exact_ids, exact_scores = ExactIndex(embeddings).search(queries, K)
+    ivf = IVFIndex.build(embeddings)
+    ivf.nprobe = ivf.nlist
+
+    ivf_ids, ivf_scores = ivf.search(queries, K)
+    assert recall_at_k(ivf_ids, exact_ids) == 1.0
+    np.testing.assert_allclose(ivf_scores, exact_scores, rtol=1e-5)
+
+def test_short_results_are_padded():
+    embeddings, queries = corpus_and_queries(size=5, num_queries=2)
+    for index in (ExactIndex(embeddings), IVFIndex.build(embeddings, nlist=2, nprobe=2)):
+        ids, scores = index.search(queries, 8)
+        assert ids.shape == scores.shape == (2, 8)
+        assert (ids[:, 5:] == -1).all() and np.isneginf(scores[:, 5:]).all()
+        assert sorted(ids[0, :5]) == list(range(5))
+
+def test_rebuild_keeps_centroids():
+    embeddings, queries = corpus_and_queries(size=1000, num_queries=20)
+    ivf = IVFIndex.build(embeddings, nprobe=4)
+    rebuilt = rebuild_vector_index(ivf, embeddings[::-1].copy())
+
+    assert isinstance(rebuilt, IVFIndex) and rebuilt.nprobe == 4
+    np.testing.assert_array_equal(rebuilt.centroids, ivf.centroids)
+    assert rebuilt.list_ids.shape[0] == embeddings.shape[0]
+    assert isinstance(rebuild_vector_index(ExactIndex(embeddings), embeddings), ExactIndex)
@@ -0,0 +1,55 @@
+"""
+Columnar verse store: verses materialize with the same fields as their
+JSON records (also after a save/load round trip and a persisted delta),
+and records without an integer chapter or verse are rejected.
+"""
+
+import json
+
+import pytest
+
+from bhagavadgpt.incremental import apply_delta, save_dataset
+from bhagavadgpt.search_index import SearchIndex
+from bhagavadgpt.verse_store import VerseStore
+
+RECORDS = [
+    {'chapter': 2, 'verse': 47, 'translation': 'You have a right to action alone', 'themes': ['duty'],
+     'keywords': ['action'], 'speaker': 'Krishna', 'references': ['BG 2.47']},
+    {'chapter': 2, 'verse': 48, 'sanskrit': 'yoga-sthah kuru karmani', 'translation': 'Perform action in yoga',
+     'themes': [], 'keywords': ['yoga'], 'context': '', 'attributes': {'tone': 'calm'}},
+    {'chapter': '3', 'verse': '1', 'translation': 'Arjuna asks about knowledge and action'},
+]
+
+def normalized(record):
+    return dict(record, chapter=int(record['chapter']), verse=int(record['verse']))
+
+def test_records_keep_their_fields(tmp_path):
+    store = VerseStore.from_records(RECORDS)
+    assert list(store) == [normalized(record) for record in RECORDS]
+
+    store.save(tmp_path, 'fingerprint')
+    loaded = VerseStore.load(tmp_path, 'fingerprint')
+    assert list(loaded) == list(store)
+    assert loaded.get(3, 1) == normalized(RECORDS[2])
+
+@pytest.mark.parametrize('value', [None, 'two', 2.5, True])
+def test_unparseable_keys_are_rejected(value):
+    with pytest.raises(ValueError):
+        VerseStore.from_records([RECORDS[0], dict(RECORDS[1], verse=value)])
+
+def test_persisted_delta_keeps_record_shape(corpus, tmp_path):
+    dataset, embeddings, encoder = corpus
+    index = SearchIndex.build(VerseStore.from_records(dataset), embeddings)
+    upsert = {
+        'chapter': 1, 'verse': 1, 'sanskrit': 'dharma-ksetre kuru-ksetre', 'translation': 'On the field of dharma',
+        'context': 'Dhritarashtra asks', 'themes': ['war'], 'keywords': ['field'], 'attributes': {},
+    }
+    new_index, _ = apply_delta(index, {'upsert': [upsert]}, encoder, cache_dir=str(tmp_path))
+
+    path = tmp_path / 'dataset.json'
+    save_dataset(new_index.dataset, str(path))
+    with open(path, 'r', encoding='utf-8') as file:
+        saved = json.load(file)
+
+    assert saved[0] == upsert
+    assert saved[1:] == dataset[1:]